@@ -0,0 +1,288 @@
+"""
+Offline load test of the chatbot handler.
+
+Drives src.handlers.chatbot with deterministic fake providers (LLM, embeddings,
+moderation), an in-memory vector store and no Secrets Manager, so it runs on a
+machine without network access. Reports throughput, per-stage p50/p95/p99 and
+memory, and can fail when results regress against a saved baseline.
+
+Usage (from tc-backend-python):
+    python -m benchmarks.chatbot_benchmark --requests 200 --concurrency 8
+    python -m benchmarks.chatbot_benchmark --mix valid=70,poorly_formed=10,invalid=10,harmful=10 --llm-ttft-ms 300
+    python -m benchmarks.chatbot_benchmark --env RETRIEVAL_MODE=hybrid --env RESPONSE_CACHE_ENABLED=true
+    python -m benchmarks.chatbot_benchmark --output report.json --baseline baseline.json --max-regression 0.15
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Request categories and the default share of each one in the mix
+DEFAULT_MIX = "valid=80,poorly_formed=8,invalid=6,harmful=6"
+
+
+def offline_environment(args: argparse.Namespace) -> Dict[str, str]:
+    """Settings that swap every remote dependency for a local stand-in."""
+    return {
+        "SECRET_NAME": "",
+        "LLM_PROVIDER": "fake",
+        "LLM_MODEL_ID": "fake",
+        "EMBEDDINGS_PROVIDER": "fake",
+        "EMBEDDINGS_MODEL_ID": "fake",
+        "MODERATION_PROVIDER": "fake",
+        "VECTOR_STORE": "memory",
+        "VECTOR_STORE_CORPUS_PATH": args.corpus,
+        "COLLECTION_NAME": "benchmark",
+        "PROMPT_TEMPLATE": args.prompt_template,
+        "EMBEDDINGS_CACHE_DISK_PATH": "",
+        "TRACING_ENABLED": "false",
+        "METRICS_HISTOGRAM_LOG_EVERY": "0",
+        "FAKE_LLM_TTFT_MS": str(args.llm_ttft_ms),
+        "FAKE_LLM_TOKEN_MS": str(args.llm_token_ms),
+        "FAKE_LLM_ANSWER_TOKENS": str(args.llm_answer_tokens),
+        "FAKE_EMBEDDINGS_LATENCY_MS": str(args.embeddings_latency_ms),
+        "FAKE_MODERATION_LATENCY_MS": str(args.moderation_latency_ms),
+    }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        category, _, weight = item.partition("=")
+        weights[category.strip()] = float(weight)
+    return weights
+
+
+def build_requests(questions: Dict[str, List[str]], mix: Dict[str, float], count: int, seed: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """Draws (category, API Gateway event) pairs following the mix, reproducibly for a seed."""
+    unknown = set(mix) - set(questions)
+    if unknown:
+        raise ValueError(f"Unknown request categories in mix: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(seed)
+    categories = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [
+        (category, {"body": json.dumps({"message": rng.choice(questions[category])})})
+        for category in categories
+    ]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    array = np.asarray(values)
+    return {
+        "count": int(array.size),
+        "mean_ms": round(float(array.mean()), 2),
+        "p50_ms": round(float(np.percentile(array, 50)), 2),
+        "p95_ms": round(float(np.percentile(array, 95)), 2),
+        "p99_ms": round(float(np.percentile(array, 99)), 2),
+    }
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as file:
+        resident_pages = int(file.read().split()[1])
+    return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class BenchmarkRunner:
+    """Sends the requests to the handler and collects every request trace."""
+
+    def __init__(self, concurrency: int):
+        # Imported here, after the offline environment is in place
+        from src.handlers import chatbot
+        from src.utils.tracing import tracer
+
+        self.chatbot = chatbot
+        self.tracer = tracer
+        self.concurrency = concurrency
+        self.traces = []
+        tracer.add_listener(self.traces.append)
+
+    def run_sequential(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.chatbot.handler(event, None) for event in events]
+
+    def run_concurrent(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Lambda serves one request per container, so concurrency is simulated with
+        # overlapping requests on the handler's event loop, each with its own trace
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(event):
+            async with semaphore:
+                with self.tracer.request("chatbot"):
+                    return await self.chatbot.handle_request(event)
+
+        async def run_all():
+            return await asyncio.gather(*(run_one(event) for event in events))
+
+        return self.chatbot.event_loop.run_until_complete(run_all())
+
+    def run(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.concurrency <= 1:
+            return self.run_sequential(events)
+        return self.run_concurrent(events)
+
+
+# Follow-ups that are incomplete on their own and must reach the query condenser
+SMOKE_FOLLOW_UPS = ["¿y si es anual?", "¿Anual?", "¿pero entonces qué hago con eso?"]
+
+
+def smoke_test(runner: BenchmarkRunner, question: str) -> None:
+    """
+    Fails fast when a plain (non-streaming) answer is broken: ChatService
+    turns chain errors into an apology, which would otherwise only show up as
+    500s in the outcome counts. Also checks that follow-ups of a session are
+    answered instead of being rejected as unclear questions.
+    """
+    from src.handlers.bootstrap import get_chat_service
+
+    response = get_chat_service().process_message(question)
+    if not isinstance(response["response"], dict):
+        raise RuntimeError(f"process_message failed: {response['response']}")
+
+    response = runner.run_sequential([{"body": json.dumps({"message": question})}])[0]
+    if response["statusCode"] != 200:
+        raise RuntimeError(f"handler returned {response['statusCode']}: {response['body']}")
+
+    for index, follow_up in enumerate(SMOKE_FOLLOW_UPS):
+        session = {"session_id": f"smoke-test-{index}"}
+        runner.run_sequential([{"body": json.dumps({"message": question, **session})}])
+        response = runner.run_sequential([{"body": json.dumps({"message": follow_up, **session})}])[0]
+        if response["statusCode"] != 200:
+            raise RuntimeError(f"follow-up {follow_up!r} returned {response['statusCode']}: {response['body']}")
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    with open(args.questions, encoding="utf-8") as file:
+        questions = json.load(file)
+
+    requests = build_requests(questions, parse_mix(args.mix), args.requests, args.seed)
+    rss_start = current_rss_mb()
+
+    runner = BenchmarkRunner(args.concurrency)
+
+    # The first request pays the cold start (spaCy, vector store, clients)
+    cold_start = time.perf_counter()
+    runner.run_sequential([{"body": json.dumps({"message": questions["valid"][0]})}])
+    cold_start_ms = (time.perf_counter() - cold_start) * 1000
+
+    # A question the cold-start request has not put in the response cache
+    smoke_test(runner, questions["valid"][-1])
+
+    runner.run_sequential([event for _, event in build_requests(questions, {"valid": 1}, args.warmup, args.seed + 1)])
+    rss_warm = current_rss_mb()
+    runner.traces.clear()
+
+    start = time.perf_counter()
+    responses = runner.run([event for _, event in requests])
+    wall_seconds = time.perf_counter() - start
+
+    stage_values: Dict[str, List[float]] = {}
+    for trace in runner.traces:
+        for stage, duration in trace.stage_totals().items():
+            stage_values.setdefault(stage, []).append(duration)
+        stage_values.setdefault("total", []).append(trace.duration_ms)
+
+    outcomes = Counter(f"{category}:{response['statusCode']}" for (category, _), response in zip(requests, responses))
+
+    return {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "seed": args.seed,
+            "llm_ttft_ms": args.llm_ttft_ms,
+            "llm_token_ms": args.llm_token_ms,
+            "llm_answer_tokens": args.llm_answer_tokens,
+            "embeddings_latency_ms": args.embeddings_latency_ms,
+            "moderation_latency_ms": args.moderation_latency_ms,
+            "env": dict(args.env),
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(requests) / wall_seconds, 2),
+        "cold_start_ms": round(cold_start_ms, 2),
+        "outcomes": dict(sorted(outcomes.items())),
+        "stages": {stage: percentiles(values) for stage, values in sorted(stage_values.items())},
+        "memory": {"rss_start_mb": rss_start, "rss_warm_mb": rss_warm, "rss_end_mb": current_rss_mb(), "peak_rss_mb": peak_rss_mb()},
+    }
+
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Compares throughput and end-to-end latency with a baseline report."""
+    regressions = []
+
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - max_regression):
+        regressions.append(f"throughput {report['throughput_rps']} rps < baseline {baseline['throughput_rps']} rps")
+
+    for key in ("p95_ms", "p99_ms"):
+        current, expected = report["stages"]["total"][key], baseline["stages"]["total"][key]
+        if current > expected * (1 + max_regression):
+            regressions.append(f"total {key} {current} > baseline {expected}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test of the chatbot handler with fake providers")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated category=weight pairs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--questions", default=os.path.join(DATA_DIR, "questions.json"))
+    parser.add_argument("--corpus", default=os.path.join(DATA_DIR, "corpus.jsonl"))
+    parser.add_argument("--prompt-template", default="general_query")
+    parser.add_argument("--llm-ttft-ms", type=float, default=0.0)
+    parser.add_argument("--llm-token-ms", type=float, default=0.0)
+    parser.add_argument("--llm-answer-tokens", type=int, default=40)
+    parser.add_argument("--embeddings-latency-ms", type=float, default=0.0)
+    parser.add_argument("--moderation-latency-ms", type=float, default=0.0)
+    parser.add_argument("--env", action="append", default=[], type=lambda item: tuple(item.split("=", 1)),
+                        help="Extra KEY=VALUE setting, e.g. RETRIEVAL_MODE=hybrid (repeatable)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Baseline JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    parser.add_argument("--verbose", action="store_true", help="Keep the application logs")
+    args = parser.parse_args(argv)
+
+    os.environ.update(offline_environment(args))
+    os.environ.update(dict(args.env))
+
+    from src.utils.logger import logger
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    report = run_benchmark(args)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = find_regressions(report, json.load(file), args.max_regression)
+        if regressions:
+            print("Performance regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,4 +2,5 @@ MINIMUM_SCORE_CONFIDENCE = 0.7
 RESPONSE_FOR_LOW_CONFIDENCE = "Lo siento, no estoy seguro de cómo responder a eso. ¿Puedes reformular la pregunta?"
 RESPONSE_FOR_UNCLEAR_QUESTION = "Tu pregunta no es clara, por favor, reformúlala"
 HTTP_BAD_REQUEST = 400
-HTTP_INTERNAL_SERVER_ERROR = 500
\ No newline at end of file
+HTTP_INTERNAL_SERVER_ERROR = 500
+STREAM_END_SENTINEL = "[END]"
\ No newline at end of file
@@ -0,0 +1,39 @@
+import threading
+from src.utils.logger import logger
+from src.utils.secrets import load_secrets
+from src.utils.startup import startup_timer
+from src.utils.validators import preload_nlp
+
+_chat_service = None
+_chat_service_lock = threading.Lock()
+
+def get_chat_service():
+    """
+    Returns the container's ChatService, initializing it on first use.
+
+    The first call loads spaCy in the background while secrets, the chat stack
+    imports, embeddings, PGVector and the LLM client are set up, then logs the
+    startup-phase report once every phase has finished.
+    """
+    global _chat_service
+
+    if _chat_service is None:
+        with _chat_service_lock:
+            if _chat_service is None:
+                logger.info("Initializing chatbot components")
+                nlp_thread = preload_nlp()
+
+                load_secrets()
+
+                with startup_timer.phase("import"):
+                    from src.services.chat.chat_service import ChatService
+
+                _chat_service = ChatService()
+
+                threading.Thread(target=_report_startup, args=(nlp_thread,), daemon=True).start()
+
+    return _chat_service
+
+def _report_startup(nlp_thread: threading.Thread) -> None:
+    nlp_thread.join()
+    startup_timer.report()
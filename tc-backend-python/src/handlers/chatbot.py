@@ -1,63 +1,108 @@
-import concurrent.futures
+import asyncio
 import time
 from src.constants.app_constants import MINIMUM_SCORE_CONFIDENCE, RESPONSE_FOR_LOW_CONFIDENCE, RESPONSE_FOR_UNCLEAR_QUESTION
-from src.services.chat.chat_service import ChatService
+from src.handlers.bootstrap import get_chat_service
+from src.handlers.warmup import is_warmup_event, register_snapshot_hooks, should_preinit, warm_up
 from src.utils.logger import logger
-from src.utils.validators import is_poorly_formed_question, parse_request_body, validate_user_message, detect_harmful_content
+from src.utils.tracing import tracer
+from src.utils.validators import adetect_harmful_content, parse_request_body, validate_session_id, validate_user_message
 from src.utils.response_helpers import success_response, error_response
-from src.utils.secrets import load_secrets
 
-load_secrets()
-chat_service = ChatService()
+# One event loop per container, so async clients and their connection pools survive warm invocations
+event_loop = asyncio.new_event_loop()
+
+# Provisioned and SnapStart containers warm up during Lambda's init phase, before the first request
+register_snapshot_hooks(event_loop)
+if should_preinit():
+    warm_up(event_loop)
 
 def handler(event, context):
     """
     AWS Lambda handler for processing chatbot requests.
-    
-    Expects a JSON request with a "message" field and returns the chatbot's response.
+
+    Expects a JSON request with a "message" field, and optionally a "session_id"
+    to continue a conversation, and returns the chatbot's response. Keep-warm
+    pings ({"warmup": true} or scheduled events) warm the container up and get
+    its readiness report instead.
+    """
+    if is_warmup_event(event):
+        return success_response(warm_up(event_loop))
+
+    with tracer.request("chatbot"):
+        return event_loop.run_until_complete(handle_request(event))
+
+async def cancel_tasks(*tasks):
+    """Cancels the given tasks and waits until they have stopped."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def handle_request(event):
+    """
+    Processes a chatbot request on the event loop.
+
+    Moderation, question validation and the RAG chain run as concurrent tasks.
+    When a check rejects the message, the chain task is cancelled, which aborts
+    the in-flight retrieval and LLM calls.
     """
     try:
         start_time = time.time()
         logger.info("Received request event.")
-        
+
         # Parse request body
-        body = parse_request_body(event)
+        with tracer.span("parse"):
+            body = parse_request_body(event)
 
         # Validate, clean and sanitize user input
-        is_valid, user_message, error_msg = validate_user_message(body)
+        with tracer.span("validate"):
+            is_valid, user_message, error_msg = validate_user_message(body)
+            if is_valid:
+                is_valid, session_id, error_msg = validate_session_id(body)
 
         if not is_valid:
             return error_response(400, error_msg)
 
         logger.info(f"Processing user input: {user_message}")
 
+        chat_service = get_chat_service()
+
         # Execute moderation and processing tasks concurrently
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-
-            future_moderation = executor.submit(detect_harmful_content, user_message)
-            future_question_check = executor.submit(is_poorly_formed_question, user_message)
-            future_processing = executor.submit(chat_service.process_message, user_message)
-
-            poorly_formed = future_question_check.result()
-            harmful, reason = future_moderation.result()
-    
-            if poorly_formed:
-                logger.info("Poorly formed question detected. Requesting clarification.")
-                future_moderation.cancel()
-                return error_response(400, RESPONSE_FOR_UNCLEAR_QUESTION)
-            
-            if harmful:
-                logger.info(f"Message is harmful ({reason}). Cancelling processing task.")
-                future_processing.cancel()
-                return error_response(400, f"Message is harmful ({reason})")
-
-            chatbot_response = future_processing.result()
-
-             # Verify response confidence
-            if chatbot_response["response"]["confidence"] < MINIMUM_SCORE_CONFIDENCE:
-                logger.info("Low confidence response. Requesting clarification.")
-                chatbot_response["response"]["content"] = RESPONSE_FOR_LOW_CONFIDENCE
-        
+        moderation_task = asyncio.create_task(adetect_harmful_content(user_message))
+        question_check_task = asyncio.create_task(asyncio.to_thread(chat_service.is_unclear_question, user_message, session_id))
+        processing_task = asyncio.create_task(chat_service.aprocess_message(user_message, session_id))
+
+        pending_checks = {moderation_task, question_check_task}
+
+        try:
+            while pending_checks:
+                done, pending_checks = await asyncio.wait(pending_checks, return_when=asyncio.FIRST_COMPLETED)
+
+                if question_check_task in done and question_check_task.result():
+                    logger.info("Poorly formed question detected. Requesting clarification.")
+                    await cancel_tasks(processing_task, *pending_checks)
+                    return error_response(400, RESPONSE_FOR_UNCLEAR_QUESTION)
+
+                if moderation_task in done:
+                    harmful, reason = moderation_task.result()
+                    if harmful:
+                        logger.info(f"Message is harmful ({reason}). Cancelling processing task.")
+                        await cancel_tasks(processing_task, *pending_checks)
+                        return error_response(400, f"Message is harmful ({reason})")
+
+            chatbot_response = await processing_task
+
+        except BaseException:
+            await cancel_tasks(processing_task, *pending_checks)
+            raise
+
+        # Verify response confidence
+        if chatbot_response["response"]["confidence"] < MINIMUM_SCORE_CONFIDENCE:
+            logger.info("Low confidence response. Requesting clarification.")
+            chatbot_response["response"]["content"] = RESPONSE_FOR_LOW_CONFIDENCE
+
+        # Only answers that passed every check become part of the conversation
+        chat_service.remember(session_id, user_message, chatbot_response)
+
         end_time = time.time()
         total_time = end_time - start_time
         chatbot_response["response"]["processing_time"] = total_time
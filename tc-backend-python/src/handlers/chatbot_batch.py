@@ -0,0 +1,99 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.constants.app_constants import MINIMUM_SCORE_CONFIDENCE, RESPONSE_FOR_LOW_CONFIDENCE, RESPONSE_FOR_UNCLEAR_QUESTION
+from src.handlers.bootstrap import get_chat_service
+from src.utils.environment import BATCH_MAX_CONCURRENCY
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+from src.utils.validators import (
+    are_poorly_formed_questions,
+    detect_harmful_contents,
+    parse_request_body,
+    validate_batch_messages,
+    validate_user_message,
+)
+from src.utils.response_helpers import success_response, error_response
+
+# Runs the spaCy pass and the moderation requests side by side
+checks_executor = ThreadPoolExecutor(max_workers=2)
+
+def handler(event, context):
+    """
+    AWS Lambda handler for processing a batch of chatbot messages.
+
+    Expects {"messages": [...]} either as an API Gateway body or as the direct
+    invocation payload, and returns one result per message, in order.
+    """
+    with tracer.request("chatbot_batch"):
+        return handle_batch_request(event)
+
+def handle_batch_request(event):
+    """Validates the batch and processes its accepted messages."""
+    try:
+        start_time = time.time()
+        logger.info("Received batch request event.")
+
+        with tracer.span("parse"):
+            body = parse_request_body(event) if "body" in event else event
+
+        is_valid, error_msg = validate_batch_messages(body)
+        if not is_valid:
+            return error_response(400, error_msg)
+
+        results = [{"index": index} for index in range(len(body["messages"]))]
+        accepted = []
+
+        # Validate, clean and sanitize every message
+        with tracer.span("validate"):
+            for index, message in enumerate(body["messages"]):
+                is_valid, user_message, error_msg = validate_user_message({"message": message})
+                if is_valid:
+                    accepted.append((index, user_message))
+                else:
+                    results[index]["error"] = error_msg
+
+        logger.info(f"Processing batch: {len(accepted)} of {len(results)} messages passed validation")
+
+        if accepted:
+            chat_service = get_chat_service()
+            messages = [user_message for _, user_message in accepted]
+
+            # Both checks are batched: one nlp.pipe pass and multi-input moderation requests
+            question_checks = checks_executor.submit(contextvars.copy_context().run, are_poorly_formed_questions, messages)
+            moderation_checks = checks_executor.submit(contextvars.copy_context().run, detect_harmful_contents, messages)
+
+            to_process = []
+            for (index, user_message), poorly_formed, (harmful, reason) in zip(
+                accepted, question_checks.result(), moderation_checks.result()
+            ):
+                if poorly_formed:
+                    results[index]["error"] = RESPONSE_FOR_UNCLEAR_QUESTION
+                elif harmful:
+                    results[index]["error"] = f"Message is harmful ({reason})"
+                else:
+                    to_process.append((index, user_message))
+
+            responses = chat_service.process_batch(
+                [user_message for _, user_message in to_process], BATCH_MAX_CONCURRENCY
+            ) if to_process else []
+
+            for (index, user_message), chatbot_response in zip(to_process, responses):
+                if "error" in chatbot_response:
+                    results[index]["error"] = chatbot_response["error"]
+                    continue
+
+                # Verify response confidence
+                if chatbot_response["response"]["confidence"] < MINIMUM_SCORE_CONFIDENCE:
+                    chatbot_response["response"]["content"] = RESPONSE_FOR_LOW_CONFIDENCE
+
+                results[index].update({"message": user_message, **chatbot_response})
+
+        total_time = time.time() - start_time
+        logger.info(f"Batch of {len(results)} messages processed in {total_time:.2f} seconds")
+
+        return success_response({"results": results, "processing_time": total_time})
+
+    except Exception as e:
+        logger.exception("Error processing chatbot batch request")
+        return error_response(500, str(e))
@@ -0,0 +1,130 @@
+import concurrent.futures
+import contextvars
+import time
+from typing import Any, Dict, Optional
+from src.constants.app_constants import MINIMUM_SCORE_CONFIDENCE, RESPONSE_FOR_LOW_CONFIDENCE, RESPONSE_FOR_UNCLEAR_QUESTION
+from src.handlers.bootstrap import get_chat_service
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+from src.utils.validators import parse_request_body, validate_session_id, validate_user_message, detect_harmful_content
+from src.utils.websocket import WebSocketConnection
+
+# Moderation and question checks run next to the stream; the pool is reused across warm invocations
+checks_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+def parse_stream_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parses a WebSocket frame. Accepts a JSON object with a "message" field or the
+    raw question text.
+    """
+    body = parse_request_body(event)
+    raw_body = event.get("body")
+
+    if not body and isinstance(raw_body, str) and raw_body.strip():
+        return {"message": raw_body}
+
+    return body
+
+def get_rejection_reason(future_question_check, future_moderation, wait: bool = False) -> Optional[str]:
+    """
+    Returns why the message must be rejected, or None.
+
+    Without wait, only checks that have already finished are considered, so the
+    stream is never blocked on them.
+    """
+    if (wait or future_question_check.done()) and future_question_check.result():
+        logger.info("Poorly formed question detected. Aborting stream.")
+        return RESPONSE_FOR_UNCLEAR_QUESTION
+
+    if wait or future_moderation.done():
+        harmful, reason = future_moderation.result()
+        if harmful:
+            logger.info(f"Message is harmful ({reason}). Aborting stream.")
+            return f"Message is harmful ({reason})"
+
+    return None
+
+def handler(event, context):
+    """
+    AWS Lambda handler for chatbot requests received through a WebSocket API.
+
+    Streams the retrieved documents, the answer tokens and the final confidence
+    as JSON frames, followed by the "[END]" sentinel. Moderation and question
+    validation run while the answer is generated and abort the stream if they
+    reject the message. The conversation memory is keyed by the "session_id"
+    of the frame or, by default, by the WebSocket connection.
+    """
+    route_key = event.get("requestContext", {}).get("routeKey")
+    if route_key in ("$connect", "$disconnect"):
+        return {"statusCode": 200}
+
+    with tracer.request("chatbot_stream"):
+        return handle_stream_request(event)
+
+def submit_check(function, *args):
+    """Runs a check on the checks pool within the current context, so its span joins the request trace."""
+    return checks_executor.submit(contextvars.copy_context().run, function, *args)
+
+def handle_stream_request(event):
+    """Validates the message and streams the answer over the client's connection."""
+    connection = WebSocketConnection.from_event(event)
+    stream = None
+
+    try:
+        start_time = time.time()
+        logger.info("Received streaming request event.")
+
+        with tracer.span("parse"):
+            body = parse_stream_body(event)
+
+        # Validate, clean and sanitize user input
+        with tracer.span("validate"):
+            is_valid, user_message, error_msg = validate_user_message(body)
+            if is_valid:
+                is_valid, session_id, error_msg = validate_session_id(body)
+
+        if not is_valid:
+            connection.send({"type": "error", "error": error_msg})
+            return {"statusCode": 400}
+
+        logger.info(f"Streaming response for user input: {user_message}")
+
+        chat_service = get_chat_service()
+        session_id = session_id or connection.connection_id
+
+        future_moderation = submit_check(detect_harmful_content, user_message)
+        future_question_check = submit_check(chat_service.is_unclear_question, user_message, session_id)
+
+        stream = chat_service.stream_message(user_message, session_id)
+
+        for stream_event in stream:
+            # The final frame is only sent once both checks have passed
+            is_final = stream_event["type"] == "confidence"
+            rejection_reason = get_rejection_reason(future_question_check, future_moderation, wait=is_final)
+
+            if rejection_reason:
+                connection.send({"type": "error", "error": rejection_reason})
+                return {"statusCode": 400}
+
+            if is_final:
+                stream_event["processing_time"] = time.time() - start_time
+                if stream_event["confidence"] < MINIMUM_SCORE_CONFIDENCE:
+                    logger.info("Low confidence response. Requesting clarification.")
+                    stream_event["warning"] = RESPONSE_FOR_LOW_CONFIDENCE
+
+            if not connection.send(stream_event):
+                logger.info("Client disconnected. Stopping stream.")
+                break
+
+        return {"statusCode": 200}
+
+    except Exception as e:
+        logger.exception("Error processing streaming chatbot request")
+        connection.send({"type": "error", "error": str(e)})
+        return {"statusCode": 500}
+
+    finally:
+        # Closing the generator also closes the upstream LLM stream
+        if stream is not None:
+            stream.close()
+        connection.end()
@@ -4,7 +4,7 @@ from src.services.evaluation.evaluation_service import evaluate_question
 from src.utils.logger import logger
 from src.utils.response_helpers import success_response, error_response
 from src.utils.secrets import load_secrets
-from src.utils.validators import parse_request_body, validate_request_metrics_data
+from src.utils.validators import parse_request_body, validate_bulk_metrics_data, validate_request_metrics_data
 
 load_secrets()
 
@@ -21,7 +21,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     logger.info("Received request event.")
 
-    body = parse_request_body(event)
+    # Bulk evaluations are usually invoked directly, without the API Gateway envelope
+    body = parse_request_body(event) if "body" in event else event
+
+    if "dataset_path" in body:
+        return handle_bulk_evaluation(body)
 
     is_valid, error_message = validate_request_metrics_data(body)
     if not is_valid:
@@ -45,3 +49,31 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     except Exception as e:
         logger.exception("Error processing chatbot request")
         return error_response(HTTP_INTERNAL_SERVER_ERROR, str(e))
+
+
+def handle_bulk_evaluation(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evaluates a JSONL/Parquet dataset (local path or s3:// uri) in batches.
+
+    Per-row and aggregate results are written to "output_path" when given; the
+    response carries the aggregate scores and run statistics.
+    """
+    is_valid, error_message = validate_bulk_metrics_data(body)
+    if not is_valid:
+        return error_response(HTTP_BAD_REQUEST, error_message)
+
+    try:
+        from src.services.evaluation.batch_evaluation import BatchEvaluator, evaluate_dataset_file
+
+        evaluator = BatchEvaluator(**{
+            option: int(body[option]) for option in ("batch_size", "max_concurrency") if body.get(option)
+        })
+        result = evaluate_dataset_file(body["dataset_path"], body.get("output_path"), evaluator)
+
+        logger.info(f"Bulk evaluation result: {result['aggregate']} ({result['stats']})")
+
+        return success_response({"aggregate": result["aggregate"], "stats": result["stats"], "output_path": body.get("output_path")})
+
+    except Exception as e:
+        logger.exception("Error processing bulk evaluation request")
+        return error_response(HTTP_INTERNAL_SERVER_ERROR, str(e))
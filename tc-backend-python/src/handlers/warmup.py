@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, Optional
+from src.handlers.bootstrap import get_chat_service
+from src.utils.logger import logger
+from src.utils.startup import startup_timer
+from src.utils.validators import get_nlp
+from src.utils.environment import (
+    PG_ASYNC_ENABLED,
+    PG_POOL_SIZE,
+    VECTOR_STORE,
+    WARMUP_LLM_PING,
+    WARMUP_ON_INIT,
+)
+
+# Scheduled keep-warm pings: EventBridge (serverless.yml) and serverless-plugin-warmup
+WARMUP_SOURCES = {"aws.events", "serverless-plugin-warmup"}
+WARMUP_TEXT = "¿Cómo puedo cambiar mi plan?"
+
+# Lambda sets this during the init phase of provisioned and SnapStart environments
+INIT_TYPE_ENV = "AWS_LAMBDA_INITIALIZATION_TYPE"
+PREINIT_TYPES = {"provisioned-concurrency", "snap-start"}
+
+
+def is_warmup_event(event: Any) -> bool:
+    """True for keep-warm pings, which carry {"warmup": true} or come from a scheduler."""
+    return isinstance(event, dict) and bool(event.get("warmup") or event.get("source") in WARMUP_SOURCES)
+
+
+def _open_connections(engine) -> None:
+    from sqlalchemy import text
+
+    # Holding pool_size connections at once makes the pool open all of them, not one reused connection
+    with ExitStack() as stack:
+        for _ in range(PG_POOL_SIZE):
+            stack.enter_context(engine.connect()).execute(text("SELECT 1"))
+
+
+async def _aopen_connections(engine) -> None:
+    from sqlalchemy import text
+
+    connections = [await engine.connect() for _ in range(PG_POOL_SIZE)]
+    try:
+        for connection in connections:
+            await connection.execute(text("SELECT 1"))
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+
+def _ping_llms(chat_service) -> None:
+    from src.services.generation.llm_cache import without_generation_cache
+
+    for tier in chat_service.generation_service.get_tiers():
+        # The unwrapped model, so the ping never answers from (or fills) the prompt cache
+        without_generation_cache(tier.llm).invoke("Responde solo: ok")
+
+
+def _fill_pools(event_loop: Optional[asyncio.AbstractEventLoop], checks: Dict[str, Any]) -> None:
+    # Imported here so the handler module stays light until the first warm-up or request
+    from src.services.retrieval.db_engine import get_async_engine, get_engine
+
+    checks["database"] = _check("database", lambda: _open_connections(get_engine()))
+    if PG_ASYNC_ENABLED and event_loop is not None:
+        checks["database_async"] = _check(
+            "database_async", lambda: event_loop.run_until_complete(_aopen_connections(get_async_engine()))
+        )
+
+
+def _check(name: str, step: Callable[[], Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        with startup_timer.phase(f"warmup_{name}"):
+            step()
+        return {"ready": True, "ms": round(1000 * (time.perf_counter() - start), 2)}
+    except Exception as e:
+        logger.error(f"Warm-up step {name} failed: {e}")
+        return {"ready": False, "ms": round(1000 * (time.perf_counter() - start), 2), "error": str(e)}
+
+
+def warm_up(event_loop: Optional[asyncio.AbstractEventLoop] = None) -> Dict[str, Any]:
+    """
+    Brings the container to the state of a warm one: builds the ChatService,
+    fills the Postgres pools, runs one spaCy parse and sends one request
+    through the embeddings (and, with WARMUP_LLM_PING, each LLM tier) client,
+    so their TLS connections are open. The async pool is filled on
+    event_loop, the loop the handler later serves requests on.
+
+    A failed step does not stop the others; the returned readiness report
+    lists each step with its status and duration, plus the pool stats.
+    """
+    start = time.perf_counter()
+    checks = {"chat_service": _check("chat_service", get_chat_service)}
+    if not checks["chat_service"]["ready"]:
+        return {"ready": False, "checks": checks}
+    chat_service = get_chat_service()
+
+    if VECTOR_STORE == "pgvector":
+        _fill_pools(event_loop, checks)
+
+    # get_nlp waits for the background load if it is still running; the parse touches every pipe once
+    checks["spacy"] = _check("spacy", lambda: get_nlp()(WARMUP_TEXT))
+
+    embeddings = chat_service.retrieval_service.embeddings
+    checks["embeddings"] = _check("embeddings", lambda: getattr(embeddings, "embeddings", embeddings).embed_query(WARMUP_TEXT))
+
+    if WARMUP_LLM_PING:
+        checks["llm"] = _check("llm", lambda: _ping_llms(chat_service))
+
+    from src.services.retrieval.db_engine import get_pool_stats
+
+    readiness = {
+        "ready": all(check["ready"] for check in checks.values()),
+        "checks": checks,
+        "pools": get_pool_stats(),
+        "warmup_ms": round(1000 * (time.perf_counter() - start), 2),
+    }
+    logger.info(f"Warm-up finished: {readiness}")
+    return readiness
+
+
+def should_preinit() -> bool:
+    """True when the container should warm up while its module is imported (Lambda's init phase)."""
+    return WARMUP_ON_INIT or os.getenv(INIT_TYPE_ENV) in PREINIT_TYPES
+
+
+def register_snapshot_hooks(event_loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+    """
+    Under SnapStart, closes the pooled connections before the snapshot is
+    taken (a restored socket is dead) and reopens them after each restore.
+    Without the snapshot runtime hooks package this does nothing.
+    """
+    try:
+        from snapshot_restore_py import register_after_restore, register_before_snapshot
+    except ImportError:
+        return
+
+    if VECTOR_STORE != "pgvector":
+        return
+
+    from src.services.retrieval.db_engine import dispose_engines
+
+    @register_before_snapshot
+    def _before_snapshot():
+        logger.info("Closing pooled connections before snapshot")
+        dispose_engines(event_loop)
+
+    @register_after_restore
+    def _after_restore():
+        checks = {}
+        _fill_pools(event_loop, checks)
+        logger.info(f"Reopened pooled connections after restore: {checks}")
@@ -1,12 +1,25 @@
-import math
-from langchain.schema.runnable import RunnableParallel, RunnablePassthrough, RunnableLambda
-from src.services.chat.prompt_templates import PROMPT_TEMPLATES
+import asyncio
+import concurrent.futures
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional
+from langchain.schema.runnable import RunnableParallel, RunnableLambda
+from src.constants.app_constants import MINIMUM_SCORE_CONFIDENCE, RESPONSE_FOR_LOW_CONFIDENCE
+from src.services.chat.context_builder import ContextBuilder
+from src.services.chat.intent_router import DEFAULT_INTENT, create_intent_router
+from src.services.chat.memory_service import NO_HISTORY, create_conversation_memory, format_history
+from src.services.chat.query_condenser import create_query_condenser, create_retrieval_cache
+from src.services.chat.prompt_templates import CONTEXT_TOKEN_BUDGETS, PROMPT_TEMPLATES
+from src.services.chat.response_cache import create_response_cache
+from src.services.generation.confidence import create_confidence_engine
+from src.services.generation.llm_callbacks import LLMTracingCallback
+from src.services.generation.model_cascade import ModelCascade
 from src.utils.logger import logger
 from src.services.retrieval.retrieval_service import RetrievalService
 from src.services.generation.generations_service import GenerationService
-from src.utils.environment import PROMPT_TEMPLATE
-from langchain.schema import AIMessage
 from src.utils.response_helpers import convert_documents_to_dict
+from src.utils.tokens import count_tokens
+from src.utils.tracing import tracer
+from src.utils.validators import is_poorly_formed_question
 
 class ChatService:
     """
@@ -16,70 +29,362 @@ class ChatService:
     def __init__(self):
         logger.info("Initializing ChatService")
 
-        self.retrieval_service = RetrievalService()
-        self.generation_service = GenerationService()
-        self.prompt_template = PROMPT_TEMPLATES[PROMPT_TEMPLATE]
-
-        #  Create runnable chain
-        self.chain = RunnableParallel({
-            "context": self.retrieval_service.get_retriever(),
-            "user_message": RunnablePassthrough(),
-        }) | {
-            "response": self.prompt_template | self.generation_service.get_llm() | RunnableLambda(self._calculate_confidence),
-            "documents": lambda x: x["context"]
+        # Retrieval (embeddings + PGVector) and generation clients are independent, build them in parallel
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            future_retrieval = executor.submit(RetrievalService)
+            future_generation = executor.submit(GenerationService)
+
+            self.retrieval_service = future_retrieval.result()
+            self.generation_service = future_generation.result()
+
+        self.context_builders = {intent: ContextBuilder(budget) for intent, budget in CONTEXT_TOKEN_BUDGETS.items()}
+        self.intent_router = create_intent_router(self.retrieval_service.embeddings)
+        self.response_cache = create_response_cache()
+        self.memory = create_conversation_memory(self.generation_service.get_llm())
+        self.query_condenser = create_query_condenser()
+        self.retrieval_cache = create_retrieval_cache()
+
+        # Prompt per intent on each model tier, shared by the full chain and the streaming path
+        self.cascade = ModelCascade(
+            self.generation_service.get_tiers(),
+            PROMPT_TEMPLATES,
+            create_confidence_engine(),
+            callbacks=[LLMTracingCallback()],
+        )
+
+        #  Create runnable chain; follow-ups are rewritten from the session history and routed to an
+        #  intent (prompt template, retrieval filter and collections) before retrieval
+        self.chain = (
+            RunnableLambda(self._prepare_query, afunc=self._aprepare_query)
+            | RunnableLambda(self._route, afunc=self._aroute)
+            | RunnableParallel({
+                "context": RunnableLambda(self._retrieve, afunc=self._aretrieve),
+                "user_message": itemgetter("user_message"),
+                "history": itemgetter("history"),
+                "query": itemgetter("query"),
+                "intent": itemgetter("intent"),
+            })
+            | RunnableLambda(self._assemble_context)
+        ) | {
+            "response": RunnableLambda(self.cascade.invoke, afunc=self.cascade.ainvoke),
+            "documents": lambda x: x["documents"],
+            "prompt_tokens": lambda x: x["prompt_tokens"],
+            "history": lambda x: x["history"],
+            "query": lambda x: x["query"],
+            "intent": lambda x: x["intent"],
         }
         
         logger.info("ChatService initialized successfully")
 
 
-    def process_message(self, user_message: str) -> dict:
+    def process_message(self, user_message: str, session_id: Optional[str] = None) -> dict:
         """
         Process user message using LangChain's Runnable Chain.
         Returns a dictionary containing the AI response and the retrieved documents.
+
+        When the semantic response cache is enabled, a near-duplicate question that
+        was already answered is served from the cache without running the chain.
+        With a session_id, the conversation history is part of the prompt; the caller
+        stores the turn with remember once the answer has been accepted. Questions of
+        a session with history skip the cache, since they may depend on earlier turns.
         """
         try:
             logger.info(f"Processing user message: {user_message}")
-            result = self.chain.invoke(user_message)
-            
-            # Extract the response and documents
-            response_content = result["response"].content if hasattr(result["response"], 'content') else result["response"]
-            documents = result["documents"]
-            serializable_documents = convert_documents_to_dict(documents=documents)
-            
-            logger.info(f"AI response: {response_content}")
+
+            state = self._get_state(session_id)
+
+            query_embedding = None
+            if self.response_cache and format_history(state) == NO_HISTORY:
+                query_embedding = self.retrieval_service.embeddings.embed_query(user_message)
+                with tracer.span("response_cache"):
+                    cached_response = self.response_cache.lookup(query_embedding)
+                if cached_response:
+                    return cached_response
+
+            result = self.chain.invoke({"user_message": user_message, "session_id": session_id, "state": state})
+            chatbot_response = self._build_response(result)
+
+            if self._should_cache(chatbot_response, result["history"]):
+                self.response_cache.store(query_embedding, user_message, chatbot_response)
+
+            return chatbot_response
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
             return {
-                "response": response_content,
-                "documents": serializable_documents
+                "response": "Sorry, an error occurred while processing your request.",
+                "documents": []
             }
+
+    async def aprocess_message(self, user_message: str, session_id: Optional[str] = None) -> dict:
+        """
+        Async version of process_message built on chain.ainvoke.
+
+        Cancelling the awaiting task aborts the in-flight retrieval and LLM calls.
+        """
+        try:
+            logger.info(f"Processing user message: {user_message}")
+
+            state = await self._aget_state(session_id)
+
+            query_embedding = None
+            if self.response_cache and format_history(state) == NO_HISTORY:
+                query_embedding = await self.retrieval_service.embeddings.aembed_query(user_message)
+                with tracer.span("response_cache"):
+                    cached_response = await asyncio.to_thread(self.response_cache.lookup, query_embedding)
+                if cached_response:
+                    return cached_response
+
+            result = await self.chain.ainvoke({"user_message": user_message, "session_id": session_id, "state": state})
+            chatbot_response = self._build_response(result)
+
+            if self._should_cache(chatbot_response, result["history"]):
+                await asyncio.to_thread(self.response_cache.store, query_embedding, user_message, chatbot_response)
+
+            return chatbot_response
         except Exception as e:
             logger.error(f"Error processing message: {e}")
             return {
                 "response": "Sorry, an error occurred while processing your request.",
                 "documents": []
             }
-    
-    def _calculate_confidence(self, model_output: AIMessage) -> dict:
+
+    def is_unclear_question(self, user_message: str, session_id: Optional[str] = None) -> bool:
         """
-        Calculate the confidence of the model output based on the logprobs.
+        The spaCy question gate, except for follow-ups of a session with history
+        ("¿y si es anual?"): they are incomplete on their own by design, and the
+        query condenser rewrites them into a standalone query before retrieval.
+        The history is only read for messages that look like a follow-up.
         """
-        logprobs = model_output.response_metadata.get("logprobs", None)
-        
-        if not logprobs or not logprobs.get("content"):
-            logger.info("No logprobs found. Using default confidence.")
-            confidence = 1.0
-
-        else:
-            # Calculate the confidence as the average of the token logprobs
-            total_confidence = 0.0
-            for token_data in logprobs["content"]:
-                logprob = token_data["logprob"]
-                total_confidence += math.exp(logprob)
-            
-            confidence = total_confidence / len(logprobs["content"])
-            rounded_confidence = round(confidence, 2)
-            logger.info(f"Confidence: {confidence}")
+        if session_id and self.query_condenser.is_follow_up(user_message):
+            if self.query_condenser.needs_rewrite(user_message, self._get_state(session_id)["turns"]):
+                return False
+        return is_poorly_formed_question(user_message)
+
+    def process_batch(self, user_messages: List[str], max_concurrency: int) -> List[dict]:
+        """
+        Process several user messages with a single chain.batch call.
+
+        Returns one result per message, in order: the usual response dictionary,
+        or {"error": ...} for a message whose chain run failed.
+        """
+        logger.info(f"Processing batch of {len(user_messages)} messages")
+
+        results: List[Any] = [None] * len(user_messages)
+        query_embeddings: List[Any] = [None] * len(user_messages)
+
+        if self.response_cache:
+            query_embeddings = self.retrieval_service.embeddings.embed_documents(user_messages)
+            for index, embedding in enumerate(query_embeddings):
+                results[index] = self.response_cache.lookup(embedding)
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        outputs = self.chain.batch(
+            [{"user_message": user_messages[index], "session_id": None} for index in pending],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+
+        for index, output in zip(pending, outputs):
+            if isinstance(output, Exception):
+                logger.error(f"Error processing batch message {index}: {output}")
+                results[index] = {"error": str(output)}
+                continue
+
+            results[index] = self._build_response(output)
+            if self._should_cache(results[index]):
+                self.response_cache.store(query_embeddings[index], user_messages[index], results[index])
+
+        return results
+
+    def _build_response(self, result: dict) -> dict:
+        """Extract the response and serializable documents from the chain output."""
+        response_content = result["response"].content if hasattr(result["response"], 'content') else result["response"]
+        documents = result["documents"]
+        serializable_documents = convert_documents_to_dict(documents=documents)
+
+        response_content["prompt_tokens"] = result["prompt_tokens"]
+
+        logger.info(f"AI response: {response_content}")
+        return {
+            "response": response_content,
+            "documents": serializable_documents,
+            "query": result["query"],
+            "intent": result["intent"],
+        }
+
+    def _should_cache(self, chatbot_response: dict, history: str = NO_HISTORY) -> bool:
+        """
+        Only confident answers are worth serving to other askers, and only when they
+        do not depend on an earlier conversation.
+        """
+        return (
+            bool(self.response_cache)
+            and history == NO_HISTORY
+            and chatbot_response["response"]["confidence"] >= MINIMUM_SCORE_CONFIDENCE
+        )
+
+    def _query_inputs(self, inputs: dict, state: dict, query: str) -> dict:
+        return {
+            "user_message": inputs["user_message"],
+            "session_id": inputs.get("session_id"),
+            "history": format_history(state),
+            "query": query,
+        }
+
+    def _get_state(self, session_id: Optional[str]) -> dict:
+        """Loads the session's memory state (empty without memory or session)."""
+        if not (self.memory and session_id):
+            return {"summary": "", "turns": []}
+        return self.memory.get_state(session_id)
+
+    async def _aget_state(self, session_id: Optional[str]) -> dict:
+        if not (self.memory and session_id):
+            return {"summary": "", "turns": []}
+        return await asyncio.to_thread(self.memory.get_state, session_id)
+
+    def _prepare_query(self, inputs: dict) -> dict:
+        """
+        Rewrites a follow-up into a standalone query, using the session state
+        the caller already loaded or loading it here.
+        """
+        state = inputs["state"] if "state" in inputs else self._get_state(inputs.get("session_id"))
+        query = self.query_condenser.condense(inputs["user_message"], state["turns"])
+        return self._query_inputs(inputs, state, query)
+
+    async def _aprepare_query(self, inputs: dict) -> dict:
+        state = inputs["state"] if "state" in inputs else await self._aget_state(inputs.get("session_id"))
+        query = await self.query_condenser.acondense(inputs["user_message"], state["turns"])
+        return self._query_inputs(inputs, state, query)
+
+    def _route(self, inputs: dict) -> dict:
+        """Picks the intent of the query, embedding it once for routing and retrieval."""
+        if not self.intent_router:
+            return {**inputs, "intent": DEFAULT_INTENT, "filter": None, "collections": None, "query_embedding": None}
+
+        embedding = self.retrieval_service.embeddings.embed_query(inputs["query"])
+        return {**inputs, **self.intent_router.route(inputs["query"], embedding), "query_embedding": embedding}
+
+    async def _aroute(self, inputs: dict) -> dict:
+        if not self.intent_router:
+            return {**inputs, "intent": DEFAULT_INTENT, "filter": None, "collections": None, "query_embedding": None}
+
+        embedding = await self.retrieval_service.embeddings.aembed_query(inputs["query"])
+        return {**inputs, **self.intent_router.route(inputs["query"], embedding), "query_embedding": embedding}
+
+    def _retrieve(self, inputs: dict) -> list:
+        """
+        Retrieves the documents for the query with the intent's metadata filter
+        and collections, reusing the previous turn's documents when the query
+        embeds close to the session's last retrieval for the same intent.
+        """
+        query, session_id, intent = inputs["query"], inputs.get("session_id"), inputs["intent"]
+        retriever = self.retrieval_service.get_retriever()
+        if not (self.retrieval_cache and session_id):
+            return retriever.invoke(query, filter=inputs["filter"], collections=inputs["collections"])
+
+        # Cached by CachedEmbeddings, so the retriever's own embedding of the query is free
+        embedding = inputs["query_embedding"] or self.retrieval_service.embeddings.embed_query(query)
+        documents = self.retrieval_cache.lookup(session_id, embedding, intent)
+        if documents is not None:
+            tracer.count("retrieval_reused", 1)
+            return documents
+
+        documents = retriever.invoke(query, filter=inputs["filter"], collections=inputs["collections"])
+        self.retrieval_cache.store(session_id, embedding, documents, intent)
+        return documents
+
+    async def _aretrieve(self, inputs: dict) -> list:
+        query, session_id, intent = inputs["query"], inputs.get("session_id"), inputs["intent"]
+        retriever = self.retrieval_service.get_retriever()
+        if not (self.retrieval_cache and session_id):
+            return await retriever.ainvoke(query, filter=inputs["filter"], collections=inputs["collections"])
+
+        embedding = inputs["query_embedding"] or await self.retrieval_service.embeddings.aembed_query(query)
+        documents = self.retrieval_cache.lookup(session_id, embedding, intent)
+        if documents is not None:
+            tracer.count("retrieval_reused", 1)
+            return documents
+
+        documents = await retriever.ainvoke(query, filter=inputs["filter"], collections=inputs["collections"])
+        self.retrieval_cache.store(session_id, embedding, documents, intent)
+        return documents
+
+    def remember(self, session_id: Optional[str], user_message: str, chatbot_response: dict) -> None:
+        """Queues the turn in the session memory without waiting for the write."""
+        if self.memory and session_id:
+            self.memory.add_turn(
+                session_id, user_message, chatbot_response["response"]["content"], chatbot_response.get("query")
+            )
+
+    def stream_message(self, user_message: str, session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the answer for a user message as a sequence of events.
+
+        Yields a "documents" event with the retrieved documents first, then one
+        "token" event per generated chunk and finally a "confidence" event with
+        the model that answered.
+        Closing the generator stops the upstream LLM stream. The turn is only
+        stored in the session memory once the whole answer has been streamed,
+        and, like in the JSON endpoint, a low-confidence answer is stored as
+        RESPONSE_FOR_LOW_CONFIDENCE.
+        """
+        logger.info(f"Streaming user message: {user_message}")
+
+        state_future = self.memory.prefetch(session_id) if self.memory and session_id else None
+
+        # The embedding is computed while the history loads; the cache is only used without history
+        query_embedding = self.retrieval_service.embeddings.embed_query(user_message) if self.response_cache else None
+        state = state_future.result() if state_future else {"summary": "", "turns": []}
+
+        if self.response_cache and format_history(state) == NO_HISTORY:
+            with tracer.span("response_cache"):
+                cached_response = self.response_cache.lookup(query_embedding)
+            if cached_response:
+                yield {"type": "documents", "documents": cached_response["documents"]}
+                yield {"type": "token", "content": cached_response["response"]["content"]}
+                yield {"type": "confidence", "confidence": cached_response["response"]["confidence"]}
+                self.remember(session_id, user_message, cached_response)
+                return
+
+        query = self.query_condenser.condense(user_message, state["turns"])
+        query_inputs = self._route(self._query_inputs({"user_message": user_message, "session_id": session_id}, state, query))
+        prompt_inputs = self._assemble_context({**query_inputs, "context": self._retrieve(query_inputs)})
+        yield {"type": "documents", "documents": convert_documents_to_dict(documents=prompt_inputs["documents"])}
+
+        content, confidence = [], 0.0
+        for event in self.cascade.stream(prompt_inputs):
+            if event["type"] == "token":
+                content.append(event["content"])
+            elif event["type"] == "confidence":
+                confidence = event["confidence"]
+            yield event
+
+        if content:
+            # Same turn as the JSON endpoint stores: an unreliable answer is not history to build on
+            answer = "".join(content) if confidence >= MINIMUM_SCORE_CONFIDENCE else RESPONSE_FOR_LOW_CONFIDENCE
+            self.remember(session_id, user_message, {"response": {"content": answer}, "query": query})
+
+    def _assemble_context(self, inputs: dict) -> dict:
+        """
+        Build the prompt context from the retrieved documents within the token budget
+        of the intent's template and count the tokens of the resulting prompt.
+        """
+        intent = inputs["intent"]
+        with tracer.span("prompt_build"):
+            context, documents = self.context_builders[intent].build(inputs["context"])
+            prompt_tokens = count_tokens(PROMPT_TEMPLATES[intent].format(
+                context=context, user_message=inputs["user_message"], history=inputs["history"]
+            ))
+
+        tracer.count("prompt_tokens", prompt_tokens)
 
+        logger.info(f"Prompt tokens: {prompt_tokens} ({len(documents)}/{len(inputs['context'])} documents in context)")
         return {
-            "content": model_output.content, 
-            "confidence": rounded_confidence
+            "context": context,
+            "user_message": inputs["user_message"],
+            "history": inputs["history"],
+            "query": inputs.get("query", inputs["user_message"]),
+            "intent": intent,
+            "documents": documents,
+            "prompt_tokens": prompt_tokens,
         }
@@ -0,0 +1,72 @@
+from typing import List, Set, Tuple
+from langchain_core.documents import Document
+from src.services.retrieval.lexical_search import tokenize
+from src.utils.tokens import CHARS_PER_TOKEN, count_tokens
+
+# Word n-gram size used to detect overlapping chunks
+SHINGLE_SIZE = 5
+# A chunk is only cut to fit the budget when at least this many tokens of it remain
+MIN_SECTION_TOKENS = 16
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return {tuple(tokens)}
+    return {tuple(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+class ContextBuilder:
+    """
+    Turns retrieved documents into the {context} of the prompt.
+
+    Only page_content is included, chunks that are mostly contained in an
+    already selected chunk are dropped, and the result is trimmed to a token
+    budget (the last chunk that does not fit is cut, or dropped when too
+    little budget is left for it to say anything).
+    """
+
+    def __init__(self, token_budget: int, overlap_threshold: float = 0.8):
+        self.token_budget = token_budget
+        self.overlap_threshold = overlap_threshold
+
+    def _is_overlapping(self, shingles: Set[Tuple[str, ...]], selected: List[Set[Tuple[str, ...]]]) -> bool:
+        for other in selected:
+            smaller = min(len(shingles), len(other)) or 1
+            if len(shingles & other) / smaller >= self.overlap_threshold:
+                return True
+        return False
+
+    def build(self, documents: List[Document]) -> Tuple[str, List[Document]]:
+        """Returns the formatted context and the documents it was built from."""
+        sections, used_documents, selected_shingles = [], [], []
+        used_tokens = 0
+
+        for document in documents:
+            content = document.page_content.strip()
+            if not content:
+                continue
+
+            shingles = _shingles(content)
+            if self._is_overlapping(shingles, selected_shingles):
+                continue
+
+            remaining = self.token_budget - used_tokens
+            if remaining <= 0:
+                break
+
+            section = f"[{len(sections) + 1}] {content}"
+            tokens = count_tokens(section)
+
+            if tokens > remaining:
+                if remaining < MIN_SECTION_TOKENS:
+                    # A stub like "[3] Para..." would only be cited; a later, shorter chunk may still fit whole
+                    continue
+                section = section[:remaining * CHARS_PER_TOKEN].rsplit(" ", 1)[0] + "..."
+                tokens = remaining
+
+            sections.append(section)
+            used_documents.append(document)
+            selected_shingles.append(shingles)
+            used_tokens += tokens
+
+        return "\n\n".join(sections), used_documents
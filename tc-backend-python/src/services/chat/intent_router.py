@@ -0,0 +1,157 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.services.retrieval.metadata_filters import validate_filter
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+from src.utils.environment import (
+    INTENT_COLLECTIONS,
+    INTENT_KEYWORD_WEIGHT,
+    INTENT_RETRIEVAL_FILTERS,
+    INTENT_ROUTER_ENABLED,
+    PROMPT_TEMPLATE,
+)
+
+DEFAULT_INTENT = PROMPT_TEMPLATE or "general_query"
+
+# Example questions per intent; each intent's centroid is the mean of their embeddings
+INTENT_EXAMPLES = {
+    "general_query": [
+        "¿Cuántas pantallas permite el plan Premium?",
+        "¿Cómo restablece el suscriptor su contraseña?",
+        "¿Qué velocidad de conexión se necesita para ver contenido en 4K?",
+        "¿En qué dispositivos se puede usar la aplicación?",
+    ],
+    "billing_query": [
+        "¿Cómo actualizo el método de pago de un suscriptor?",
+        "El suscriptor tiene un cargo duplicado en su factura",
+        "¿Cuánto tarda en reflejarse un reembolso?",
+        "¿Cómo se cobra la diferencia al cambiar a un plan superior?",
+    ],
+    "fraud_detection": [
+        "¿Cómo detecto un consumo fraudulento en la cuenta?",
+        "El suscriptor reporta cargos que no reconoce",
+        "Hay inicios de sesión sospechosos desde otro país",
+        "Creo que robaron la cuenta del suscriptor",
+    ],
+    "procedure_summary": [
+        "Resume el procedimiento de cancelación de una membresía",
+        "Dame un resumen de los pasos para escalar un caso",
+        "Explica paso a paso el procedimiento completo de reembolso",
+    ],
+}
+
+# Terms that are strong evidence of an intent
+INTENT_KEYWORDS = {
+    "billing_query": [
+        "factura", "facturación", "facturacion", "cobro", "cobra", "cargo", "pago", "reembolso", "tarjeta",
+        "precio", "tarifa", "descuento", "impuesto", "suscripción anual", "plan anual",
+    ],
+    "fraud_detection": [
+        "fraude", "fraudulento", "fraudulenta", "sospechoso", "sospechosa", "no reconoce", "hackeo", "hackeada",
+        "robo", "robaron", "phishing", "suplantación", "no autorizado", "contracargo",
+    ],
+    "procedure_summary": [
+        "resume", "resumen", "resumir", "paso a paso", "procedimiento completo", "todos los pasos",
+    ],
+}
+
+
+def _keyword_pattern(keywords: List[str]) -> re.Pattern:
+    # Prefix match, so "cargo" also counts "cargos"
+    return re.compile(r"\b(" + "|".join(re.escape(keyword) for keyword in keywords) + ")", re.IGNORECASE)
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class IntentRouter:
+    """
+    CPU-only intent classifier that picks the prompt template of each message.
+
+    An intent's score is the cosine similarity between the query embedding (the
+    one already computed for retrieval) and the centroid of its example
+    questions, plus keyword_weight per matched keyword (up to two). The example
+    embeddings are computed once, on first use. Each intent can carry a
+    metadata filter for retrieval and the collections to search.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        examples: Dict[str, List[str]] = INTENT_EXAMPLES,
+        keywords: Dict[str, List[str]] = INTENT_KEYWORDS,
+        keyword_weight: float = INTENT_KEYWORD_WEIGHT,
+        retrieval_filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        default_intent: str = DEFAULT_INTENT,
+        collections: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.embeddings = embeddings
+        self.examples = examples
+        self.keyword_patterns = {intent: _keyword_pattern(terms) for intent, terms in keywords.items()}
+        self.keyword_weight = keyword_weight
+        self.retrieval_filters = {
+            intent: validate_filter(metadata_filter)
+            for intent, metadata_filter in (INTENT_RETRIEVAL_FILTERS if retrieval_filters is None else retrieval_filters).items()
+        }
+        self.collections = INTENT_COLLECTIONS if collections is None else collections
+        self.default_intent = default_intent
+
+        self.intents = list(examples)
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """One unit-length centroid row per intent, in self.intents order."""
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    texts = [text for intent in self.intents for text in self.examples[intent]]
+                    vectors = _normalize(self.embeddings.embed_documents(texts))
+
+                    rows, start = [], 0
+                    for intent in self.intents:
+                        end = start + len(self.examples[intent])
+                        rows.append(vectors[start:end].mean(axis=0))
+                        start = end
+                    self._centroids = _normalize(rows)
+        return self._centroids
+
+    def scores(self, question: str, embedding: List[float]) -> Dict[str, float]:
+        similarities = self.centroids @ _normalize(embedding)[0]
+        scores = {}
+        for intent, similarity in zip(self.intents, similarities):
+            pattern = self.keyword_patterns.get(intent)
+            hits = len(pattern.findall(question)) if pattern else 0
+            scores[intent] = float(similarity) + self.keyword_weight * min(hits, 2)
+        return scores
+
+    def route(self, question: str, embedding: List[float]) -> Dict[str, Any]:
+        """Returns the intent of a question, its retrieval filter and collections (None when unrestricted)."""
+        with tracer.span("intent_routing"):
+            try:
+                scores = self.scores(question, embedding)
+                intent = max(scores, key=scores.get)
+            except Exception as e:
+                logger.error(f"Error routing question, using {self.default_intent}: {e}")
+                intent = self.default_intent
+
+        logger.info(f"Routed question to {intent}")
+        return {"intent": intent, "filter": self.retrieval_filters.get(intent), "collections": self.collections.get(intent)}
+
+
+def create_intent_router(embeddings: Embeddings) -> Optional[IntentRouter]:
+    """Creates the intent router, if enabled; otherwise every message uses PROMPT_TEMPLATE."""
+    if not INTENT_ROUTER_ENABLED:
+        logger.info(f"Intent routing disabled, using {DEFAULT_INTENT}")
+        return None
+
+    logger.info("Using embedding centroid intent routing")
+    return IntentRouter(embeddings)
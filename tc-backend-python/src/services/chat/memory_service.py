@@ -0,0 +1,446 @@
+import concurrent.futures
+import contextvars
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import text
+from src.services.retrieval.db_engine import get_engine
+from src.utils.logger import logger
+from src.utils.tokens import count_tokens, truncate_to_tokens
+from src.utils.tracing import tracer
+from src.utils.environment import (
+    MEMORY_BACKEND,
+    MEMORY_ENABLED,
+    MEMORY_MAX_MESSAGE_TOKENS,
+    MEMORY_MAX_SESSIONS,
+    MEMORY_MAX_TURNS,
+    MEMORY_SQLITE_PATH,
+    MEMORY_SUMMARY_ENABLED,
+    MEMORY_SUMMARY_MAX_TOKENS,
+    MEMORY_TABLE,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_TTL_SECONDS,
+    MEMORY_WRITE_TIMEOUT_SECONDS,
+)
+
+# {history} of the prompt when the session has no previous turns
+NO_HISTORY = "Sin conversación previa."
+
+# Seconds a history read waits for a pending write of the same session
+READ_AFTER_WRITE_TIMEOUT_SECONDS = 2.0
+
+Summarizer = Callable[[str, List[Dict[str, Any]]], str]
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {"summary": "", "turns": []}
+
+
+def format_turns(turns: List[Dict[str, Any]]) -> str:
+    """Renders turns as alternating advisor / assistant lines."""
+    return "\n".join(f"Asesor: {turn['user']}\nAsistente: {turn['assistant']}" for turn in turns)
+
+
+def format_history(state: Dict[str, Any]) -> str:
+    """Renders a session state as the {history} of the prompt."""
+    sections = []
+    if state["summary"]:
+        sections.append(f"Resumen de la conversación: {state['summary']}")
+    if state["turns"]:
+        sections.append(format_turns(state["turns"]))
+    return "\n".join(sections) or NO_HISTORY
+
+
+class MemoryBackend:
+    """
+    Storage interface for session states ({"summary": ..., "turns": [...]}).
+    """
+
+    def get(self, session_id: str, min_updated_at: float) -> Optional[Dict[str, Any]]:
+        """Returns the session state if it was updated after min_updated_at."""
+        raise NotImplementedError
+
+    def put(self, session_id: str, state: Dict[str, Any], min_updated_at: float) -> None:
+        """Stores the session state and drops sessions not updated since min_updated_at."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        """Returns the number of stored sessions."""
+        raise NotImplementedError
+
+
+class InMemoryMemoryBackend(MemoryBackend):
+    """
+    In-process backend: an LRU ordered dict capped at max_sessions, so a warm
+    container keeps a bounded number of conversations.
+    """
+
+    def __init__(self, max_sessions: int = MEMORY_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, min_updated_at):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry["updated_at"] < min_updated_at:
+                del self._sessions[session_id]
+                return None
+
+            self._sessions.move_to_end(session_id)
+            return copy.deepcopy(entry["state"])
+
+    def put(self, session_id, state, min_updated_at):
+        with self._lock:
+            self._sessions[session_id] = {"state": copy.deepcopy(state), "updated_at": time.time()}
+            self._sessions.move_to_end(session_id)
+
+            expired = [key for key, entry in self._sessions.items() if entry["updated_at"] < min_updated_at]
+            for key in expired:
+                del self._sessions[key]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteMemoryBackend(MemoryBackend):
+    """
+    Local stand-in for the shared store: states are serialized to JSON in a
+    SQLite file, so several processes on one machine see the same sessions.
+    """
+
+    def __init__(self, path: str = MEMORY_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_memory (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, session_id, min_updated_at):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM chat_memory WHERE session_id = ? AND updated_at >= ?", (session_id, min_updated_at)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, session_id, state, min_updated_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_memory (session_id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(state), time.time()),
+            )
+            self._conn.execute("DELETE FROM chat_memory WHERE updated_at < ?", (min_updated_at,))
+            self._conn.commit()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_memory WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chat_memory").fetchone()[0]
+
+
+class PostgresMemoryBackend(MemoryBackend):
+    """
+    Shared backend stored in a Postgres table, so a conversation continues when
+    its next message is served by another Lambda container.
+    """
+
+    def __init__(self, table_name: str = MEMORY_TABLE, engine=None):
+        self.table_name = table_name
+        self.engine = engine or get_engine()
+        self._create_table()
+
+    def _create_table(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table_name} (
+                    session_id TEXT PRIMARY KEY,
+                    state JSONB NOT NULL,
+                    updated_at DOUBLE PRECISION NOT NULL
+                )
+                """
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {self.table_name}_updated_at_idx ON {self.table_name} (updated_at)"
+            ))
+
+    def get(self, session_id, min_updated_at):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text(f"SELECT state FROM {self.table_name} WHERE session_id = :session_id AND updated_at >= :min_updated_at"),
+                {"session_id": session_id, "min_updated_at": min_updated_at},
+            ).first()
+
+        if row is None:
+            return None
+        return row.state if isinstance(row.state, dict) else json.loads(row.state)
+
+    def put(self, session_id, state, min_updated_at):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"""
+                    INSERT INTO {self.table_name} (session_id, state, updated_at)
+                    VALUES (:session_id, CAST(:state AS JSONB), :now)
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET state = EXCLUDED.state, updated_at = EXCLUDED.updated_at
+                    """
+                ),
+                {"session_id": session_id, "state": json.dumps(state), "now": time.time()},
+            )
+            conn.execute(
+                text(f"DELETE FROM {self.table_name} WHERE updated_at < :min_updated_at"),
+                {"min_updated_at": min_updated_at},
+            )
+
+    def delete(self, session_id):
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.table_name} WHERE session_id = :session_id"), {"session_id": session_id})
+
+    def size(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {self.table_name}")).scalar_one()
+
+
+class ConversationMemory:
+    """
+    Session-keyed conversation memory consumed by the chat chain as {history}.
+
+    Each session keeps at most max_turns turns and token_budget tokens (every
+    message is first cut to max_message_tokens). Turns pushed out of the buffer
+    are folded into a rolling summary when a summarizer is given, otherwise they
+    are dropped. Writes go through a single background thread, so the turns of
+    a session are stored in order; reads run on a small pool so they can
+    overlap retrieval.
+
+    With wait_for_writes, add_turn waits up to write_timeout seconds for the
+    write. Shared backends need it: Lambda freezes the process once the
+    handler returns, and the session's next request may reach another
+    container before a queued write has run.
+    """
+
+    def __init__(
+        self,
+        backend: MemoryBackend,
+        max_turns: int = MEMORY_MAX_TURNS,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        max_message_tokens: int = MEMORY_MAX_MESSAGE_TOKENS,
+        ttl_seconds: int = MEMORY_TTL_SECONDS,
+        summarizer: Optional[Summarizer] = None,
+        summary_max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS,
+        wait_for_writes: bool = False,
+        write_timeout: float = MEMORY_WRITE_TIMEOUT_SECONDS,
+    ):
+        self.backend = backend
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.max_message_tokens = max_message_tokens
+        self.ttl_seconds = ttl_seconds
+        self.summarizer = summarizer
+        self.summary_max_tokens = summary_max_tokens
+        self.wait_for_writes = wait_for_writes
+        self.write_timeout = write_timeout
+
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-writer")
+        self._readers = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-reader")
+        self._pending_writes: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"reads": 0, "writes": 0, "summaries": 0, "dropped_turns": 0, "errors": 0}
+
+    def _increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _min_updated_at(self) -> float:
+        return time.time() - self.ttl_seconds
+
+    def _wait_for_pending_write(self, session_id: str) -> None:
+        # Read-your-writes within the container: the previous turn may still be queued
+        with self._lock:
+            pending = self._pending_writes.get(session_id)
+        if pending is not None:
+            concurrent.futures.wait([pending], timeout=READ_AFTER_WRITE_TIMEOUT_SECONDS)
+
+    def load(self, session_id: str) -> Dict[str, Any]:
+        """Returns the stored state of a session, or an empty one."""
+        self._wait_for_pending_write(session_id)
+        self._increment("reads")
+        return self.backend.get(session_id, self._min_updated_at()) or _empty_state()
+
+    def get_state(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Returns the state of a session. Backend errors are logged and the
+        question is answered without history.
+        """
+        if not session_id:
+            return _empty_state()
+
+        try:
+            with tracer.span("memory_read"):
+                return self.load(session_id)
+        except Exception as e:
+            logger.error(f"Error reading conversation memory: {e}")
+            self._increment("errors")
+            return _empty_state()
+
+    def get_history(self, session_id: Optional[str]) -> str:
+        """Returns the formatted history of a session."""
+        return format_history(self.get_state(session_id))
+
+    def prefetch(self, session_id: Optional[str]) -> concurrent.futures.Future:
+        """Starts get_state on the reader pool, within the current trace."""
+        return self._readers.submit(contextvars.copy_context().run, self.get_state, session_id)
+
+    def add_turn(
+        self, session_id: Optional[str], user_message: str, assistant_message: str, query: Optional[str] = None
+    ) -> Optional[concurrent.futures.Future]:
+        """
+        Queues a turn to be appended to the session; returns immediately unless
+        wait_for_writes is set. query is the standalone retrieval query when the
+        question was rewritten.
+        """
+        if not session_id:
+            return None
+
+        future = self._writer.submit(self._append_turn, session_id, user_message, assistant_message, query)
+        with self._lock:
+            self._pending_writes[session_id] = future
+        future.add_done_callback(lambda done: self._forget_write(session_id, done))
+
+        if self.wait_for_writes:
+            with tracer.span("memory_write"):
+                done, _ = concurrent.futures.wait([future], timeout=self.write_timeout)
+            if not done:
+                logger.warning(f"Conversation memory write for session {session_id} still pending after {self.write_timeout}s")
+        return future
+
+    def _forget_write(self, session_id: str, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            if self._pending_writes.get(session_id) is future:
+                del self._pending_writes[session_id]
+
+    def _append_turn(self, session_id: str, user_message: str, assistant_message: str, query: Optional[str]) -> None:
+        try:
+            state = self.backend.get(session_id, self._min_updated_at()) or _empty_state()
+
+            user_message = truncate_to_tokens(user_message, self.max_message_tokens)
+            assistant_message = truncate_to_tokens(assistant_message, self.max_message_tokens)
+            turn = {
+                "user": user_message,
+                "assistant": assistant_message,
+                "tokens": count_tokens(user_message) + count_tokens(assistant_message),
+            }
+            if query and query != user_message:
+                turn["query"] = truncate_to_tokens(query, self.max_message_tokens)
+            state["turns"].append(turn)
+
+            self._trim(state)
+            self.backend.put(session_id, state, self._min_updated_at())
+            self._increment("writes")
+        except Exception as e:
+            logger.error(f"Error writing conversation memory: {e}")
+            self._increment("errors")
+
+    def _trim(self, state: Dict[str, Any]) -> None:
+        """Pops the oldest turns until the session fits max_turns and the token budget."""
+        summary_tokens = count_tokens(state["summary"]) if state["summary"] else 0
+        dropped = []
+
+        while len(state["turns"]) > 1 and (
+            len(state["turns"]) > self.max_turns
+            or summary_tokens + sum(turn["tokens"] for turn in state["turns"]) > self.token_budget
+        ):
+            dropped.append(state["turns"].pop(0))
+
+        if not dropped:
+            return
+
+        self._increment("dropped_turns", len(dropped))
+        if self.summarizer is None:
+            return
+
+        try:
+            summary = self.summarizer(state["summary"], dropped)
+            state["summary"] = truncate_to_tokens(summary.strip(), self.summary_max_tokens)
+            self._increment("summaries")
+        except Exception as e:
+            logger.error(f"Error summarizing conversation memory: {e}")
+            self._increment("errors")
+
+    def clear(self, session_id: str) -> None:
+        """Forgets a session."""
+        self._wait_for_pending_write(session_id)
+        self.backend.delete(session_id)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Waits for the queued writes, e.g. before a process exits."""
+        with self._lock:
+            pending = list(self._pending_writes.values())
+        concurrent.futures.wait(pending, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns read/write/summary counters and the number of stored sessions."""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["pending_writes"] = len(self._pending_writes)
+        counters["sessions"] = self.backend.size()
+        return counters
+
+
+def build_llm_summarizer(llm) -> Summarizer:
+    """Returns a summarizer that folds dropped turns into the running summary with the LLM."""
+    from src.services.chat.prompt_templates import memory_summary_prompt
+
+    chain = memory_summary_prompt | llm
+
+    def summarize(summary: str, turns: List[Dict[str, Any]]) -> str:
+        message = chain.invoke({"summary": summary or NO_HISTORY, "turns": format_turns(turns)})
+        return message.content if hasattr(message, "content") else str(message)
+
+    return summarize
+
+
+def create_conversation_memory(llm=None) -> Optional[ConversationMemory]:
+    """Creates the conversation memory configured in the environment, if enabled."""
+    if not MEMORY_ENABLED:
+        return None
+
+    summarizer = build_llm_summarizer(llm) if MEMORY_SUMMARY_ENABLED and llm is not None else None
+
+    if MEMORY_BACKEND == "memory":
+        logger.info("Using in-memory conversation memory")
+        return ConversationMemory(InMemoryMemoryBackend(), summarizer=summarizer)
+
+    elif MEMORY_BACKEND == "sqlite":
+        logger.info(f"Using SQLite conversation memory at {MEMORY_SQLITE_PATH}")
+        return ConversationMemory(SQLiteMemoryBackend(), summarizer=summarizer)
+
+    elif MEMORY_BACKEND == "postgres":
+        logger.info("Using Postgres conversation memory")
+        # Shared between containers, so the turn must be stored before the handler returns
+        return ConversationMemory(PostgresMemoryBackend(), summarizer=summarizer, wait_for_writes=True)
+
+    else:
+        raise ValueError(f"Unsupported conversation memory backend: {MEMORY_BACKEND}")
@@ -9,6 +9,9 @@ general_query_prompt = PromptTemplate.from_template(
     **Contexto:**
     {context}
 
+    **Conversación previa con el asesor:**
+    {history}
+
     **Pregunta del asesor:**
     {user_message}
 
@@ -25,6 +28,9 @@ billing_query_prompt = PromptTemplate.from_template(
     **Contexto:**
     {context}
 
+    **Conversación previa con el asesor:**
+    {history}
+
     **Pregunta del asesor:**
     {user_message}
 
@@ -41,6 +47,9 @@ fraud_detection_prompt = PromptTemplate.from_template(
     **Contexto:**
     {context}
 
+    **Conversación previa con el asesor:**
+    {history}
+
     **Caso reportado por el asesor:**
     {user_message}
 
@@ -51,15 +60,62 @@ fraud_detection_prompt = PromptTemplate.from_template(
 # Prompt to summarize long procedures
 procedure_summary_prompt = PromptTemplate.from_template(
     """
-    Eres un asistente de soporte técnico. Simplifica y resume los procedimientos detallados en la documentación.
+    Eres un asistente de soporte técnico. Simplifica y resume los procedimientos detallados en la documentación,
+    centrándote en lo que pide el asesor.
 
     **Procedimiento original:**
     {context}
 
+    **Conversación previa con el asesor:**
+    {history}
+
+    **Solicitud del asesor:**
+    {user_message}
+
     **Resumen en pasos claros para el asesor de soporte:**
     """
 )
 
+# Prompt to fold old turns of a conversation into its running summary
+memory_summary_prompt = PromptTemplate.from_template(
+    """
+    Resume en pocas frases la conversación entre un asesor de soporte y el asistente, conservando los datos
+    necesarios para entender las siguientes preguntas (plan, método de pago, incidencia, pasos ya realizados).
+
+    **Resumen anterior:**
+    {summary}
+
+    **Nuevos mensajes:**
+    {turns}
+
+    **Resumen actualizado:**
+    """
+)
+
+# Prompt to rewrite a follow-up question as a standalone search query
+condense_question_prompt = PromptTemplate.from_template(
+    """
+    Reescribe la última pregunta del asesor como una pregunta independiente que se entienda sin la conversación,
+    incluyendo el plan, servicio o problema al que se refiere. Responde solo con la pregunta reescrita.
+
+    **Conversación previa:**
+    {history}
+
+    **Última pregunta:**
+    {user_message}
+
+    **Pregunta independiente:**
+    """
+)
+
+# Token budget for the {context} of each prompt; summaries need the full procedure
+CONTEXT_TOKEN_BUDGETS = {
+    "general_query": 1500,
+    "billing_query": 1500,
+    "fraud_detection": 2000,
+    "procedure_summary": 3000,
+}
+
 # Export prompts
 
 PROMPT_TEMPLATES = {
@@ -0,0 +1,210 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from src.services.chat.memory_service import format_turns
+from src.utils.logger import logger
+from src.utils.text_normalization import normalize_whitespace
+from src.utils.tokens import CHARS_PER_TOKEN, truncate_to_tokens
+from src.utils.tracing import tracer
+from src.utils.environment import (
+    MEMORY_MAX_SESSIONS,
+    QUERY_REWRITE_MAX_TOKENS,
+    QUERY_REWRITE_MAX_WORDS,
+    QUERY_REWRITE_MODE,
+    QUERY_REWRITE_MODEL_ID,
+    RETRIEVAL_REUSE_ENABLED,
+    RETRIEVAL_REUSE_SIMILARITY,
+    RETRIEVAL_REUSE_TTL_SECONDS,
+)
+
+# Openers that make a question lean on the previous turn ("¿y si es anual?", "pero entonces...")
+FOLLOW_UP_OPENER_PATTERN = re.compile(
+    r"^¿?\s*(y|pero|entonces|tambi[eé]n|adem[aá]s|o sea|en ese caso|qu[eé] pasa si)\b",
+    re.IGNORECASE,
+)
+# Demonstratives that point back to something said before
+ANAPHORA_PATTERN = re.compile(
+    r"\b(eso|esto|ese|esa|esos|esas|aquel|aquella|aquello|lo mismo|ah[ií]|all[ií])\b",
+    re.IGNORECASE,
+)
+
+# Previous turns shown to the LLM rewriter
+REWRITE_HISTORY_TURNS = 2
+
+
+class QueryCondenser:
+    """
+    Rewrites follow-up questions into standalone retrieval queries.
+
+    A question is a follow-up when it opens with a connector, points back with a
+    demonstrative or is a fragment of at most max_words words ("¿Anual?").
+    The word limit stays small: a short question is usually a complete one
+    ("¿Cómo pago mi factura?"), and prefixing it with the previous query would
+    steer retrieval, and the retrieval reuse check, back to the previous turn. In "heuristic" mode it is
+    prefixed with the previous turn's query; in "llm" mode a (cheap) model
+    rewrites it from the last turns, falling back to the heuristic on errors.
+    Standalone questions and questions without history are never rewritten.
+    """
+
+    def __init__(self, mode: str = QUERY_REWRITE_MODE, llm=None, max_words: int = QUERY_REWRITE_MAX_WORDS, max_tokens: int = QUERY_REWRITE_MAX_TOKENS):
+        self.mode = mode
+        self.max_words = max_words
+        self.max_tokens = max_tokens
+        self.chain = None
+
+        if mode == "llm":
+            from src.services.chat.prompt_templates import condense_question_prompt
+
+            self.chain = condense_question_prompt | llm
+
+    def is_follow_up(self, question: str) -> bool:
+        question = question.strip()
+        return (
+            bool(FOLLOW_UP_OPENER_PATTERN.match(question))
+            or bool(ANAPHORA_PATTERN.search(question))
+            or len(question.split()) <= self.max_words
+        )
+
+    def needs_rewrite(self, question: str, turns: List[Dict[str, Any]]) -> bool:
+        """True when the question will be rewritten into a standalone query."""
+        return self.mode != "off" and bool(turns) and self.is_follow_up(question)
+
+    def _heuristic(self, question: str, turns: List[Dict[str, Any]]) -> str:
+        previous = turns[-1].get("query") or turns[-1]["user"]
+        combined = f"{previous} {question}"
+
+        # The previous query may itself be a rewrite; keep the most recent words within the budget
+        max_chars = self.max_tokens * CHARS_PER_TOKEN
+        return combined if len(combined) <= max_chars else combined[-max_chars:].split(" ", 1)[-1]
+
+    def _rewrite_inputs(self, question: str, turns: List[Dict[str, Any]]) -> Dict[str, str]:
+        return {"history": format_turns(turns[-REWRITE_HISTORY_TURNS:]), "user_message": question}
+
+    def _clean(self, rewritten: Any, question: str, turns: List[Dict[str, Any]]) -> str:
+        content = rewritten.content if hasattr(rewritten, "content") else str(rewritten)
+        content = normalize_whitespace(content)
+        return truncate_to_tokens(content, self.max_tokens) if content else self._heuristic(question, turns)
+
+    def condense(self, question: str, turns: List[Dict[str, Any]]) -> str:
+        """Returns the retrieval query for a question given the session turns."""
+        if not self.needs_rewrite(question, turns):
+            return question
+
+        with tracer.span("query_rewrite"):
+            if self.chain is None:
+                return self._heuristic(question, turns)
+
+            try:
+                return self._clean(self.chain.invoke(self._rewrite_inputs(question, turns)), question, turns)
+            except Exception as e:
+                logger.error(f"Error rewriting follow-up question: {e}")
+                return self._heuristic(question, turns)
+
+    async def acondense(self, question: str, turns: List[Dict[str, Any]]) -> str:
+        """Async version of condense."""
+        if not self.needs_rewrite(question, turns):
+            return question
+
+        with tracer.span("query_rewrite"):
+            if self.chain is None:
+                return self._heuristic(question, turns)
+
+            try:
+                return self._clean(await self.chain.ainvoke(self._rewrite_inputs(question, turns)), question, turns)
+            except Exception as e:
+                logger.error(f"Error rewriting follow-up question: {e}")
+                return self._heuristic(question, turns)
+
+
+class ConversationRetrievalCache:
+    """
+    Last retrieval of each session, kept in process.
+
+    When the next query of the same session is routed to the same intent and
+    embeds close enough to the previous one, its documents are returned and the
+    vector search is skipped. The cache
+    holds at most max_sessions sessions (LRU) and forgets entries after
+    ttl_seconds.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = RETRIEVAL_REUSE_SIMILARITY,
+        ttl_seconds: int = RETRIEVAL_REUSE_TTL_SECONDS,
+        max_sessions: int = MEMORY_MAX_SESSIONS,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"reused": 0, "retrieved": 0}
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, session_id: str, embedding: List[float], intent: Optional[str] = None) -> Optional[List[Document]]:
+        """Returns the previous documents of the session if the query is on the same topic."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry["created_at"] < time.time() - self.ttl_seconds:
+                del self._entries[session_id]
+                entry = None
+
+            if (
+                entry is None
+                or entry["intent"] != intent
+                or float(entry["embedding"] @ self._normalize(embedding)) < self.similarity_threshold
+            ):
+                self._counters["retrieved"] += 1
+                return None
+
+            self._entries.move_to_end(session_id)
+            self._counters["reused"] += 1
+            return list(entry["documents"])
+
+    def store(self, session_id: str, embedding: List[float], documents: List[Document], intent: Optional[str] = None) -> None:
+        with self._lock:
+            self._entries[session_id] = {
+                "embedding": self._normalize(embedding),
+                "intent": intent,
+                "documents": list(documents),
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns reuse counters and the number of sessions held."""
+        with self._lock:
+            return {**self._counters, "sessions": len(self._entries)}
+
+
+def create_query_condenser() -> QueryCondenser:
+    """Creates the follow-up rewriter configured in the environment."""
+    if QUERY_REWRITE_MODE in ("heuristic", "off"):
+        logger.info(f"Using {QUERY_REWRITE_MODE} follow-up query rewriting")
+        return QueryCondenser(QUERY_REWRITE_MODE)
+
+    elif QUERY_REWRITE_MODE == "llm":
+        from src.services.generation.llm_factory import LLMFactory
+
+        logger.info(f"Using LLM follow-up query rewriting ({QUERY_REWRITE_MODEL_ID or 'default model'})")
+        return QueryCondenser("llm", llm=LLMFactory.create_llm(QUERY_REWRITE_MODEL_ID or None))
+
+    else:
+        raise ValueError(f"Unsupported query rewrite mode: {QUERY_REWRITE_MODE}")
+
+
+def create_retrieval_cache() -> Optional[ConversationRetrievalCache]:
+    """Creates the per-session retrieval reuse cache, if enabled."""
+    return ConversationRetrievalCache() if RETRIEVAL_REUSE_ENABLED else None
@@ -0,0 +1,293 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from src.services.retrieval.db_engine import get_engine
+from src.utils.logger import logger
+from src.utils.environment import (
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    RESPONSE_CACHE_TABLE,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+
+
+def _cache_key(question: str) -> str:
+    """Builds a stable key for a normalized question."""
+    return hashlib.sha256(question.strip().lower().encode("utf-8")).hexdigest()
+
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    """Returns the embedding as a unit-length float32 vector."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class CacheBackend:
+    """
+    Storage interface for the semantic response cache.
+
+    Backends return the closest stored entry for a query embedding and take care
+    of TTL expiration and size-based eviction.
+    """
+
+    def find_nearest(self, embedding: np.ndarray, min_created_at: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Returns the closest non-expired entry payload and its cosine similarity."""
+        raise NotImplementedError
+
+    def put(self, key: str, embedding: np.ndarray, payload: Dict[str, Any], max_entries: int) -> int:
+        """Stores an entry and returns how many entries were evicted."""
+        raise NotImplementedError
+
+    def size(self) -> int:
+        """Returns the number of stored entries."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    In-process backend: an LRU ordered dict plus a stacked embedding matrix so a
+    lookup is a single matrix-vector product.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self._lock = threading.Lock()
+
+    def _rebuild_matrix(self) -> None:
+        self._keys = list(self._entries.keys())
+        self._matrix = np.vstack([self._entries[key]["embedding"] for key in self._keys]) if self._keys else None
+
+    def find_nearest(self, embedding, min_created_at):
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry["created_at"] < min_created_at]
+            for key in expired:
+                del self._entries[key]
+            if expired or self._matrix is None or len(self._keys) != len(self._entries):
+                self._rebuild_matrix()
+
+            if self._matrix is None:
+                return None
+
+            similarities = self._matrix @ embedding
+            best = int(np.argmax(similarities))
+            key = self._keys[best]
+
+            self._entries.move_to_end(key)
+            return copy.deepcopy(self._entries[key]["payload"]), float(similarities[best])
+
+    def put(self, key, embedding, payload, max_entries):
+        with self._lock:
+            self._entries[key] = {
+                "embedding": embedding,
+                "payload": copy.deepcopy(payload),
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+
+            evicted = 0
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+
+            self._rebuild_matrix()
+            return evicted
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rebuild_matrix()
+
+
+class PostgresCacheBackend(CacheBackend):
+    """
+    Shared backend stored in a pgvector table, so every Lambda container pointed
+    at the same database benefits from hits produced by the others.
+    """
+
+    def __init__(self, table_name: str = RESPONSE_CACHE_TABLE, engine=None):
+        self.table_name = table_name
+        self.engine = engine or get_engine()
+        self._create_table()
+
+    def _create_table(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            conn.execute(text(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table_name} (
+                    id TEXT PRIMARY KEY,
+                    embedding vector NOT NULL,
+                    payload JSONB NOT NULL,
+                    created_at DOUBLE PRECISION NOT NULL,
+                    last_hit_at DOUBLE PRECISION NOT NULL
+                )
+                """
+            ))
+
+    @staticmethod
+    def _to_vector_literal(embedding: np.ndarray) -> str:
+        return "[" + ",".join(f"{value:.7g}" for value in embedding.tolist()) + "]"
+
+    def find_nearest(self, embedding, min_created_at):
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                text(
+                    f"""
+                    SELECT id, payload, 1 - (embedding <=> CAST(:embedding AS vector)) AS similarity
+                    FROM {self.table_name}
+                    WHERE created_at >= :min_created_at
+                    ORDER BY embedding <=> CAST(:embedding AS vector)
+                    LIMIT 1
+                    """
+                ),
+                {"embedding": self._to_vector_literal(embedding), "min_created_at": min_created_at},
+            ).first()
+
+            if row is None:
+                return None
+
+            conn.execute(
+                text(f"UPDATE {self.table_name} SET last_hit_at = :now WHERE id = :id"),
+                {"now": time.time(), "id": row.id},
+            )
+
+        payload = row.payload if isinstance(row.payload, dict) else json.loads(row.payload)
+        return payload, float(row.similarity)
+
+    def put(self, key, embedding, payload, max_entries):
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"""
+                    INSERT INTO {self.table_name} (id, embedding, payload, created_at, last_hit_at)
+                    VALUES (:id, CAST(:embedding AS vector), CAST(:payload AS JSONB), :now, :now)
+                    ON CONFLICT (id) DO UPDATE
+                    SET embedding = EXCLUDED.embedding, payload = EXCLUDED.payload,
+                        created_at = EXCLUDED.created_at, last_hit_at = EXCLUDED.last_hit_at
+                    """
+                ),
+                {"id": key, "embedding": self._to_vector_literal(embedding), "payload": json.dumps(payload), "now": now},
+            )
+            result = conn.execute(
+                text(
+                    f"""
+                    DELETE FROM {self.table_name} WHERE id IN (
+                        SELECT id FROM {self.table_name} ORDER BY last_hit_at DESC OFFSET :max_entries
+                    )
+                    """
+                ),
+                {"max_entries": max_entries},
+            )
+            return result.rowcount or 0
+
+    def size(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {self.table_name}")).scalar_one()
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.table_name}"))
+
+
+class SemanticResponseCache:
+    """
+    Embedding-keyed cache of chatbot answers.
+
+    A lookup returns a stored answer when the cosine similarity between the query
+    embedding and a cached question is above the configured threshold.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        similarity_threshold: float = RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+    ):
+        self.backend = backend
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+    def _increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def lookup(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached response for the closest question, or None on a miss.
+        Backend errors are logged and treated as misses.
+        """
+        try:
+            match = self.backend.find_nearest(_normalize(embedding), time.time() - self.ttl_seconds)
+        except Exception as e:
+            logger.error(f"Error reading semantic cache: {e}")
+            self._increment("errors")
+            return None
+
+        if match is None or match[1] < self.similarity_threshold:
+            self._increment("misses")
+            return None
+
+        payload, similarity = match
+        logger.info(f"Semantic cache hit (similarity={similarity:.4f})")
+        self._increment("hits")
+        return payload
+
+    def store(self, embedding: List[float], question: str, payload: Dict[str, Any]) -> None:
+        """Stores the response payload for a question."""
+        try:
+            evicted = self.backend.put(_cache_key(question), _normalize(embedding), payload, self.max_entries)
+            self._increment("stores")
+            self._increment("evictions", evicted)
+        except Exception as e:
+            logger.error(f"Error writing semantic cache: {e}")
+            self._increment("errors")
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and the hit ratio."""
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return counters
+
+
+def create_response_cache() -> Optional[SemanticResponseCache]:
+    """Creates the semantic response cache configured in the environment, if enabled."""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+
+    if RESPONSE_CACHE_BACKEND == "memory":
+        logger.info("Using in-memory semantic response cache")
+        return SemanticResponseCache(InMemoryCacheBackend())
+
+    elif RESPONSE_CACHE_BACKEND == "postgres":
+        logger.info("Using Postgres semantic response cache")
+        return SemanticResponseCache(PostgresCacheBackend())
+
+    else:
+        raise ValueError(f"Unsupported response cache backend: {RESPONSE_CACHE_BACKEND}")
@@ -0,0 +1,300 @@
+"""
+Bulk RAGAS evaluation of a dataset file.
+
+Usage:
+    python -m src.services.evaluation.batch_evaluation --dataset eval.jsonl --output results/
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+from src.utils.logger import logger
+from src.utils.environment import (
+    EVALUATION_BATCH_SIZE,
+    EVALUATION_CACHE_PATH,
+    EVALUATION_MAX_CONCURRENCY,
+    EVALUATION_MAX_WORKERS,
+)
+
+REQUIRED_FIELDS = ("question", "ground_truth", "answer", "contexts")
+
+
+def _is_s3(uri: str) -> bool:
+    return uri.startswith("s3://")
+
+
+def _split_s3(uri: str) -> Tuple[str, str]:
+    parsed = urlparse(uri)
+    return parsed.netloc, parsed.path.lstrip("/")
+
+
+def _download(uri: str, missing_ok: bool = False) -> Optional[str]:
+    """Returns a local path for the uri, downloading it first when it is on S3."""
+    if not _is_s3(uri):
+        return uri
+
+    import boto3
+    from botocore.exceptions import ClientError
+
+    bucket, key = _split_s3(uri)
+    local_path = os.path.join(tempfile.gettempdir(), os.path.basename(key))
+    try:
+        boto3.client("s3").download_file(bucket, key, local_path)
+    except ClientError:
+        if not missing_ok:
+            raise
+        return None
+    return local_path
+
+
+def _write(uri: str, content: str) -> None:
+    if _is_s3(uri):
+        import boto3
+
+        bucket, key = _split_s3(uri)
+        boto3.client("s3").put_object(Bucket=bucket, Key=key, Body=content.encode("utf-8"))
+        return
+
+    os.makedirs(os.path.dirname(uri) or ".", exist_ok=True)
+    with open(uri, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+def _join(base: str, name: str) -> str:
+    return f"{base.rstrip('/')}/{name}" if _is_s3(base) else os.path.join(base, name)
+
+
+def load_rows(path: str) -> List[Dict[str, Any]]:
+    """Loads the evaluation rows from a JSONL or Parquet file (local or s3://)."""
+    from datasets import Dataset
+
+    local_path = _download(path)
+    if path.endswith(".parquet"):
+        dataset = Dataset.from_parquet(local_path)
+    elif path.endswith((".jsonl", ".json")):
+        dataset = Dataset.from_json(local_path)
+    else:
+        raise ValueError(f"Unsupported dataset format: {path} (expected .jsonl or .parquet)")
+
+    missing = [field for field in REQUIRED_FIELDS if field not in dataset.column_names]
+    if missing:
+        raise ValueError(f"Dataset is missing required fields: {', '.join(missing)}")
+
+    return [{field: row[field] for field in REQUIRED_FIELDS} for row in dataset]
+
+
+class MetricScoreCache:
+    """
+    SQLite cache of metric scores keyed by the evaluated row and the metric, so
+    a re-run only computes the scores of rows that changed. A path on S3 is
+    downloaded on open and uploaded back by save().
+    """
+
+    def __init__(self, path: str = EVALUATION_CACHE_PATH):
+        self.uri = path
+        self.local_path = _download(path, missing_ok=True) if _is_s3(path) else path
+        if self.local_path is None:
+            self.local_path = os.path.join(tempfile.gettempdir(), os.path.basename(_split_s3(path)[1]))
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.local_path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score REAL)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(row: Dict[str, Any], metric_name: str) -> str:
+        # ground_truth is part of the key because recall and correctness depend on it
+        payload = json.dumps([row[field] for field in REQUIRED_FIELDS] + [metric_name], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, float]:
+        """Returns the cached scores of the keys; failed (NULL) scores count as misses."""
+        with self._lock:
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(f"SELECT key, score FROM scores WHERE key IN ({placeholders}) AND score IS NOT NULL", chunk).fetchall())
+        return found
+
+    def put_many(self, items: List[Tuple[str, Optional[float]]]) -> None:
+        """Stores the scores; failed (None) scores are skipped so the next run recomputes them."""
+        items = [(key, score) for key, score in items if score is not None]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO scores (key, score) VALUES (?, ?)", items)
+            self._conn.commit()
+
+    def save(self) -> None:
+        if _is_s3(self.uri):
+            import boto3
+
+            bucket, key = _split_s3(self.uri)
+            with self._lock:
+                boto3.client("s3").upload_file(self.local_path, bucket, key)
+
+
+def _to_score(value: Any) -> Optional[float]:
+    # RAGAS reports NaN for rows a metric could not score
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if score != score else score
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    scored = [value for value in values if value is not None]
+    return round(sum(scored) / len(scored), 4) if scored else None
+
+
+class BatchEvaluator:
+    """
+    Evaluates many rows with the RAGAS metrics.
+
+    Only the (row, metric) pairs missing from the cache are computed. Pending rows
+    are grouped by the set of metrics they still need and evaluated in batches,
+    with at most max_concurrency batches in flight and max_workers RAGAS jobs per
+    batch.
+    """
+
+    def __init__(
+        self,
+        metrics: Optional[List[Any]] = None,
+        cache: Optional[MetricScoreCache] = None,
+        batch_size: int = EVALUATION_BATCH_SIZE,
+        max_concurrency: int = EVALUATION_MAX_CONCURRENCY,
+        max_workers: int = EVALUATION_MAX_WORKERS,
+    ):
+        from src.services.evaluation.evaluation_service import METRICS
+
+        self.metrics = metrics or METRICS
+        self.cache = cache or MetricScoreCache()
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_workers = max(1, max_workers)
+
+    def _evaluate_batch(self, rows: List[Dict[str, Any]], metrics: List[Any]) -> Dict[str, List[Optional[float]]]:
+        from ragas import evaluate
+        from ragas.run_config import RunConfig
+        from src.services.evaluation.evaluation_service import prepare_dataset_from_rows
+
+        start_time = time.time()
+        result = evaluate(
+            dataset=prepare_dataset_from_rows(rows),
+            metrics=metrics,
+            run_config=RunConfig(max_workers=self.max_workers),
+            raise_exceptions=False,
+            show_progress=False,
+        )
+        logger.info(f"Evaluated {len(rows)} rows x {len(metrics)} metrics in {time.time() - start_time:.2f} seconds")
+
+        return {metric.name: [_to_score(value) for value in result[metric.name]] for metric in metrics}
+
+    def _run_batch(self, indexes: List[int], rows: List[Dict[str, Any]], metrics: List[Any], scores: List[Dict[str, Any]]) -> None:
+        try:
+            batch_scores = self._evaluate_batch([rows[index] for index in indexes], metrics)
+        except Exception as e:
+            logger.error(f"Error evaluating batch of {len(indexes)} rows: {e}")
+            return
+
+        cache_items = []
+        for metric in metrics:
+            for index, score in zip(indexes, batch_scores[metric.name]):
+                scores[index][metric.name] = score
+                cache_items.append((MetricScoreCache.key(rows[index], metric.name), score))
+        self.cache.put_many(cache_items)
+
+    def evaluate(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Returns the per-row scores, the aggregate scores and run statistics."""
+        metric_names = [metric.name for metric in self.metrics]
+        keys = [[MetricScoreCache.key(row, name) for name in metric_names] for row in rows]
+        cached = self.cache.get_many([key for row_keys in keys for key in row_keys])
+
+        scores: List[Dict[str, Any]] = []
+        pending: Dict[Tuple[str, ...], List[int]] = {}
+        for index, row_keys in enumerate(keys):
+            scores.append({name: cached[key] for name, key in zip(metric_names, row_keys) if key in cached})
+            missing = tuple(name for name in metric_names if name not in scores[index])
+            if missing:
+                pending.setdefault(missing, []).append(index)
+
+        batches = [
+            (indexes[start:start + self.batch_size], [metric for metric in self.metrics if metric.name in missing])
+            for missing, indexes in pending.items()
+            for start in range(0, len(indexes), self.batch_size)
+        ]
+
+        cached_count = sum(len(row_scores) for row_scores in scores)
+        logger.info(f"Evaluating {len(rows)} rows: {cached_count} cached scores, {len(batches)} batches to compute")
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for future in [executor.submit(self._run_batch, indexes, rows, metrics, scores) for indexes, metrics in batches]:
+                future.result()
+
+        self.cache.save()
+
+        per_row = [
+            {**row, "metrics": {name: row_scores.get(name) for name in metric_names}}
+            for row, row_scores in zip(rows, scores)
+        ]
+        aggregate = {name: _mean([row["metrics"][name] for row in per_row]) for name in metric_names}
+
+        return {
+            "aggregate": aggregate,
+            "rows": per_row,
+            "stats": {
+                "rows": len(rows),
+                "cached_scores": cached_count,
+                "computed_batches": len(batches),
+                "failed_scores": sum(value is None for row in per_row for value in row["metrics"].values()),
+            },
+        }
+
+
+def evaluate_dataset_file(dataset_path: str, output_path: Optional[str] = None, evaluator: Optional[BatchEvaluator] = None) -> Dict[str, Any]:
+    """
+    Evaluates a JSONL/Parquet dataset. When output_path (a directory or s3://
+    prefix) is given, writes per_row.jsonl and aggregate.json there.
+    """
+    start_time = time.time()
+    rows = load_rows(dataset_path)
+    result = (evaluator or BatchEvaluator()).evaluate(rows)
+    result["stats"]["processing_time"] = round(time.time() - start_time, 2)
+
+    if output_path:
+        _write(_join(output_path, "per_row.jsonl"), "\n".join(json.dumps(row, ensure_ascii=False) for row in result["rows"]) + "\n")
+        _write(_join(output_path, "aggregate.json"), json.dumps({"aggregate": result["aggregate"], "stats": result["stats"]}, indent=2))
+        logger.info(f"Evaluation results written to {output_path}")
+
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk RAGAS evaluation of a JSONL or Parquet dataset")
+    parser.add_argument("--dataset", required=True, help="JSONL or Parquet file with question, ground_truth, answer and contexts")
+    parser.add_argument("--output", help="Directory or s3:// prefix for per_row.jsonl and aggregate.json")
+    parser.add_argument("--batch-size", type=int, default=EVALUATION_BATCH_SIZE)
+    parser.add_argument("--max-concurrency", type=int, default=EVALUATION_MAX_CONCURRENCY)
+    parser.add_argument("--cache", default=EVALUATION_CACHE_PATH)
+    args = parser.parse_args(argv)
+
+    from src.utils.secrets import load_secrets
+
+    load_secrets()
+
+    evaluator = BatchEvaluator(
+        cache=MetricScoreCache(args.cache), batch_size=args.batch_size, max_concurrency=args.max_concurrency
+    )
+    result = evaluate_dataset_file(args.dataset, args.output, evaluator)
+    print(json.dumps({"aggregate": result["aggregate"], "stats": result["stats"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
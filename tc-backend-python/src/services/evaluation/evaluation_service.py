@@ -23,11 +23,18 @@ METRICS = [
 
 def prepare_dataset(question: str, ground_truth: str, answer: str, contexts: List[str]) -> Dataset:
     """Prepares the dataset for evaluation."""
+    return prepare_dataset_from_rows([
+        {"question": question, "ground_truth": ground_truth, "answer": answer, "contexts": contexts}
+    ])
+
+
+def prepare_dataset_from_rows(rows: List[Dict[str, Any]]) -> Dataset:
+    """Prepares a multi-row dataset for evaluation."""
     data = {
-        "question": [question],
-        "answer": [answer],
-        "contexts": [contexts],
-        "ground_truth": [ground_truth]
+        "question": [row["question"] for row in rows],
+        "answer": [row["answer"] for row in rows],
+        "contexts": [row["contexts"] for row in rows],
+        "ground_truth": [row["ground_truth"] for row in rows]
     }
     return Dataset.from_dict(data)
 
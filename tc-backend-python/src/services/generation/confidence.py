@@ -0,0 +1,122 @@
+from operator import itemgetter
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.utils.logger import logger
+from src.utils.environment import (
+    CONFIDENCE_AGGREGATION,
+    CONFIDENCE_FALLBACK,
+    CONFIDENCE_SPAN_TOKENS,
+    CONFIDENCE_TAIL_PERCENTILE,
+)
+
+AGGREGATIONS = {"mean_prob", "geometric_mean", "min_span", "tail_percentile"}
+
+_get_logprob = itemgetter("logprob")
+
+
+def token_logprobs(message: Any) -> np.ndarray:
+    """
+    Token logprobs of an (OpenAI-style) message or chunk as a float array,
+    empty when the provider returns none (Bedrock).
+    """
+    logprobs = (getattr(message, "response_metadata", None) or {}).get("logprobs") or {}
+    content = logprobs.get("content") or []
+    # map + itemgetter runs in C, so long answers do not pay a Python-level loop
+    return np.fromiter(map(_get_logprob, content), dtype=np.float64, count=len(content))
+
+
+class ConfidenceEngine:
+    """
+    Turns token logprobs into a confidence score in [0, 1].
+
+    Aggregations: "mean_prob" (mean token probability), "geometric_mean"
+    (exp of the mean logprob, i.e. the inverse perplexity), "min_span" (lowest
+    mean probability over span_tokens consecutive tokens, which catches a
+    single unsure claim in a long answer) and "tail_percentile" (the
+    tail_percentile-th percentile of token probabilities).
+
+    Answers without logprobs (Bedrock) have an unknown confidence: aggregate
+    and score return None and the caller decides what to do with them. The
+    fallback is the score reported for such an answer once it is accepted.
+    """
+
+    def __init__(
+        self,
+        aggregation: str = CONFIDENCE_AGGREGATION,
+        span_tokens: int = CONFIDENCE_SPAN_TOKENS,
+        tail_percentile: float = CONFIDENCE_TAIL_PERCENTILE,
+        fallback: float = CONFIDENCE_FALLBACK,
+    ):
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unsupported confidence aggregation: {aggregation}")
+
+        self.aggregation = aggregation
+        self.span_tokens = max(1, span_tokens)
+        self.tail_percentile = tail_percentile
+        self.fallback = fallback
+
+    def _min_span(self, probabilities: np.ndarray) -> float:
+        if probabilities.size <= self.span_tokens:
+            return float(probabilities.mean())
+        sums = np.cumsum(np.concatenate(([0.0], probabilities)))
+        return float((sums[self.span_tokens:] - sums[:-self.span_tokens]).min() / self.span_tokens)
+
+    def analyze(self, logprobs: np.ndarray) -> Dict[str, float]:
+        """Every aggregation of the token logprobs, for logging and comparison."""
+        probabilities = np.exp(logprobs)
+        return {
+            "tokens": int(logprobs.size),
+            "mean_prob": float(probabilities.mean()),
+            "geometric_mean": float(np.exp(logprobs.mean())),
+            "min_span": self._min_span(probabilities),
+            "tail_percentile": float(np.percentile(probabilities, self.tail_percentile)),
+        }
+
+    def aggregate(self, logprobs: np.ndarray) -> Optional[float]:
+        """
+        Confidence of the token logprobs with the configured aggregation,
+        rounded to two decimals, or None without logprobs.
+        """
+        if logprobs.size == 0:
+            logger.info("No logprobs found. Confidence is unknown.")
+            return None
+
+        analytics = self.analyze(logprobs)
+        confidence = round(analytics[self.aggregation], 2)
+        logger.info(f"Confidence ({self.aggregation}): {confidence}, token probabilities: {analytics}")
+        return confidence
+
+    def score(self, message: Any) -> Optional[float]:
+        """Confidence of a complete model message."""
+        return self.aggregate(token_logprobs(message))
+
+    def accumulator(self) -> "ConfidenceAccumulator":
+        return ConfidenceAccumulator(self)
+
+
+class ConfidenceAccumulator:
+    """
+    Collects the logprobs of streamed chunks as they arrive, so the confidence
+    of the whole answer is available at the end without merging the chunks.
+    """
+
+    def __init__(self, engine: ConfidenceEngine):
+        self.engine = engine
+        self._parts: List[np.ndarray] = []
+
+    def add(self, chunk: Any) -> None:
+        logprobs = token_logprobs(chunk)
+        if logprobs.size:
+            self._parts.append(logprobs)
+
+    def logprobs(self) -> np.ndarray:
+        return np.concatenate(self._parts) if self._parts else np.empty(0)
+
+    def confidence(self) -> Optional[float]:
+        return self.engine.aggregate(self.logprobs())
+
+
+def create_confidence_engine() -> ConfidenceEngine:
+    """Creates the confidence engine configured in the environment."""
+    logger.info(f"Using {CONFIDENCE_AGGREGATION} confidence aggregation")
+    return ConfidenceEngine()
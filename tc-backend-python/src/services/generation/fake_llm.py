@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, Iterator, List, Optional
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model for benchmarks and local runs.
+
+    The answer is built from words of the prompt, seeded by its hash, so the
+    same prompt always yields the same answer and logprobs. Latency is
+    simulated as a time to first token plus a delay per generated token.
+    """
+
+    ttft_ms: float = 0.0
+    token_ms: float = 0.0
+    answer_tokens: int = 40
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _answer(self, messages: List[BaseMessage]) -> tuple:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+
+        words = prompt.split() or ["respuesta"]
+        tokens = [rng.choice(words) + " " for _ in range(self.answer_tokens)]
+        logprobs = [{"token": token, "logprob": -rng.uniform(0.01, 0.2)} for token in tokens]
+        return tokens, logprobs, len(prompt) // 4 + 1
+
+    def _build_message(self, tokens: List[str], logprobs: List[dict], prompt_tokens: int) -> AIMessage:
+        return AIMessage(
+            content="".join(tokens).strip(),
+            response_metadata={"logprobs": {"content": logprobs}},
+            usage_metadata={"input_tokens": prompt_tokens, "output_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)},
+        )
+
+    def _total_seconds(self) -> float:
+        return (self.ttft_ms + self.token_ms * max(self.answer_tokens - 1, 0)) / 1000
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._total_seconds())
+        return ChatResult(generations=[ChatGeneration(message=self._build_message(*self._answer(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._total_seconds())
+        return ChatResult(generations=[ChatGeneration(message=self._build_message(*self._answer(messages)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens, logprobs, prompt_tokens = self._answer(messages)
+
+        time.sleep(self.ttft_ms / 1000)
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(self.token_ms / 1000)
+
+            is_last = index == len(tokens) - 1
+            # Logprobs and usage go on the last chunk so the merged message carries them once
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=token,
+                response_metadata={"logprobs": {"content": logprobs}} if is_last else {},
+                usage_metadata={"input_tokens": prompt_tokens, "output_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)} if is_last else None,
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
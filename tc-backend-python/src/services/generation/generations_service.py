@@ -1,18 +1,39 @@
-from src.services.generation.llm_factory import LLMFactory
+from typing import List
+from src.services.generation.llm_cache import create_generation_cache, with_generation_cache
+from src.services.generation.llm_factory import LLMFactory, ModelTier
 from src.utils.logger import logger
+from src.utils.startup import startup_timer
 
 class GenerationService:
     """
     Service to handle response generation using ChatBedrock LLM.
+
+    Every model tier is wrapped with the shared prompt cache, which also
+    coalesces identical in-flight prompts into one call.
     """
     
     def __init__(self):
         logger.info("Initializing GenerationService")
         
-        self.llm = LLMFactory.create_llm()
+        with startup_timer.phase("llm"):
+            self.generation_cache = create_generation_cache()
+            self.tiers = LLMFactory.create_tiers()
+            for tier in self.tiers:
+                tier.llm = with_generation_cache(tier.llm, self.generation_cache)
+
+            # The cheapest tier also serves auxiliary calls such as memory summaries
+            self.llm = self.tiers[0].llm
         
         logger.info("GenerationService initialized successfully.")
     
     def get_llm(self):
         """Return the LLM instance."""
         return self.llm
+
+    def get_tiers(self) -> List[ModelTier]:
+        """Return the model tiers of the cascade, cheapest first."""
+        return self.tiers
+
+    def get_cache_stats(self) -> dict:
+        """Return the prompt cache counters, empty when the cache is disabled."""
+        return self.generation_cache.stats() if self.generation_cache is not None else {}
@@ -0,0 +1,286 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+from src.utils.environment import GENERATION_CACHE_ENABLED, GENERATION_CACHE_MAX_ENTRIES, GENERATION_CACHE_TTL_SECONDS
+
+
+def prompt_key(model: Any, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> str:
+    """
+    Hash of everything that determines a generation: the model and its
+    parameters, the rendered messages and the call options. The prompt
+    embeds the retrieved documents, so a different document set (or an
+    edited document) never hits an entry made for the old one.
+    """
+    payload = {
+        "model": getattr(model, "_identifying_params", {}),
+        "messages": [(message.type, message.content) for message in messages],
+        "stop": stop,
+        "kwargs": kwargs,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _shared_copy(result: ChatResult) -> ChatResult:
+    # The tokens were paid by the call that produced the result; drop usage so they are not counted again
+    generations = []
+    for generation in result.generations:
+        message = copy.deepcopy(generation.message)
+        message.usage_metadata = None
+        generations.append(ChatGeneration(message=message, generation_info=generation.generation_info))
+    return ChatResult(generations=generations, llm_output=result.llm_output)
+
+
+class GenerationCache:
+    """
+    Exact prompt-hash cache of LLM results with single-flight coalescing.
+
+    Results are kept for ttl_seconds, up to max_entries (LRU). While a prompt
+    is being generated, identical prompts wait for that call instead of
+    starting their own; sync and async callers share the same in-flight
+    future. Failed calls are not cached and their error reaches every waiter.
+    A leader that stops without a result (its request was cancelled) abandons
+    the key instead, and its waiters claim it again, one of them as the new
+    leader.
+    """
+
+    def __init__(self, ttl_seconds: int = GENERATION_CACHE_TTL_SECONDS, max_entries: int = GENERATION_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, Tuple[float, ChatResult]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def _get(self, key: str) -> Optional[ChatResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time() - self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: str, result: ChatResult) -> None:
+        self._entries[key] = (time.time(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def claim(self, key: str) -> Tuple[Optional[ChatResult], Optional[Future], bool]:
+        """
+        Returns (cached result, future, leader). A cached result is returned
+        directly; otherwise the caller either leads the call for the key and
+        must finish() it, or waits on the leader's future.
+        """
+        with self._lock:
+            cached = self._get(key)
+            if cached is not None:
+                self._counters["hits"] += 1
+                tracer.count("llm_cache_hits", 1)
+                return _shared_copy(cached), None, False
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                tracer.count("llm_coalesced", 1)
+                return None, future, False
+
+            future = Future()
+            self._in_flight[key] = future
+            self._counters["misses"] += 1
+            return None, future, True
+
+    def finish(self, key: str, future: Future, result: Optional[ChatResult] = None, error: Optional[BaseException] = None) -> None:
+        """Stores the leader's result (unless it failed) and wakes up the waiters."""
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if error is None:
+                self._store(key, result)
+
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def abandon(self, key: str, future: Future) -> None:
+        """Releases the key of a leader that stopped without a result; waiters get None and claim it again."""
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        future.set_result(None)
+
+    def put(self, key: str, result: ChatResult) -> None:
+        with self._lock:
+            self._store(key, result)
+
+    def get(self, key: str) -> Optional[ChatResult]:
+        """Returns the cached result of a prompt, without joining in-flight calls."""
+        with self._lock:
+            cached = self._get(key)
+            self._counters["hits" if cached is not None else "misses"] += 1
+        if cached is None:
+            return None
+        tracer.count("llm_cache_hits", 1)
+        return _shared_copy(cached)
+
+    def clear(self) -> None:
+        """Drops every cached result, e.g. after the corpus is re-ingested."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit, miss, coalesce and eviction counters and the number of entries."""
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "in_flight": len(self._in_flight)}
+
+
+class CachedChatModel(BaseChatModel):
+    """
+    Chat model that answers repeated prompts from a GenerationCache and
+    coalesces identical in-flight prompts into one upstream call.
+
+    The wrapped model's _generate/_agenerate/_stream are called with this
+    model's run manager, so callbacks (tracing, token streaming) fire once per
+    call. Streams are served from the cache and stored in it when they finish,
+    but are not coalesced: each streaming caller needs its own tokens.
+    """
+
+    llm: Any
+    # Not "cache": that is BaseChatModel's switch for LangChain's global LLM cache
+    generation_cache: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.llm._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return getattr(self.llm, "_identifying_params", {})
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = prompt_key(self.llm, messages, stop, **kwargs)
+        while True:
+            cached, future, leader = self.generation_cache.claim(key)
+            if cached is not None:
+                return cached
+            if leader:
+                break
+            result = future.result()
+            # None: the leader was cancelled, claim the key again
+            if result is not None:
+                return _shared_copy(result)
+
+        try:
+            result = self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except Exception as e:
+            self.generation_cache.finish(key, future, error=e)
+            raise
+        except BaseException:
+            self.generation_cache.abandon(key, future)
+            raise
+        self.generation_cache.finish(key, future, result)
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = prompt_key(self.llm, messages, stop, **kwargs)
+        while True:
+            cached, future, leader = self.generation_cache.claim(key)
+            if cached is not None:
+                return cached
+            if leader:
+                break
+            # Shielded: a cancelled waiter must not cancel the future the leader and other waiters share
+            result = await asyncio.shield(asyncio.wrap_future(future))
+            if result is not None:
+                return _shared_copy(result)
+
+        try:
+            result = await self.llm._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except Exception as e:
+            self.generation_cache.finish(key, future, error=e)
+            raise
+        except BaseException:
+            # Cancelled (e.g. the handler rejected the message): release the key without failing the waiters
+            self.generation_cache.abandon(key, future)
+            raise
+        self.generation_cache.finish(key, future, result)
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key = prompt_key(self.llm, messages, stop, **kwargs)
+        cached = self.generation_cache.get(key)
+        if cached is not None:
+            message = cached.generations[0].message
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=message.content, response_metadata=message.response_metadata))
+            if run_manager:
+                run_manager.on_llm_new_token(str(message.content), chunk=chunk)
+            yield chunk
+            return
+
+        merged = None
+        for chunk in self.llm._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+
+        if merged is not None:
+            # Streamed logprobs arrive in the chunks' generation_info, not in the message; keep
+            # them in the cached message so a cache hit is scored on them instead of the fallback
+            message = AIMessage(
+                content=merged.message.content,
+                response_metadata={**(merged.generation_info or {}), **merged.message.response_metadata},
+                usage_metadata=merged.message.usage_metadata,
+            )
+            generation = ChatGeneration(message=message, generation_info=merged.generation_info)
+            self.generation_cache.put(key, ChatResult(generations=[generation]))
+
+
+def create_generation_cache() -> Optional[GenerationCache]:
+    """Creates the prompt cache shared by every model, if enabled."""
+    if not GENERATION_CACHE_ENABLED:
+        return None
+
+    logger.info(f"Using LLM prompt cache (ttl={GENERATION_CACHE_TTL_SECONDS}s, max_entries={GENERATION_CACHE_MAX_ENTRIES})")
+    return GenerationCache()
+
+
+def with_generation_cache(llm, cache: Optional[GenerationCache]):
+    """Wraps the LLM with the prompt cache; without a cache the LLM is returned as is."""
+    return llm if cache is None else CachedChatModel(llm=llm, generation_cache=cache)
+
+
+def without_generation_cache(llm):
+    """Returns the model wrapped by with_generation_cache, or the LLM itself if it is not wrapped."""
+    return llm.llm if isinstance(llm, CachedChatModel) else llm
@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Any, Dict
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from src.utils.tracing import tracer
+
+
+class LLMTracingCallback(BaseCallbackHandler):
+    """
+    Records the LLM stages of the current request: time to first token (only
+    when the model streams), total generation time and the token usage
+    reported by the provider.
+    """
+
+    # Runs in the caller's thread and context, so spans land in the request trace
+    run_inline = True
+
+    def __init__(self):
+        self._started_at: Dict[UUID, float] = {}
+        self._first_token_seen: Dict[UUID, bool] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID) -> None:
+        with self._lock:
+            self._started_at[run_id] = time.perf_counter()
+            self._first_token_seen[run_id] = False
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            started_at = self._started_at.get(run_id)
+            if started_at is None or self._first_token_seen[run_id]:
+                return
+            self._first_token_seen[run_id] = True
+
+        tracer.record("llm_ttft", 1000 * (time.perf_counter() - started_at), started_at)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started_at = self._pop(run_id)
+        if started_at is not None:
+            tracer.record("llm_total", 1000 * (time.perf_counter() - started_at), started_at)
+
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    tracer.count("input_tokens", usage.get("input_tokens", 0))
+                    tracer.count("output_tokens", usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        started_at = self._pop(run_id)
+        if started_at is not None:
+            tracer.record("llm_total", 1000 * (time.perf_counter() - started_at), started_at)
+
+    def _pop(self, run_id: UUID):
+        with self._lock:
+            self._first_token_seen.pop(run_id, None)
+            return self._started_at.pop(run_id, None)
@@ -1,22 +1,89 @@
-from langchain_aws import ChatBedrock
-from langchain_openai import ChatOpenAI
-from src.utils.environment import LLM_PROVIDER, LLM_MODEL_ID
+from typing import Any, Dict, List, Optional
+from src.constants.app_constants import MINIMUM_SCORE_CONFIDENCE
+from src.utils.environment import FAKE_LLM_ANSWER_TOKENS, FAKE_LLM_TOKEN_MS, FAKE_LLM_TTFT_MS, LLM_CASCADE, LLM_PROVIDER, LLM_MODEL_ID
 from src.utils.logger import logger
 
+
+class ModelTier:
+    """
+    One model of the cascade: answers below threshold confidence escalate to
+    the next tier. Costs are per 1000 tokens and only used for reporting.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        llm,
+        threshold: float = MINIMUM_SCORE_CONFIDENCE,
+        input_cost_per_1k: float = 0.0,
+        output_cost_per_1k: float = 0.0,
+    ):
+        self.model_id = model_id
+        self.llm = llm
+        self.threshold = threshold
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+
+    def cost(self, usage: Optional[Dict[str, Any]]) -> float:
+        """Cost of a call from the usage reported by the provider (zero for cached answers)."""
+        if not usage:
+            return 0.0
+        return (
+            usage.get("input_tokens", 0) * self.input_cost_per_1k
+            + usage.get("output_tokens", 0) * self.output_cost_per_1k
+        ) / 1000
+
+
 class LLMFactory:
     """
     Factory to create LLM models based on the specified provider (Bedrock or OpenAI).
+
+    Provider packages are imported on demand, so only the configured one is loaded.
     """
 
     @staticmethod
-    def create_llm():
+    def create_llm(model_id: Optional[str] = None):
+        """Creates the configured provider's chat model; model_id defaults to LLM_MODEL_ID."""
+        model_id = model_id or LLM_MODEL_ID
+
         if LLM_PROVIDER == "bedrock":
+            from langchain_aws import ChatBedrock
+
             logger.info("Using Bedrock LLM")
-            return ChatBedrock(model_id=LLM_MODEL_ID)
+            return ChatBedrock(model_id=model_id)
 
         elif LLM_PROVIDER == "openai":
+            from langchain_openai import ChatOpenAI
+
             logger.info("Using OpenAI LLM")
-            return ChatOpenAI(model=LLM_MODEL_ID, logprobs=True)
+            return ChatOpenAI(model=model_id, logprobs=True)
+
+        elif LLM_PROVIDER == "fake":
+            from src.services.generation.fake_llm import FakeChatModel
+
+            logger.info("Using fake LLM")
+            return FakeChatModel(ttft_ms=FAKE_LLM_TTFT_MS, token_ms=FAKE_LLM_TOKEN_MS, answer_tokens=FAKE_LLM_ANSWER_TOKENS)
 
         else:
             raise ValueError(f"Unsupported LLM provider: {LLM_PROVIDER}")
+
+    @staticmethod
+    def create_tiers() -> List[ModelTier]:
+        """
+        Creates the model tiers of LLM_CASCADE, cheapest first. Without a
+        cascade there is a single LLM_MODEL_ID tier.
+        """
+        configs = LLM_CASCADE or [{"model_id": LLM_MODEL_ID}]
+        if len(configs) > 1:
+            logger.info(f"Using model cascade: {' -> '.join(config['model_id'] for config in configs)}")
+
+        return [
+            ModelTier(
+                model_id=config["model_id"],
+                llm=LLMFactory.create_llm(config["model_id"]),
+                threshold=config.get("threshold", MINIMUM_SCORE_CONFIDENCE),
+                input_cost_per_1k=config.get("input_cost_per_1k", 0.0),
+                output_cost_per_1k=config.get("output_cost_per_1k", 0.0),
+            )
+            for config in configs
+        ]
@@ -0,0 +1,123 @@
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import BasePromptTemplate
+from src.services.generation.confidence import ConfidenceEngine
+from src.services.generation.llm_factory import ModelTier
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+
+
+class ModelCascade:
+    """
+    Answers with the cheapest model tier and escalates to the next one only
+    when the answer's confidence is below the tier's threshold. The last tier's
+    answer is always accepted.
+
+    An answer without logprobs has an unknown confidence, which cannot show
+    that it clears the threshold, so it escalates too, unless the tier's
+    threshold is 0 (accept every answer). Accepted answers of unknown
+    confidence report the engine's fallback score.
+
+    Each escalation is logged with the latency and cost of the discarded
+    answer and counted as llm_escalations; the cost of every call is added to
+    llm_cost_usd. The accepted answer carries the model_id that produced it.
+    """
+
+    def __init__(
+        self,
+        tiers: List[ModelTier],
+        prompts: Dict[str, BasePromptTemplate],
+        confidence_engine: ConfidenceEngine,
+        callbacks: Optional[list] = None,
+    ):
+        self.tiers = tiers
+        self.confidence_engine = confidence_engine
+
+        # Prompt and LLM per tier and intent
+        self.chains = [
+            {intent: prompt | tier.llm.with_config(callbacks=callbacks or []) for intent, prompt in prompts.items()}
+            for tier in tiers
+        ]
+
+    def _score(self, message: AIMessage) -> Dict[str, Any]:
+        with tracer.span("confidence"):
+            return {"content": message.content, "confidence": self.confidence_engine.score(message)}
+
+    def _evaluate(self, index: int, response: Dict[str, Any], usage: Optional[Dict[str, Any]], elapsed: float) -> Optional[Dict[str, Any]]:
+        """Returns the response if the tier's answer is accepted, None if it escalates."""
+        tier = self.tiers[index]
+        cost = tier.cost(usage)
+        tracer.count("llm_cost_usd", cost)
+
+        confidence = response["confidence"]
+        accepted = tier.threshold <= 0 if confidence is None else confidence >= tier.threshold
+        if index == len(self.tiers) - 1 or accepted:
+            if index:
+                logger.info(f"Answered by {tier.model_id} after {index} escalation(s)")
+            if confidence is None:
+                confidence = self.confidence_engine.fallback
+            return {**response, "confidence": confidence, "model": tier.model_id}
+
+        tracer.count("llm_escalations", 1)
+        reason = "unknown confidence" if confidence is None else f"confidence {confidence} < {tier.threshold}"
+        logger.info(
+            f"Escalating from {tier.model_id} to {self.tiers[index + 1].model_id}: "
+            f"{reason}, {1000 * elapsed:.0f}ms, ${cost:.6f}"
+        )
+        return None
+
+    def invoke(self, inputs: dict) -> Dict[str, Any]:
+        """Returns {"content", "confidence", "model"} for the prompt inputs of an intent."""
+        for index, chains in enumerate(self.chains):
+            start = time.perf_counter()
+            message = chains[inputs["intent"]].invoke(inputs)
+            response = self._evaluate(index, self._score(message), message.usage_metadata, time.perf_counter() - start)
+            if response is not None:
+                return response
+
+    async def ainvoke(self, inputs: dict) -> Dict[str, Any]:
+        """Async version of invoke."""
+        for index, chains in enumerate(self.chains):
+            start = time.perf_counter()
+            message = await chains[inputs["intent"]].ainvoke(inputs)
+            response = self._evaluate(index, self._score(message), message.usage_metadata, time.perf_counter() - start)
+            if response is not None:
+                return response
+
+    def stream(self, inputs: dict) -> Iterator[Dict[str, Any]]:
+        """
+        Yields "token" events and a final "confidence" event. Tiers before the
+        last are not streamed, since their answer may be discarded; an
+        accepted answer from them is sent as a single token event. The last
+        tier streams token by token.
+        """
+        last = len(self.chains) - 1
+        for index in range(last):
+            start = time.perf_counter()
+            message = self.chains[index][inputs["intent"]].invoke(inputs)
+            response = self._evaluate(index, self._score(message), message.usage_metadata, time.perf_counter() - start)
+            if response is not None:
+                yield {"type": "token", "content": response["content"]}
+                yield {"type": "confidence", "confidence": response["confidence"], "model": response["model"]}
+                return
+
+        # Logprobs are collected chunk by chunk instead of merging the chunks into one message
+        start = time.perf_counter()
+        accumulator = self.confidence_engine.accumulator()
+        content, usage = [], None
+        for chunk in self.chains[last][inputs["intent"]].stream(inputs):
+            accumulator.add(chunk)
+            usage = chunk.usage_metadata or usage
+            if chunk.content:
+                content.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+
+        if not content:
+            yield {"type": "confidence", "confidence": 0.0, "model": self.tiers[last].model_id}
+            return
+
+        with tracer.span("confidence"):
+            response = {"content": "".join(content), "confidence": accumulator.confidence()}
+        response = self._evaluate(last, response, usage, time.perf_counter() - start)
+        yield {"type": "confidence", "confidence": response["confidence"], "model": response["model"]}
@@ -0,0 +1,242 @@
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.utils.logger import logger
+from src.utils.text_normalization import normalize_whitespace
+from src.utils.tracing import tracer
+from src.utils.environment import (
+    EMBEDDINGS_BATCH_SIZE,
+    EMBEDDINGS_BATCH_WINDOW_MS,
+    EMBEDDINGS_CACHE_DISK_MAX_ENTRIES,
+    EMBEDDINGS_CACHE_DISK_PATH,
+    EMBEDDINGS_CACHE_MAX_ENTRIES,
+)
+
+
+class EmbeddingDiskStore:
+    """
+    SQLite-backed embedding store. Pointed at /tmp it survives warm Lambda
+    invocations of the same container. It keeps at most max_entries vectors;
+    beyond that the oldest written ones are evicted, so a long-lived container
+    does not fill /tmp.
+    """
+
+    def __init__(self, path: str, max_entries: int = EMBEDDINGS_CACHE_DISK_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32).tolist() if row else None
+
+    def put_many(self, items: List[Tuple[str, List[float]]]) -> None:
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            # REPLACE gives a rewritten key a new rowid, so the lowest rowids are the oldest writes
+            excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)", (excess,)
+                )
+            self._conn.commit()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embed_documents calls into provider-sized requests.
+
+    Callers block on their own future while a worker thread gathers every request
+    that arrives within the batching window and sends the unique texts upstream.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], max_batch_size: int, window_ms: int):
+        self._embed_fn = embed_fn
+        self._max_batch_size = max(1, max_batch_size)
+        self._window_seconds = window_ms / 1000
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds the texts, sharing the upstream request with concurrent callers."""
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> List[Tuple[List[str], Future]]:
+        batch = [self._queue.get()]
+        pending = len(batch[0][0])
+        deadline = time.monotonic() + self._window_seconds
+
+        while pending < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            pending += len(request[0])
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            unique_texts = list(dict.fromkeys(text for texts, _ in batch for text in texts))
+
+            try:
+                vectors: List[List[float]] = []
+                for start in range(0, len(unique_texts), self._max_batch_size):
+                    vectors.extend(self._embed_fn(unique_texts[start:start + self._max_batch_size]))
+
+                if len(batch) > 1:
+                    logger.debug(f"Coalesced {len(batch)} embedding requests into {len(unique_texts)} texts")
+
+                by_text = dict(zip(unique_texts, vectors))
+                for texts, future in batch:
+                    future.set_result([by_text[text] for text in texts])
+
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an exact-match LRU cache, an optional on-disk store
+    and batched document embedding.
+
+    Texts are keyed on the same whitespace normalization applied by
+    validate_user_message, so a validated message and its retrieval query share
+    a single cache entry.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        namespace: str,
+        max_entries: int = EMBEDDINGS_CACHE_MAX_ENTRIES,
+        disk_path: Optional[str] = EMBEDDINGS_CACHE_DISK_PATH,
+        batch_size: int = EMBEDDINGS_BATCH_SIZE,
+        batch_window_ms: int = EMBEDDINGS_BATCH_WINDOW_MS,
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.disk_store = None
+        if disk_path:
+            try:
+                self.disk_store = EmbeddingDiskStore(disk_path)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open embeddings disk cache at {disk_path}: {e}")
+
+        self.batcher = EmbeddingBatcher(self.embeddings.embed_documents, batch_size, batch_window_ms)
+
+    def _key(self, text: str) -> str:
+        normalized = normalize_whitespace(text)
+        return hashlib.sha256(f"{self.namespace}:{normalized}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return vector
+
+        if self.disk_store:
+            vector = self.disk_store.get(key)
+            if vector is not None:
+                self._put_memory([(key, vector)])
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+                return vector
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def _put_memory(self, items: List[Tuple[str, List[float]]]) -> None:
+        with self._lock:
+            for key, vector in items:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _put(self, items: List[Tuple[str, List[float]]]) -> None:
+        self._put_memory(items)
+        if self.disk_store:
+            try:
+                self.disk_store.put_many(items)
+            except sqlite3.Error as e:
+                logger.error(f"Error writing embeddings disk cache: {e}")
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a query, hitting the provider only for unseen texts."""
+        with tracer.span("embedding"):
+            key = self._key(text)
+            vector = self._get(key)
+            if vector is None:
+                vector = self.embeddings.embed_query(text)
+                self._put([(key, vector)])
+            return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds documents, batching the cache misses into shared provider requests."""
+        with tracer.span("embedding"):
+            return self._embed_documents(texts)
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self._get(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+
+        if missing:
+            embedded = self.batcher.embed(list(missing.values()))
+            new_items = list(zip(missing.keys(), embedded))
+            self._put(new_items)
+            vectors.update(new_items)
+
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict[str, int]:
+        """Returns cache hit/miss counters and the in-memory size."""
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
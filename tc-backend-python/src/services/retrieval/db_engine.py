@@ -0,0 +1,180 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from src.services.retrieval.search_settings import install_search_settings_listener
+from src.utils.logger import logger
+from src.utils.environment import (
+    CONNECTION_URL,
+    PG_CONNECT_TIMEOUT_SECONDS,
+    PG_POOL_MAX_OVERFLOW,
+    PG_POOL_PRE_PING,
+    PG_POOL_RECYCLE_SECONDS,
+    PG_POOL_SIZE,
+    PG_POOL_TIMEOUT_SECONDS,
+    PG_STATEMENT_TIMEOUT_MS,
+)
+
+# Engines live at module level so a warm container reuses its pool across invocations
+_engine: Optional[Engine] = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+
+class PoolStats:
+    """
+    Connection pool counters: checkouts, checkouts that had to wait for a
+    connection, wait time and the latency of opening new connections.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.connects = 0
+        self.connect_time_total = 0.0
+        self.connect_time_max = 0.0
+
+    def record_checkout(self, elapsed: float, waited: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_time_total += elapsed
+                self.wait_time_max = max(self.wait_time_max, elapsed)
+
+    def connect_started(self) -> None:
+        self._local.connect_started_at = time.perf_counter()
+
+    def connect_finished(self) -> None:
+        started_at = getattr(self._local, "connect_started_at", None)
+        if started_at is None:
+            return
+
+        elapsed = time.perf_counter() - started_at
+        self._local.connect_started_at = None
+        with self._lock:
+            self.connects += 1
+            self.connect_time_total += elapsed
+            self.connect_time_max = max(self.connect_time_max, elapsed)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        """Returns the counters together with the current pool occupancy."""
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "avg_wait_ms": round(1000 * self.wait_time_total / self.waits, 2) if self.waits else 0.0,
+                "max_wait_ms": round(1000 * self.wait_time_max, 2),
+                "connects": self.connects,
+                "avg_connect_ms": round(1000 * self.connect_time_total / self.connects, 2) if self.connects else 0.0,
+                "max_connect_ms": round(1000 * self.connect_time_max, 2),
+            }
+
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+def _instrumented_pool_class(base_pool, stats: PoolStats):
+    """Builds a pool class that times every checkout into the given stats."""
+
+    class InstrumentedPool(base_pool):
+        def _do_get(self):
+            # No idle connection means the checkout waits for a new or returned one
+            waited = self.checkedin() == 0
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                stats.record_checkout(time.perf_counter() - start, waited)
+
+    InstrumentedPool.__name__ = f"Instrumented{base_pool.__name__}"
+    return InstrumentedPool
+
+
+def _track_connects(engine: Engine, stats: PoolStats) -> None:
+    event.listen(engine, "do_connect", lambda *args: stats.connect_started())
+    event.listen(engine, "connect", lambda *args: stats.connect_finished())
+
+
+def _engine_args(base_pool, stats: PoolStats) -> Dict[str, Any]:
+    return {
+        "poolclass": _instrumented_pool_class(base_pool, stats),
+        "pool_size": PG_POOL_SIZE,
+        "max_overflow": PG_POOL_MAX_OVERFLOW,
+        "pool_timeout": PG_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": PG_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": PG_POOL_PRE_PING,
+        "connect_args": {
+            "connect_timeout": PG_CONNECT_TIMEOUT_SECONDS,
+            "options": f"-c statement_timeout={PG_STATEMENT_TIMEOUT_MS}",
+        },
+    }
+
+
+def get_engine() -> Engine:
+    """Returns the shared pooled SQLAlchemy engine, creating it on first use."""
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                logger.info(f"Creating pooled Postgres engine (size={PG_POOL_SIZE}, overflow={PG_POOL_MAX_OVERFLOW})")
+                _engine = create_engine(CONNECTION_URL, **_engine_args(QueuePool, sync_pool_stats))
+                _track_connects(_engine, sync_pool_stats)
+                install_search_settings_listener(_engine)
+
+    return _engine
+
+
+def get_async_engine():
+    """
+    Returns the shared pooled async engine, creating it on first use.
+    It always uses the psycopg (v3) driver, which supports asyncio.
+    """
+    global _async_engine
+
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                from sqlalchemy.ext.asyncio import create_async_engine
+
+                logger.info(f"Creating pooled async Postgres engine (size={PG_POOL_SIZE}, overflow={PG_POOL_MAX_OVERFLOW})")
+                url = make_url(CONNECTION_URL).set(drivername="postgresql+psycopg")
+                _async_engine = create_async_engine(url, **_engine_args(AsyncAdaptedQueuePool, async_pool_stats))
+                _track_connects(_async_engine.sync_engine, async_pool_stats)
+                install_search_settings_listener(_async_engine.sync_engine)
+
+    return _async_engine
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Returns the stats of every engine created in this container."""
+    stats = {}
+    if _engine is not None:
+        stats["sync"] = sync_pool_stats.snapshot(_engine.pool)
+    if _async_engine is not None:
+        stats["async"] = async_pool_stats.snapshot(_async_engine.sync_engine.pool)
+    return stats
+
+
+def dispose_engines(event_loop=None) -> None:
+    """
+    Closes every pooled connection, e.g. before a snapshot is taken; the pools
+    reconnect on next use. The async pool is closed on event_loop, the loop its
+    connections belong to.
+    """
+    if _engine is not None:
+        _engine.dispose()
+    if _async_engine is not None and event_loop is not None:
+        event_loop.run_until_complete(_async_engine.dispose())
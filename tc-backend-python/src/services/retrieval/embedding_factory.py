@@ -1,20 +1,48 @@
-from langchain_aws import BedrockEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from src.utils.environment import AMAZON_REGION, EMBEDDINGS_MODEL_ID, EMBEDDINGS_PROVIDER
+from src.services.retrieval.cached_embeddings import CachedEmbeddings
+from src.utils.environment import (
+    AMAZON_REGION,
+    EMBEDDINGS_MODEL_ID,
+    EMBEDDINGS_PROVIDER,
+    FAKE_EMBEDDINGS_DIMENSIONS,
+    FAKE_EMBEDDINGS_LATENCY_MS,
+)
 
 class EmbeddingFactory:
     """
     Factory to create embeddings based on the specified provider (Bedrock or OpenAI).
+
+    Provider packages are imported on demand, so only the configured one is loaded.
     """
     
     @staticmethod
     def create_embeddings():
+        """Create the provider embeddings wrapped with the query cache and batcher."""
+        return CachedEmbeddings(
+            EmbeddingFactory._create_provider_embeddings(),
+            namespace=f"{EMBEDDINGS_PROVIDER}:{EMBEDDINGS_MODEL_ID}",
+        )
+
+    @staticmethod
+    def create_document_embeddings():
+        """Create the provider embeddings alone, for bulk ingestion that should not fill the query cache."""
+        return EmbeddingFactory._create_provider_embeddings()
+
+    @staticmethod
+    def _create_provider_embeddings():
         if EMBEDDINGS_PROVIDER == "bedrock":
+            from langchain_aws import BedrockEmbeddings
+
             return BedrockEmbeddings(
                 region_name=AMAZON_REGION,
                 model_id=EMBEDDINGS_MODEL_ID,
             )
         elif EMBEDDINGS_PROVIDER == "openai":
+            from langchain_openai import OpenAIEmbeddings
+
             return OpenAIEmbeddings(model=EMBEDDINGS_MODEL_ID)
+        elif EMBEDDINGS_PROVIDER == "fake":
+            from src.services.retrieval.fake_embeddings import FakeEmbeddings
+
+            return FakeEmbeddings(dimensions=FAKE_EMBEDDINGS_DIMENSIONS, latency_ms=FAKE_EMBEDDINGS_LATENCY_MS)
         else:
             raise ValueError(f"Unsupported embedding provider: {EMBEDDINGS_PROVIDER}")
@@ -0,0 +1,38 @@
+import hashlib
+import time
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.services.retrieval.lexical_search import tokenize
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic offline embeddings for benchmarks and local runs.
+
+    Each token is hashed into a fixed bucket of a normalized bag-of-words
+    vector, so texts sharing words are close, as with a real model.
+    latency_ms is slept once per provider call, like a network round trip.
+    """
+
+    def __init__(self, dimensions: int = 256, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += sign
+
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
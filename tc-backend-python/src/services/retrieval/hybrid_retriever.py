@@ -0,0 +1,90 @@
+import asyncio
+import concurrent.futures
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.services.retrieval.lexical_search import reciprocal_rank_fusion
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+
+# Shared by every request of the container, so the vector and lexical legs run side by side without per-request pools
+_legs_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-retrieval")
+
+
+def _timed(function, *args) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+async def _atimed(coroutine) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = await coroutine
+    return result, time.perf_counter() - start
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs the vector retriever and a lexical search concurrently and fuses both
+    rankings with reciprocal rank fusion.
+
+    The lexical leg catches exact plan names, error codes and SKUs that dense
+    embeddings miss, which also lets the vector leg use a smaller k. The fused
+    score is added to each document's metadata as "rrf_score". A metadata
+    filter and the collections to search are passed down to both legs, so
+    each one only scans the matching documents.
+    """
+
+    vector_retriever: BaseRetriever
+    lexical_search: Any
+    k: int = 4
+    lexical_k: int = 10
+    rrf_k: int = 60
+
+    def _fuse(
+        self, vector_documents: List[Document], lexical_documents: List[Document], vector_time: float, lexical_time: float,
+    ) -> List[Document]:
+        start = time.perf_counter()
+        fused = reciprocal_rank_fusion([vector_documents, lexical_documents], self.k, self.rrf_k)
+
+        documents = []
+        for document, score in fused:
+            documents.append(Document(
+                id=document.id,
+                page_content=document.page_content,
+                metadata={**document.metadata, "rrf_score": round(score, 6)},
+            ))
+
+        fusion_time = time.perf_counter() - start
+        tracer.record("lexical_search", 1000 * lexical_time)
+        tracer.record("rrf_fusion", 1000 * fusion_time)
+
+        logger.info(
+            f"Hybrid retrieval: vector={1000 * vector_time:.1f}ms ({len(vector_documents)} docs), "
+            f"lexical={1000 * lexical_time:.1f}ms ({len(lexical_documents)} docs), "
+            f"fusion={1000 * fusion_time:.1f}ms"
+        )
+        return documents
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        future_lexical = _legs_executor.submit(_timed, self.lexical_search.search, query, self.lexical_k, filter, collections)
+        vector_documents, vector_time = _timed(lambda: self.vector_retriever.invoke(query, filter=filter, collections=collections))
+        lexical_documents, lexical_time = future_lexical.result()
+
+        return self._fuse(vector_documents, lexical_documents, vector_time, lexical_time)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        (vector_documents, vector_time), (lexical_documents, lexical_time) = await asyncio.gather(
+            _atimed(self.vector_retriever.ainvoke(query, filter=filter, collections=collections)),
+            _atimed(self.lexical_search.asearch(query, self.lexical_k, filter, collections)),
+        )
+
+        return self._fuse(vector_documents, lexical_documents, vector_time, lexical_time)
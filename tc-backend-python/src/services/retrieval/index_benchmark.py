@@ -0,0 +1,129 @@
+"""
+Recall vs latency benchmark of the ANN index against exact search.
+
+Usage:
+    python -m src.services.retrieval.index_benchmark --queries queries.txt --k 4 --ef-search 20 40 80 160
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import text
+from src.services.retrieval.index_manager import DISTANCE_OPERATORS, VectorIndexManager
+from src.utils.logger import logger
+from src.utils.environment import COLLECTION_NAME, VECTOR_DISTANCE_METRIC
+
+
+def _to_vector_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(f"{value:.7g}" for value in vector) + "]"
+
+
+def _summarize(name: str, latencies: List[float], recalls: List[float]) -> Dict[str, Any]:
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "setting": name,
+        "recall": round(float(np.mean(recalls)), 4),
+        "mean_ms": round(float(latencies_ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+    }
+
+
+class IndexBenchmark:
+    """
+    Runs the same queries with exact search (index scans disabled) and with
+    the ANN index under different ef_search/probes values, and reports recall@k
+    and latency for each setting.
+    """
+
+    def __init__(self, manager: Optional[VectorIndexManager] = None, metric: str = VECTOR_DISTANCE_METRIC):
+        self.manager = manager or VectorIndexManager()
+        self.metric = metric
+        self.operator = DISTANCE_OPERATORS[metric]
+
+    def _search(self, collection_id: str, vector_literal: str, k: int, settings: Dict[str, Any]) -> tuple:
+        with self.manager.engine.begin() as conn:
+            for setting, value in settings.items():
+                conn.execute(text(f"SET LOCAL {setting} = {value}"))
+
+            start = time.perf_counter()
+            rows = conn.execute(
+                text(
+                    f"""
+                    SELECT id FROM {self.manager.embeddings_table}
+                    WHERE collection_id = :collection_id
+                    ORDER BY embedding {self.operator} CAST(:embedding AS vector)
+                    LIMIT :k
+                    """
+                ),
+                {"collection_id": collection_id, "embedding": vector_literal, "k": k},
+            ).all()
+            elapsed = time.perf_counter() - start
+
+        return [row.id for row in rows], elapsed
+
+    def run(
+        self,
+        query_vectors: List[List[float]],
+        collection_name: str = COLLECTION_NAME,
+        k: int = 4,
+        ef_search_values: Sequence[int] = (),
+        probes_values: Sequence[int] = (),
+    ) -> List[Dict[str, Any]]:
+        """Returns one result row for exact search and one per tested setting."""
+        collection_id = self.manager.get_collection_id(collection_name)
+        literals = [_to_vector_literal(vector) for vector in query_vectors]
+
+        exact_ids, exact_latencies = [], []
+        for literal in literals:
+            ids, elapsed = self._search(collection_id, literal, k, {"enable_indexscan": "off"})
+            exact_ids.append(set(ids))
+            exact_latencies.append(elapsed)
+
+        results = [_summarize("exact", exact_latencies, [1.0] * len(literals))]
+
+        settings = [("hnsw.ef_search", value) for value in ef_search_values]
+        settings += [("ivfflat.probes", value) for value in probes_values]
+
+        for setting, value in settings:
+            latencies, recalls = [], []
+            for literal, expected in zip(literals, exact_ids):
+                ids, elapsed = self._search(collection_id, literal, k, {setting: int(value)})
+                latencies.append(elapsed)
+                recalls.append(len(expected.intersection(ids)) / len(expected) if expected else 1.0)
+
+            results.append(_summarize(f"{setting}={value}", latencies, recalls))
+
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recall vs latency benchmark for the PGVector ANN index")
+    parser.add_argument("--queries", required=True, help="Text file with one query per line")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--metric", default=VECTOR_DISTANCE_METRIC)
+    parser.add_argument("--ef-search", type=int, nargs="*", default=[])
+    parser.add_argument("--probes", type=int, nargs="*", default=[])
+    args = parser.parse_args(argv)
+
+    from src.services.retrieval.embedding_factory import EmbeddingFactory
+    from src.utils.secrets import load_secrets
+
+    load_secrets()
+
+    with open(args.queries, encoding="utf-8") as file:
+        queries = [line.strip() for line in file if line.strip()]
+
+    logger.info(f"Embedding {len(queries)} benchmark queries")
+    query_vectors = EmbeddingFactory.create_embeddings().embed_documents(queries)
+
+    results = IndexBenchmark(metric=args.metric).run(
+        query_vectors, args.collection, args.k, args.ef_search, args.probes
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
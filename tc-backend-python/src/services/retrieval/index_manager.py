@@ -0,0 +1,204 @@
+"""
+ANN index management for the PGVector embeddings table.
+
+Usage:
+    python -m src.services.retrieval.index_manager create --method hnsw --metric cosine --m 16 --ef-construction 64
+    python -m src.services.retrieval.index_manager rebuild --method ivfflat
+    python -m src.services.retrieval.index_manager metadata-index --field category
+"""
+import argparse
+import json
+import math
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from src.services.retrieval.db_engine import get_engine
+from src.services.retrieval.metadata_filters import METADATA_FIELD_PATTERN
+from src.utils.logger import logger
+from src.utils.environment import COLLECTION_NAME, COLLECTIONS_TABLE, EMBEDDINGS_TABLE
+
+# pgvector operator class and distance operator for each metric
+DISTANCE_OPERATOR_CLASSES = {
+    "cosine": "vector_cosine_ops",
+    "euclidean": "vector_l2_ops",
+    "inner_product": "vector_ip_ops",
+}
+DISTANCE_OPERATORS = {
+    "cosine": "<=>",
+    "euclidean": "<->",
+    "inner_product": "<#>",
+}
+INDEX_METHODS = {"hnsw", "ivfflat"}
+
+
+class VectorIndexManager:
+    """
+    Creates, rebuilds and drops approximate nearest neighbour indexes (HNSW or
+    IVFFlat) on the embeddings table.
+
+    Indexes are partial, one per collection, so each collection can be tuned and
+    rebuilt independently. pgvector can only index a column with a fixed
+    dimension, so the embedding column must be declared as vector(n).
+    """
+
+    def __init__(self, engine=None, embeddings_table: str = EMBEDDINGS_TABLE, collections_table: str = COLLECTIONS_TABLE):
+        self.engine = engine or get_engine()
+        self.embeddings_table = embeddings_table
+        self.collections_table = collections_table
+
+    @staticmethod
+    def _validate(method: str, metric: str) -> None:
+        if method not in INDEX_METHODS:
+            raise ValueError(f"Unsupported index method: {method}")
+        if metric not in DISTANCE_OPERATOR_CLASSES:
+            raise ValueError(f"Unsupported distance metric: {metric}")
+
+    def index_name(self, collection_name: str, method: str, metric: str) -> str:
+        """Returns the name used for the index of a collection."""
+        safe_collection = "".join(char if char.isalnum() else "_" for char in collection_name.lower())
+        return f"{self.embeddings_table}_{safe_collection}_{method}_{metric}_idx"[:63]
+
+    def get_collection_id(self, collection_name: str) -> str:
+        """Returns the uuid of a collection."""
+        with self.engine.connect() as conn:
+            collection_id = conn.execute(
+                text(f"SELECT uuid FROM {self.collections_table} WHERE name = :name"),
+                {"name": collection_name},
+            ).scalar()
+
+        if collection_id is None:
+            raise ValueError(f"Collection not found: {collection_name}")
+        return str(collection_id)
+
+    def count_rows(self, collection_id: str) -> int:
+        """Returns the number of embeddings stored for a collection."""
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(f"SELECT COUNT(*) FROM {self.embeddings_table} WHERE collection_id = :collection_id"),
+                {"collection_id": collection_id},
+            ).scalar_one()
+
+    def create_index(
+        self,
+        collection_name: str,
+        method: str = "hnsw",
+        metric: str = "cosine",
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+        concurrently: bool = True,
+    ) -> str:
+        """
+        Creates the index for a collection and returns its name.
+
+        For IVFFlat, lists defaults to rows / 1000 (at least 1), the pgvector
+        recommendation for tables under a million rows.
+        """
+        self._validate(method, metric)
+        collection_id = self.get_collection_id(collection_name)
+        index_name = self.index_name(collection_name, method, metric)
+
+        if method == "hnsw":
+            parameters = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+        else:
+            lists = lists or max(1, math.ceil(self.count_rows(collection_id) / 1000))
+            parameters = f"lists = {int(lists)}"
+
+        statement = (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name} "
+            f"ON {self.embeddings_table} USING {method} (embedding {DISTANCE_OPERATOR_CLASSES[metric]}) "
+            f"WITH ({parameters}) WHERE collection_id = '{collection_id}'"
+        )
+
+        logger.info(f"Creating vector index: {statement}")
+        self._execute_autocommit(statement)
+        return index_name
+
+    def rebuild_index(self, collection_name: str, method: str = "hnsw", metric: str = "cosine", concurrently: bool = True) -> str:
+        """Rebuilds an existing index, e.g. after a large ingestion changed the data distribution."""
+        self._validate(method, metric)
+        index_name = self.index_name(collection_name, method, metric)
+
+        logger.info(f"Rebuilding vector index {index_name}")
+        self._execute_autocommit(f"REINDEX INDEX {'CONCURRENTLY ' if concurrently else ''}{index_name}")
+        return index_name
+
+    def drop_index(self, collection_name: str, method: str = "hnsw", metric: str = "cosine", concurrently: bool = True) -> None:
+        """Drops the index of a collection if it exists."""
+        self._validate(method, metric)
+        index_name = self.index_name(collection_name, method, metric)
+
+        logger.info(f"Dropping vector index {index_name}")
+        self._execute_autocommit(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {index_name}")
+
+    def create_metadata_index(self, field: str) -> str:
+        """
+        Creates a btree index on cmetadata ->> field. It serves the equality and
+        $in conditions of vector searches (sent to PGVector as $in, see
+        to_pgvector_filter) and of full-text searches (filter_to_sql); $ne and
+        $nin conditions still scan.
+        """
+        if not METADATA_FIELD_PATTERN.match(field):
+            raise ValueError(f"Invalid metadata field: {field}")
+
+        index_name = f"{self.embeddings_table}_metadata_{field.lower()}_idx"[:63]
+        logger.info(f"Creating metadata index {index_name}")
+        self._execute_autocommit(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+            f"ON {self.embeddings_table} ((cmetadata ->> '{field}'))"
+        )
+        return index_name
+
+    def list_indexes(self) -> List[Dict[str, Any]]:
+        """Lists the indexes on the embeddings table with their definition and size."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    """
+                    SELECT indexname, indexdef, pg_relation_size(quote_ident(indexname)::regclass) AS size_bytes
+                    FROM pg_indexes
+                    WHERE tablename = :table
+                    """
+                ),
+                {"table": self.embeddings_table},
+            ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def _execute_autocommit(self, statement: str) -> None:
+        # CREATE/REINDEX/DROP INDEX CONCURRENTLY cannot run inside a transaction
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(statement))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage ANN indexes on the PGVector embeddings table")
+    parser.add_argument("action", choices=["create", "rebuild", "drop", "metadata-index", "list"])
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--method", choices=sorted(INDEX_METHODS), default="hnsw")
+    parser.add_argument("--metric", choices=sorted(DISTANCE_OPERATOR_CLASSES), default="cosine")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int)
+    parser.add_argument("--field", help="Metadata field indexed by metadata-index")
+    args = parser.parse_args(argv)
+
+    from src.utils.secrets import load_secrets
+
+    load_secrets()
+    manager = VectorIndexManager()
+
+    if args.action == "create":
+        manager.create_index(args.collection, args.method, args.metric, args.m, args.ef_construction, args.lists)
+    elif args.action == "rebuild":
+        manager.rebuild_index(args.collection, args.method, args.metric)
+    elif args.action == "drop":
+        manager.drop_index(args.collection, args.method, args.metric)
+    elif args.action == "metadata-index":
+        if not args.field:
+            parser.error("metadata-index requires --field")
+        manager.create_metadata_index(args.field)
+
+    print(json.dumps(manager.list_indexes(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Incremental ingestion of source documents into a PGVector collection.
+
+Usage:
+    python -m src.services.retrieval.ingestion docs/ --collection faq
+    python -m src.services.retrieval.ingestion docs/billing --metadata '{"category": "billing"}' --prune
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from langchain_core.documents import Document
+from sqlalchemy import text
+from src.services.retrieval.db_engine import get_engine
+from src.services.retrieval.embedding_factory import EmbeddingFactory
+from src.services.retrieval.index_manager import VectorIndexManager
+from src.utils.logger import logger
+from src.utils.text_normalization import normalize_whitespace
+from src.utils.tokens import CHARS_PER_TOKEN
+from src.utils.environment import (
+    COLLECTION_NAME,
+    COLLECTIONS_TABLE,
+    EMBEDDINGS_TABLE,
+    INGESTION_CHUNK_OVERLAP_TOKENS,
+    INGESTION_CHUNK_TOKENS,
+    INGESTION_EMBED_BATCH_SIZE,
+    INGESTION_MAX_CONCURRENCY,
+)
+
+# Plain text and markdown files are chunked by paragraph; JSONL files hold one
+# {"page_content", "metadata", "id"} document per line, like the offline corpus
+SOURCE_SUFFIXES = {".md", ".txt", ".jsonl"}
+STAGING_TABLE = "ingestion_staging"
+DELETE_BATCH_SIZE = 1000
+
+
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Groups lines into paragraphs separated by blank lines, without reading ahead."""
+    paragraph = []
+    for line in lines:
+        if line.strip():
+            paragraph.append(line.strip())
+        elif paragraph:
+            yield normalize_whitespace(" ".join(paragraph))
+            paragraph = []
+    if paragraph:
+        yield normalize_whitespace(" ".join(paragraph))
+
+
+def _split_words(paragraph: str, max_chars: int) -> Iterator[str]:
+    piece = ""
+    for word in paragraph.split(" "):
+        if piece and len(piece) + 1 + len(word) > max_chars:
+            yield piece
+            piece = word
+        else:
+            piece = f"{piece} {word}" if piece else word
+    if piece:
+        yield piece
+
+
+def _tail(chunk: str, max_chars: int) -> str:
+    if max_chars <= 0:
+        return ""
+    return chunk if len(chunk) <= max_chars else chunk[-max_chars:].split(" ", 1)[-1]
+
+
+def chunk_paragraphs(paragraphs: Iterable[str], chunk_tokens: int, overlap_tokens: int = 0) -> Iterator[str]:
+    """
+    Packs paragraphs into chunks of about chunk_tokens, splitting paragraphs
+    that do not fit on word boundaries. Each chunk starts with the last
+    overlap_tokens of the previous one.
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+
+    chunk = ""
+    for paragraph in paragraphs:
+        for piece in _split_words(paragraph, max_chars):
+            if chunk and len(chunk) + 1 + len(piece) > max_chars:
+                yield chunk
+                chunk = _tail(chunk, overlap_chars)
+            chunk = f"{chunk} {piece}" if chunk else piece
+    if chunk:
+        yield chunk
+
+
+def iter_source_files(paths: Sequence[str]) -> Iterator[Tuple[str, Path]]:
+    """Yields (source name, path) for each supported file; sources are relative to the given directories."""
+    for path in map(Path, paths):
+        if path.is_dir():
+            for file in sorted(path.rglob("*")):
+                if file.is_file() and file.suffix in SOURCE_SUFFIXES:
+                    yield file.relative_to(path).as_posix(), file
+        elif path.suffix in SOURCE_SUFFIXES:
+            yield path.name, path
+        else:
+            raise ValueError(f"Unsupported source file: {path}")
+
+
+def iter_sources(paths: Sequence[str]) -> Iterator[Tuple[str, Dict[str, Any], Iterator[str]]]:
+    """Streams (source, metadata, paragraphs) for every document in the paths."""
+    for name, path in iter_source_files(paths):
+        with open(path, encoding="utf-8") as file:
+            if path.suffix != ".jsonl":
+                yield name, {}, iter_paragraphs(file)
+                continue
+
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                metadata = row.get("metadata", {})
+                source = metadata.get("source") or f"{name}#{row.get('id', line_number)}"
+                yield source, metadata, iter_paragraphs(row["page_content"].splitlines())
+
+
+def _metadata_hash(metadata: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(metadata, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def _to_vector_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(f"{value:.7g}" for value in vector) + "]"
+
+
+def _copy_rows(cursor, statement: str, rows: List[Tuple]) -> None:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+
+    if hasattr(cursor, "copy"):
+        # psycopg 3
+        with cursor.copy(statement) as copy:
+            copy.write(buffer.getvalue())
+    else:
+        # psycopg2
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+
+
+class IngestionPipeline:
+    """
+    Loads source files into a PGVector collection, touching only what changed.
+
+    Files are streamed and chunked by generators, so memory stays bounded by
+    the in-flight batches. Every chunk gets an id derived from the collection,
+    its source and hashes of its content and metadata: chunks already stored
+    are skipped, new ones are embedded in batches of batch_size with up to
+    max_concurrency batches in flight and bulk-loaded with COPY into a staging
+    table that is upserted into the embeddings table. Stored chunks of an
+    ingested source that no longer appear in it (including those whose
+    metadata changed) are deleted; with prune, so are the chunks of sources
+    missing from the run.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = COLLECTION_NAME,
+        embeddings=None,
+        engine=None,
+        embeddings_table: str = EMBEDDINGS_TABLE,
+        collections_table: str = COLLECTIONS_TABLE,
+        chunk_tokens: int = INGESTION_CHUNK_TOKENS,
+        overlap_tokens: int = INGESTION_CHUNK_OVERLAP_TOKENS,
+        batch_size: int = INGESTION_EMBED_BATCH_SIZE,
+        max_concurrency: int = INGESTION_MAX_CONCURRENCY,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self.collection_name = collection_name
+        self.embeddings = embeddings or EmbeddingFactory.create_document_embeddings()
+        self.engine = engine or get_engine()
+        self.embeddings_table = embeddings_table
+        self.collections_table = collections_table
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.metadata = metadata or {}
+
+    def chunk_id(self, source: str, content_hash: str, metadata_hash: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.collection_name}\0{source}\0{content_hash}\0{metadata_hash}"))
+
+    def iter_chunks(self, paths: Sequence[str]) -> Iterator[Document]:
+        """Streams the chunks of every source as documents with their ids and metadata."""
+        for source, metadata, paragraphs in iter_sources(paths):
+            # --metadata and the JSONL metadata are part of the id, so editing them updates the stored rows
+            source_metadata = {**self.metadata, **metadata, "source": source}
+            metadata_hash = _metadata_hash(source_metadata)
+            for chunk in chunk_paragraphs(paragraphs, self.chunk_tokens, self.overlap_tokens):
+                content_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+                yield Document(
+                    id=self.chunk_id(source, content_hash, metadata_hash),
+                    page_content=chunk,
+                    metadata={**source_metadata, "content_hash": content_hash},
+                )
+
+    def _ensure_collection(self) -> str:
+        index_manager = VectorIndexManager(self.engine, self.embeddings_table, self.collections_table)
+        try:
+            return index_manager.get_collection_id(self.collection_name)
+        except ValueError:
+            logger.info(f"Creating collection {self.collection_name}")
+            collection_id = str(uuid.uuid4())
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(f"INSERT INTO {self.collections_table} (uuid, name, cmetadata) VALUES (:uuid, :name, '{{}}')"),
+                    {"uuid": collection_id, "name": self.collection_name},
+                )
+            return collection_id
+
+    def _stored_chunks(self, collection_id: str) -> Dict[str, Set[str]]:
+        """Ids of the chunks stored in the collection, by source."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(f"SELECT id, cmetadata ->> 'source' AS source FROM {self.embeddings_table} WHERE collection_id = :collection_id"),
+                {"collection_id": collection_id},
+            ).all()
+
+        stored: Dict[str, Set[str]] = {}
+        for row in rows:
+            stored.setdefault(row.source, set()).add(str(row.id))
+        return stored
+
+    def _upsert(self, collection_id: str, documents: List[Document]) -> int:
+        """Embeds a batch of chunks and upserts it with a single COPY."""
+        vectors = self.embeddings.embed_documents([document.page_content for document in documents])
+        rows = [
+            (document.id, collection_id, _to_vector_literal(vector), document.page_content, json.dumps(document.metadata, ensure_ascii=False))
+            for document, vector in zip(documents, vectors)
+        ]
+        columns = "id, collection_id, embedding, document, cmetadata"
+
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE TEMP TABLE {STAGING_TABLE} (LIKE {self.embeddings_table} INCLUDING DEFAULTS) ON COMMIT DROP")
+                _copy_rows(cursor, f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)", rows)
+                cursor.execute(
+                    f"INSERT INTO {self.embeddings_table} ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+                    "ON CONFLICT (id) DO UPDATE SET collection_id = EXCLUDED.collection_id, embedding = EXCLUDED.embedding, "
+                    "document = EXCLUDED.document, cmetadata = EXCLUDED.cmetadata"
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        return len(rows)
+
+    def _delete(self, collection_id: str, ids: List[str]) -> int:
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(f"DELETE FROM {self.embeddings_table} WHERE collection_id = :collection_id AND id = ANY(:ids)"),
+                    {"collection_id": collection_id, "ids": ids[start:start + DELETE_BATCH_SIZE]},
+                )
+        return len(ids)
+
+    @staticmethod
+    def _drain(in_flight: Deque[Future], limit: int) -> int:
+        # Waits for the oldest batches until at most limit remain in flight
+        written = 0
+        while len(in_flight) > limit:
+            written += in_flight.popleft().result()
+        return written
+
+    def run(self, paths: Sequence[str], prune: bool = False) -> Dict[str, Any]:
+        """Ingests the paths and returns counts and throughput of the run."""
+        start = time.perf_counter()
+        collection_id = self._ensure_collection()
+        stored = self._stored_chunks(collection_id)
+        stored_ids = set().union(*stored.values())
+
+        seen_sources: Set[str] = set()
+        seen_ids: Set[str] = set()
+        counts = {"chunks": 0, "unchanged": 0, "embedded": 0}
+        in_flight: Deque[Future] = deque()
+        batch: List[Document] = []
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ingestion") as executor:
+            for document in self.iter_chunks(paths):
+                counts["chunks"] += 1
+                seen_sources.add(document.metadata["source"])
+                if document.id in seen_ids:
+                    # The same chunk repeated within a source
+                    continue
+
+                seen_ids.add(document.id)
+                if document.id in stored_ids:
+                    counts["unchanged"] += 1
+                    continue
+
+                batch.append(document)
+                if len(batch) == self.batch_size:
+                    in_flight.append(executor.submit(self._upsert, collection_id, batch))
+                    batch = []
+                    counts["embedded"] += self._drain(in_flight, self.max_concurrency)
+
+            if batch:
+                in_flight.append(executor.submit(self._upsert, collection_id, batch))
+            counts["embedded"] += self._drain(in_flight, 0)
+
+        stale = [
+            chunk_id
+            for source, ids in stored.items()
+            if prune or source in seen_sources
+            for chunk_id in ids - seen_ids
+        ]
+        deleted = self._delete(collection_id, stale)
+
+        elapsed = time.perf_counter() - start
+        report = {
+            "collection": self.collection_name,
+            "sources": len(seen_sources),
+            **counts,
+            "deleted": deleted,
+            "seconds": round(elapsed, 2),
+            "chunks_per_second": round(counts["chunks"] / elapsed, 1) if elapsed else 0.0,
+            "embedded_per_second": round(counts["embedded"] / elapsed, 1) if elapsed else 0.0,
+        }
+        logger.info(
+            f"Ingested {report['sources']} sources into {self.collection_name}: {report['chunks']} chunks "
+            f"({report['unchanged']} unchanged, {report['embedded']} embedded, {deleted} deleted) "
+            f"in {report['seconds']}s, {report['chunks_per_second']} chunks/s"
+        )
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Ingest documents into a PGVector collection, skipping unchanged chunks")
+    parser.add_argument("paths", nargs="+", help="Files or directories of .md, .txt and .jsonl documents")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--metadata", type=json.loads, default={}, help="JSON metadata added to every chunk")
+    parser.add_argument("--prune", action="store_true", help="Also delete the chunks of sources missing from the paths")
+    parser.add_argument("--chunk-tokens", type=int, default=INGESTION_CHUNK_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=INGESTION_CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--batch-size", type=int, default=INGESTION_EMBED_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=INGESTION_MAX_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    from src.utils.secrets import load_secrets
+
+    load_secrets()
+    pipeline = IngestionPipeline(
+        collection_name=args.collection,
+        chunk_tokens=args.chunk_tokens,
+        overlap_tokens=args.overlap_tokens,
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency,
+        metadata=args.metadata,
+    )
+    print(json.dumps(pipeline.run(args.paths, prune=args.prune), indent=2))
+
+
+if __name__ == "__main__":
+    main()
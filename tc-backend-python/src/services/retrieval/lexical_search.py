@@ -0,0 +1,283 @@
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables.config import run_in_executor
+from sqlalchemy import text
+from src.services.retrieval.db_engine import get_engine
+from src.services.retrieval.index_manager import VectorIndexManager
+from src.services.retrieval.metadata_filters import filter_to_sql, matches_filter
+from src.utils.logger import logger
+from src.utils.environment import COLLECTION_NAME, EMBEDDINGS_TABLE, HYBRID_TEXT_SEARCH_CONFIG, RETRIEVAL_COLLECTIONS
+
+TOKEN_PATTERN = re.compile(r"\w+")
+TEXT_SEARCH_CONFIG_PATTERN = re.compile(r"^[a-z_]+$")
+
+
+def tokenize(text_value: str) -> List[str]:
+    """Lowercases, strips accents and splits text into word tokens."""
+    normalized = unicodedata.normalize("NFKD", text_value.lower())
+    without_accents = "".join(char for char in normalized if not unicodedata.combining(char))
+    return TOKEN_PATTERN.findall(without_accents)
+
+
+class LexicalSearch:
+    """
+    Interface of the lexical leg used by the hybrid retriever. Searches take
+    the same metadata filter as the vector leg and, where the backend has
+    them, the names of the collections to search.
+    """
+
+    def search(
+        self, query: str, k: int, metadata_filter: Optional[Dict[str, Any]] = None, collections: Optional[List[str]] = None
+    ) -> List[Document]:
+        raise NotImplementedError
+
+    async def asearch(
+        self, query: str, k: int, metadata_filter: Optional[Dict[str, Any]] = None, collections: Optional[List[str]] = None
+    ) -> List[Document]:
+        # The sync search blocks (BM25 scoring, a sync DB query), so it runs off the event loop
+        return await run_in_executor(None, self.search, query, k, metadata_filter, collections)
+
+
+class PostgresFullTextSearch(LexicalSearch):
+    """
+    Full-text search over the documents of the embeddings table using a
+    tsvector expression. create_index() adds the matching GIN index so the
+    lexical leg stays an index scan as the corpus grows.
+
+    The search covers collection_names, or the subset passed per query, and
+    metadata filters are applied in the same statement on the JSONB metadata.
+    """
+
+    def __init__(
+        self,
+        collection_names: Optional[List[str]] = None,
+        embeddings_table: str = EMBEDDINGS_TABLE,
+        config: str = HYBRID_TEXT_SEARCH_CONFIG,
+        engine=None,
+        async_engine=None,
+    ):
+        if not TEXT_SEARCH_CONFIG_PATTERN.match(config):
+            raise ValueError(f"Invalid text search configuration: {config}")
+
+        self.collection_names = list(collection_names or RETRIEVAL_COLLECTIONS)
+        self.embeddings_table = embeddings_table
+        self.config = config
+        self.engine = engine or get_engine()
+        self.async_engine = async_engine
+        self._collection_ids: Dict[str, str] = {}
+
+    def collection_ids(self, collections: Optional[List[str]] = None) -> List[str]:
+        """
+        Ids of the requested collections, resolved once. Like
+        CollectionFanOutRetriever, unknown names are ignored and a selection
+        with no known collection searches all of collection_names.
+        """
+        names = [name for name in self.collection_names if collections and name in collections] or self.collection_names
+        missing = [name for name in names if name not in self._collection_ids]
+        if missing:
+            index_manager = VectorIndexManager(self.engine)
+            for name in missing:
+                self._collection_ids[name] = index_manager.get_collection_id(name)
+        return [self._collection_ids[name] for name in names]
+
+    def _tsvector(self) -> str:
+        # The configuration is inlined so the expression matches the GIN index
+        return f"to_tsvector('{self.config}'::regconfig, document)"
+
+    def _statement(self, metadata_condition: str):
+        return text(
+            f"""
+            SELECT id, document, cmetadata, ts_rank_cd({self._tsvector()}, query) AS rank
+            FROM {self.embeddings_table}, to_tsquery('{self.config}'::regconfig, :query) AS query
+            WHERE collection_id = ANY(CAST(:collection_ids AS uuid[])) AND {metadata_condition} AND {self._tsvector()} @@ query
+            ORDER BY rank DESC
+            LIMIT :k
+            """
+        )
+
+    def _query(self, query: str, k: int, metadata_filter: Optional[Dict[str, Any]], collections: Optional[List[str]]):
+        """Statement and parameters of a search, or None when it cannot match anything."""
+        tsquery = self._to_tsquery(query)
+        collection_ids = self.collection_ids(collections)
+        if not tsquery or not collection_ids:
+            return None
+
+        metadata_condition, params = filter_to_sql(metadata_filter)
+        return self._statement(metadata_condition), {**params, "query": tsquery, "collection_ids": collection_ids, "k": k}
+
+    @staticmethod
+    def _to_tsquery(query: str) -> str:
+        # Any matching term counts; ts_rank_cd rewards documents matching more of them.
+        # Accents are kept because the text search configuration does not strip them.
+        return " | ".join(dict.fromkeys(TOKEN_PATTERN.findall(query.lower())))
+
+    @staticmethod
+    def _to_documents(rows) -> List[Document]:
+        return [Document(id=str(row.id), page_content=row.document, metadata=row.cmetadata or {}) for row in rows]
+
+    def search(
+        self, query: str, k: int, metadata_filter: Optional[Dict[str, Any]] = None, collections: Optional[List[str]] = None
+    ) -> List[Document]:
+        prepared = self._query(query, k, metadata_filter, collections)
+        if prepared is None:
+            return []
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(*prepared).all()
+        return self._to_documents(rows)
+
+    async def asearch(
+        self, query: str, k: int, metadata_filter: Optional[Dict[str, Any]] = None, collections: Optional[List[str]] = None
+    ) -> List[Document]:
+        if self.async_engine is None:
+            return await super().asearch(query, k, metadata_filter, collections)
+
+        prepared = self._query(query, k, metadata_filter, collections)
+        if prepared is None:
+            return []
+
+        async with self.async_engine.connect() as conn:
+            result = await conn.execute(*prepared)
+            rows = result.all()
+        return self._to_documents(rows)
+
+    def create_index(self) -> str:
+        """Creates the GIN index backing the full-text search of the collection."""
+        index_name = f"{self.embeddings_table}_{self.config}_fts_idx"[:63]
+        statement = (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+            f"ON {self.embeddings_table} USING gin ({self._tsvector()})"
+        )
+
+        logger.info(f"Creating full-text index: {statement}")
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(statement))
+        return index_name
+
+
+class BM25Index(LexicalSearch):
+    """
+    In-process Okapi BM25 index. Scoring is vectorized per query term over
+    posting arrays, so it stays cheap for corpora that fit in the container.
+
+    Metadata filters become a boolean mask over the documents, computed once
+    per distinct filter. The index holds a single merged corpus, so the
+    collections argument is ignored; filter on a metadata field instead.
+    """
+
+    def __init__(self, documents: Sequence[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for index, document in enumerate(self.documents):
+            tokens = tokenize(document.page_content)
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings[term][0].append(index)
+                postings[term][1].append(frequency)
+
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if lengths else 0.0
+
+        total = len(self.documents)
+        self.postings = {}
+        for term, (doc_ids, frequencies) in postings.items():
+            idf = math.log(1 + (total - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            self.postings[term] = (np.asarray(doc_ids), np.asarray(frequencies, dtype=np.float32), idf)
+
+        self._filter_masks: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_collection(cls, collection_name: str = COLLECTION_NAME, embeddings_table: str = EMBEDDINGS_TABLE, engine=None) -> "BM25Index":
+        """Builds the index from every document stored for a collection."""
+        return cls.from_collections([collection_name], embeddings_table, engine)
+
+    @classmethod
+    def from_collections(cls, collection_names: Optional[List[str]] = None, embeddings_table: str = EMBEDDINGS_TABLE, engine=None) -> "BM25Index":
+        """Builds one index over the documents of several collections."""
+        engine = engine or get_engine()
+        index_manager = VectorIndexManager(engine)
+        collection_ids = [index_manager.get_collection_id(name) for name in collection_names or RETRIEVAL_COLLECTIONS]
+
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    f"SELECT id, document, cmetadata FROM {embeddings_table} "
+                    "WHERE collection_id = ANY(CAST(:collection_ids AS uuid[]))"
+                ),
+                {"collection_ids": collection_ids},
+            ).all()
+
+        logger.info(f"Building BM25 index over {len(rows)} documents")
+        return cls(PostgresFullTextSearch._to_documents(rows))
+
+    def filter_mask(self, metadata_filter: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of the documents matching a metadata filter."""
+        key = json.dumps(metadata_filter, sort_keys=True, default=str)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (matches_filter(document.metadata, metadata_filter) for document in self.documents),
+                dtype=bool,
+                count=len(self.documents),
+            )
+            with self._lock:
+                self._filter_masks[key] = mask
+        return mask
+
+    def score(self, query: str) -> np.ndarray:
+        """Returns the BM25 score of every document for the query."""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        if not self.documents:
+            return scores
+
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.avg_doc_length or 1.0))
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, frequencies, idf = posting
+            scores[doc_ids] += idf * frequencies * (self.k1 + 1) / (frequencies + length_norm[doc_ids])
+        return scores
+
+    def search(
+        self, query: str, k: int, metadata_filter: Optional[Dict[str, Any]] = None, collections: Optional[List[str]] = None
+    ) -> List[Document]:
+        scores = self.score(query)
+        if metadata_filter:
+            scores[~self.filter_mask(metadata_filter)] = 0.0
+        matches = np.flatnonzero(scores)
+        if matches.size == 0:
+            return []
+
+        top = matches[np.argsort(-scores[matches])[:k]]
+        return [self.documents[index] for index in top]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Document]], k: int, rrf_k: int = 60) -> List[Tuple[Document, float]]:
+    """
+    Fuses ranked document lists with reciprocal rank fusion: each document
+    scores the sum of 1 / (rrf_k + rank) over the lists it appears in.
+    """
+    scores = defaultdict(float)
+    documents = {}
+
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document.id or document.page_content
+            scores[key] += 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [(documents[key], score) for key, score in fused]
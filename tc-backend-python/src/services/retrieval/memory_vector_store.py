@@ -0,0 +1,40 @@
+import json
+from typing import List
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from src.utils.logger import logger
+
+
+def load_corpus(path: str) -> List[Document]:
+    """
+    Loads documents from a JSONL file with one {"page_content", "metadata", "id"}
+    object per line; metadata and id are optional.
+    """
+    if not path:
+        raise ValueError("VECTOR_STORE_CORPUS_PATH is required for the in-memory vector store")
+
+    documents = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            documents.append(Document(
+                id=str(row.get("id", len(documents))),
+                page_content=row["page_content"],
+                metadata=row.get("metadata", {}),
+            ))
+    return documents
+
+
+def create_memory_vector_store(embeddings: Embeddings, documents: List[Document]):
+    """
+    Builds an in-process vector store over the documents. It stands in for
+    PGVector in offline benchmarks and local runs, without a database.
+    """
+    from langchain_core.vectorstores import InMemoryVectorStore
+
+    logger.info(f"Building in-memory vector store over {len(documents)} documents")
+    store = InMemoryVectorStore(embeddings)
+    store.add_documents(documents)
+    return store
@@ -0,0 +1,105 @@
+import json
+import re
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Operators understood by PGVector (JSONB filters), filter_to_sql and matches_filter
+SUPPORTED_OPERATORS = {"$eq", "$ne", "$in", "$nin"}
+METADATA_FIELD_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def validate_filter(metadata_filter: Dict[str, Any]) -> Dict[str, Any]:
+    """Checks that a metadata filter only uses field conditions with supported operators."""
+    if not isinstance(metadata_filter, dict):
+        raise ValueError(f"Metadata filter must be an object: {metadata_filter!r}")
+
+    for field, condition in metadata_filter.items():
+        if not METADATA_FIELD_PATTERN.match(field):
+            raise ValueError(f"Invalid metadata filter field: {field}")
+        if isinstance(condition, dict):
+            unsupported = set(condition) - SUPPORTED_OPERATORS
+            if unsupported:
+                raise ValueError(f"Unsupported metadata filter operators for {field}: {', '.join(sorted(unsupported))}")
+    return metadata_filter
+
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for operator, operand in condition.items():
+        if operator == "$eq" and value != operand:
+            return False
+        if operator == "$ne" and value == operand:
+            return False
+        if operator == "$in" and value not in operand:
+            return False
+        if operator == "$nin" and value in operand:
+            return False
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """True when the document metadata satisfies every field condition of the filter."""
+    if not metadata_filter:
+        return True
+    return all(_matches_condition(metadata.get(field), condition) for field, condition in metadata_filter.items())
+
+
+def to_document_predicate(metadata_filter: Dict[str, Any]) -> Callable[[Any], bool]:
+    """Filter callable for stores that take a predicate over documents, like InMemoryVectorStore."""
+    return lambda document: matches_filter(document.metadata, metadata_filter)
+
+
+def _is_text_comparable(value: Any) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def to_pgvector_filter(metadata_filter: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rewrites equality conditions on strings and numbers as one-element $in
+    conditions. PGVector compiles $eq to jsonb_path_match(), which no index
+    can serve, and $in to cmetadata ->> field IN (...), which the
+    create_metadata_index expression index serves.
+    """
+    rewritten = {}
+    for field, condition in metadata_filter.items():
+        if isinstance(condition, dict) and set(condition) == {"$eq"}:
+            condition = condition["$eq"]
+        rewritten[field] = {"$in": [condition]} if _is_text_comparable(condition) else condition
+    return rewritten
+
+
+def _as_text(value: Any) -> str:
+    # ->> returns JSON scalars as text: true, 5, billing
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def filter_to_sql(metadata_filter: Optional[Dict[str, Any]], column: str = "cmetadata") -> Tuple[str, Dict[str, Any]]:
+    """
+    Translates a metadata filter into a SQL condition on a JSONB column and its
+    bind parameters, for queries written by hand (full-text search).
+    """
+    if not metadata_filter:
+        return "TRUE", {}
+
+    clauses, params = [], {}
+    for field_index, (field, condition) in enumerate(validate_filter(metadata_filter).items()):
+        expression = f"{column} ->> '{field}'"
+        conditions = condition if isinstance(condition, dict) else {"$eq": condition}
+
+        for operator_index, (operator, operand) in enumerate(conditions.items()):
+            name = f"filter_{field_index}_{operator_index}"
+            if operator == "$eq":
+                clauses.append(f"{expression} = :{name}")
+                params[name] = _as_text(operand)
+            elif operator == "$ne":
+                clauses.append(f"({expression} IS NULL OR {expression} <> :{name})")
+                params[name] = _as_text(operand)
+            elif operator == "$in":
+                clauses.append(f"{expression} = ANY(:{name})")
+                params[name] = [_as_text(value) for value in operand]
+            elif operator == "$nin":
+                clauses.append(f"({expression} IS NULL OR NOT {expression} = ANY(:{name}))")
+                params[name] = [_as_text(value) for value in operand]
+
+    return " AND ".join(clauses), params
@@ -0,0 +1,148 @@
+import random
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.services.retrieval.lexical_search import tokenize
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+from src.utils.tokens import estimate_tokens
+
+
+class LexicalReranker:
+    """
+    CPU-only reranker. Candidates are scored with BM25 computed over the
+    candidate set itself (a documents x query-terms matrix), blended with a
+    reciprocal-rank prior that keeps the retriever's original ordering signal.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, rank_weight: float = 0.2):
+        self.k1 = k1
+        self.b = b
+        self.rank_weight = rank_weight
+
+    def score(self, query: str, documents: List[Document]) -> np.ndarray:
+        """Returns one relevance score per candidate document."""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not documents:
+            return np.zeros(0, dtype=np.float32)
+
+        term_index = {term: column for column, term in enumerate(query_terms)}
+        frequencies = np.zeros((len(documents), len(query_terms)), dtype=np.float32)
+        lengths = np.zeros(len(documents), dtype=np.float32)
+
+        for row, document in enumerate(documents):
+            tokens = tokenize(document.page_content)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                column = term_index.get(token)
+                if column is not None:
+                    frequencies[row, column] += 1
+
+        document_frequency = (frequencies > 0).sum(axis=0)
+        idf = np.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / max(float(lengths.mean()), 1.0))
+        bm25 = (idf * frequencies * (self.k1 + 1) / (frequencies + length_norm[:, None])).sum(axis=1)
+
+        if bm25.max() > 0:
+            bm25 = bm25 / bm25.max()
+
+        rank_prior = 1.0 / np.arange(1, len(documents) + 1, dtype=np.float32)
+        return (1 - self.rank_weight) * bm25 + self.rank_weight * rank_prior
+
+
+class CrossEncoderReranker:
+    """
+    Reranker backed by a small local cross-encoder (sentence-transformers),
+    run on CPU. The model is loaded on first use.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+
+    def score(self, query: str, documents: List[Document]) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+
+            self._model = CrossEncoder(self.model_name, device="cpu")
+
+        if not documents:
+            return np.zeros(0, dtype=np.float32)
+        return np.asarray(self._model.predict([(query, document.page_content) for document in documents]))
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Over-fetches candidates from the base retriever, reranks them and keeps the
+    best top_k documents that fit in token_budget.
+
+    traffic_ratio is the share of requests that go through the reranker; the
+    rest keep the retriever's order, which allows A/B comparisons. Retrieval and
+    reranking times are logged per request.
+    """
+
+    base_retriever: BaseRetriever
+    reranker: Any
+    top_k: int = 4
+    token_budget: int = 2000
+    traffic_ratio: float = 1.0
+
+    def _select(self, query: str, candidates: List[Document], retrieval_time: float) -> List[Document]:
+        start = time.perf_counter()
+        reranked = random.random() < self.traffic_ratio
+
+        if reranked and candidates:
+            scores = self.reranker.score(query, candidates)
+            order = np.argsort(-scores, kind="stable")
+            ranked = [candidates[index] for index in order]
+        else:
+            ranked = candidates
+
+        selected, used_tokens = [], 0
+        for document in ranked:
+            tokens = estimate_tokens(document.page_content)
+            if selected and used_tokens + tokens > self.token_budget:
+                continue
+            selected.append(document)
+            used_tokens += tokens
+            if len(selected) == self.top_k:
+                break
+
+        rerank_time = time.perf_counter() - start
+        tracer.record("rerank", 1000 * rerank_time)
+
+        logger.info(
+            f"Reranking ({'on' if reranked else 'off'}): retrieval={1000 * retrieval_time:.1f}ms, "
+            f"rerank={1000 * rerank_time:.1f}ms, "
+            f"kept {len(selected)}/{len(candidates)} docs (~{used_tokens} tokens)"
+        )
+        return selected
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        start = time.perf_counter()
+        candidates = self.base_retriever.invoke(query, filter=filter, collections=collections)
+        return self._select(query, candidates, time.perf_counter() - start)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        start = time.perf_counter()
+        candidates = await self.base_retriever.ainvoke(query, filter=filter, collections=collections)
+        return self._select(query, candidates, time.perf_counter() - start)
+
+
+def create_reranker(model_name: Optional[str] = None):
+    """Returns the cross-encoder reranker when a model is configured, the lexical one otherwise."""
+    if model_name:
+        logger.info(f"Using cross-encoder reranker: {model_name}")
+        return CrossEncoderReranker(model_name)
+
+    logger.info("Using lexical reranker")
+    return LexicalReranker()
@@ -1,30 +1,179 @@
-from langchain_postgres.vectorstores import PGVector
+from langchain_postgres.vectorstores import DistanceStrategy, PGVector
+from src.services.retrieval.db_engine import get_async_engine, get_engine, get_pool_stats
 from src.services.retrieval.embedding_factory import EmbeddingFactory
+from src.services.retrieval.hybrid_retriever import HybridRetriever
+from src.services.retrieval.lexical_search import BM25Index, PostgresFullTextSearch
+from src.services.retrieval.memory_vector_store import create_memory_vector_store, load_corpus
+from src.services.retrieval.reranker import RerankingRetriever, create_reranker
+from src.services.retrieval.sharded_retriever import CollectionFanOutRetriever
+from src.services.retrieval.vector_retriever import PGVectorRetriever
 from src.utils.logger import logger
-from src.utils.environment import COLLECTION_NAME, COLLECTIONS_TABLE, CONNECTION_URL, EMBEDDINGS_TABLE
+from src.utils.startup import startup_timer
+from src.utils.environment import (
+    COLLECTIONS_TABLE,
+    EMBEDDINGS_TABLE,
+    HYBRID_LEXICAL_BACKEND,
+    HYBRID_LEXICAL_K,
+    HYBRID_RRF_K,
+    HYBRID_VECTOR_K,
+    PG_ASYNC_ENABLED,
+    RERANKER_CANDIDATES,
+    RERANKER_ENABLED,
+    RERANKER_MODEL,
+    RERANKER_TOKEN_BUDGET,
+    RERANKER_TRAFFIC_RATIO,
+    RETRIEVAL_COLLECTIONS,
+    RETRIEVAL_MODE,
+    RETRIEVER_K,
+    VECTOR_DISTANCE_METRIC,
+    VECTOR_EF_SEARCH,
+    VECTOR_IVFFLAT_PROBES,
+    VECTOR_STORE,
+    VECTOR_STORE_CORPUS_PATH,
+)
+
+# Must match the operator class of the collection's ANN index
+DISTANCE_STRATEGIES = {
+    "cosine": DistanceStrategy.COSINE,
+    "euclidean": DistanceStrategy.EUCLIDEAN,
+    "inner_product": DistanceStrategy.MAX_INNER_PRODUCT,
+}
+
+SEARCH_SETTINGS = {"ef_search": VECTOR_EF_SEARCH, "probes": VECTOR_IVFFLAT_PROBES}
+
+
+def _with_k(retriever, k: int):
+    """Copy of a retriever returning k documents."""
+    if isinstance(retriever, PGVectorRetriever):
+        return retriever.model_copy(update={"search_kwargs": {**retriever.search_kwargs, "k": k}})
+    if isinstance(retriever, CollectionFanOutRetriever):
+        return retriever.model_copy(update={"k": k, "shards": {name: _with_k(shard, k) for name, shard in retriever.shards.items()}})
+    return retriever.model_copy(update={"k": k})
+
 
 class RetrievalService:
     """
     Service to handle retrieval of relevant documents using PGVector.
+
+    With several RETRIEVAL_COLLECTIONS, each collection gets its own store and
+    queries fan out to them in parallel (or to the subset the intent router
+    picks).
     """
     
     def __init__(self):
         logger.info("Initializing RetrievalService")
         
-        self.embeddings = EmbeddingFactory.create_embeddings()
+        with startup_timer.phase("embeddings"):
+            self.embeddings = EmbeddingFactory.create_embeddings()
+
+        self.corpus_documents = None
+
+        if VECTOR_STORE == "pgvector":
+            with startup_timer.phase("pgvector"):
+                self.vector_dbs = {name: self._create_vector_db(get_engine(), name) for name in RETRIEVAL_COLLECTIONS}
+
+                # Async stores for chain.ainvoke; they finish their setup lazily on first use
+                self.async_vector_dbs = {
+                    name: self._create_vector_db(get_async_engine(), name) if PG_ASYNC_ENABLED else None
+                    for name in RETRIEVAL_COLLECTIONS
+                }
+
+                self.vector_db = self.vector_dbs[RETRIEVAL_COLLECTIONS[0]]
+                self.async_vector_db = self.async_vector_dbs[RETRIEVAL_COLLECTIONS[0]]
+
+        elif VECTOR_STORE == "memory":
+            with startup_timer.phase("vector_store"):
+                self.corpus_documents = load_corpus(VECTOR_STORE_CORPUS_PATH)
+                self.vector_db = create_memory_vector_store(self.embeddings, self.corpus_documents)
+                self.async_vector_db = None
+                self.vector_dbs = {}
+
+        else:
+            raise ValueError(f"Unsupported vector store: {VECTOR_STORE}")
+        
+        if len(self.vector_dbs) > 1:
+            logger.info(f"Fanning out retrieval over collections: {', '.join(self.vector_dbs)}")
+            self.retriever = CollectionFanOutRetriever(
+                shards={
+                    name: PGVectorRetriever(
+                        vector_db=vector_db,
+                        async_vector_db=self.async_vector_dbs[name],
+                        search_kwargs={"k": RETRIEVER_K},
+                        search_settings=SEARCH_SETTINGS,
+                        include_distance=True,
+                    )
+                    for name, vector_db in self.vector_dbs.items()
+                },
+                k=RETRIEVER_K,
+            )
+        else:
+            self.retriever = PGVectorRetriever(
+                vector_db=self.vector_db,
+                async_vector_db=self.async_vector_db,
+                search_kwargs={"k": RETRIEVER_K},
+                search_settings=SEARCH_SETTINGS,
+            )
 
-        self.vector_db = PGVector(
+        if RETRIEVAL_MODE == "hybrid":
+            self.retriever = self._create_hybrid_retriever()
+        elif RETRIEVAL_MODE != "vector":
+            raise ValueError(f"Unsupported retrieval mode: {RETRIEVAL_MODE}")
+
+        if RERANKER_ENABLED:
+            self.retriever = self._create_reranking_retriever(self.retriever)
+
+        logger.info("RetrievalService initialized successfully")
+
+    def _create_vector_db(self, engine, collection_name: str) -> PGVector:
+        return PGVector(
             embeddings=self.embeddings,
-            collection_name=COLLECTION_NAME,
+            collection_name=collection_name,
             collection_store_table=COLLECTIONS_TABLE,
             embedding_store_table=EMBEDDINGS_TABLE,
-            connection=CONNECTION_URL,
+            connection=engine,
+            distance_strategy=DISTANCE_STRATEGIES[VECTOR_DISTANCE_METRIC],
             use_jsonb=True,
         )
-        
-        self.retriever = self.vector_db.as_retriever()
-        logger.info("RetrievalService initialized successfully")
     
+    def _create_hybrid_retriever(self) -> HybridRetriever:
+        if self.corpus_documents is not None:
+            logger.info("Using hybrid retrieval with a BM25 index over the in-memory corpus")
+            lexical_search = BM25Index(self.corpus_documents)
+        elif HYBRID_LEXICAL_BACKEND == "postgres":
+            logger.info("Using hybrid retrieval with Postgres full-text search")
+            lexical_search = PostgresFullTextSearch(
+                collection_names=RETRIEVAL_COLLECTIONS,
+                async_engine=get_async_engine() if PG_ASYNC_ENABLED else None,
+            )
+        elif HYBRID_LEXICAL_BACKEND == "bm25":
+            logger.info("Using hybrid retrieval with an in-process BM25 index")
+            lexical_search = BM25Index.from_collections(RETRIEVAL_COLLECTIONS)
+        else:
+            raise ValueError(f"Unsupported lexical backend: {HYBRID_LEXICAL_BACKEND}")
+
+        # The lexical leg recovers exact-term matches, so the vector leg can fetch fewer candidates
+        return HybridRetriever(
+            vector_retriever=_with_k(self.retriever, HYBRID_VECTOR_K),
+            lexical_search=lexical_search,
+            k=RETRIEVER_K,
+            lexical_k=HYBRID_LEXICAL_K,
+            rrf_k=HYBRID_RRF_K,
+        )
+
+    def _create_reranking_retriever(self, retriever) -> RerankingRetriever:
+        # Over-fetch candidates so the reranker has something to choose from
+        return RerankingRetriever(
+            base_retriever=_with_k(retriever, RERANKER_CANDIDATES),
+            reranker=create_reranker(RERANKER_MODEL),
+            top_k=RETRIEVER_K,
+            token_budget=RERANKER_TOKEN_BUDGET,
+            traffic_ratio=RERANKER_TRAFFIC_RATIO,
+        )
+
     def get_retriever(self):
         """Return the retriever instance."""
         return self.retriever
+
+    def get_pool_stats(self) -> dict:
+        """Return the connection pool stats of the sync and async engines."""
+        return get_pool_stats()
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from sqlalchemy import event
+
+# pgvector query-time knobs and the Postgres settings they map to
+SEARCH_SETTINGS = {
+    "ef_search": "hnsw.ef_search",
+    "probes": "ivfflat.probes",
+}
+
+_APPLIED_SETTINGS_KEY = "vector_search_settings"
+
+_current_settings: ContextVar[Dict[str, int]] = ContextVar("vector_search_settings", default={})
+
+
+def current_search_settings() -> Dict[str, int]:
+    """Returns the search settings active in the current context."""
+    return _current_settings.get()
+
+
+@contextmanager
+def vector_search_settings(ef_search: Optional[int] = None, probes: Optional[int] = None):
+    """
+    Applies HNSW ef_search and IVFFlat probes to every vector query run inside the
+    block. Settings from an enclosing block are kept unless overridden.
+    """
+    settings = dict(_current_settings.get())
+    if ef_search:
+        settings["ef_search"] = int(ef_search)
+    if probes:
+        settings["probes"] = int(probes)
+
+    token = _current_settings.set(settings)
+    try:
+        yield settings
+    finally:
+        _current_settings.reset(token)
+
+
+def _apply_search_settings(dbapi_connection, connection_record, connection_proxy) -> None:
+    settings = _current_settings.get()
+    if connection_record.info.get(_APPLIED_SETTINGS_KEY) == settings:
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, setting in SEARCH_SETTINGS.items():
+            value = settings.get(name)
+            cursor.execute(f"SET {setting} = {int(value)}" if value else f"RESET {setting}")
+    finally:
+        cursor.close()
+
+    # SET is transactional, commit so a later rollback does not undo it
+    dbapi_connection.commit()
+    connection_record.info[_APPLIED_SETTINGS_KEY] = settings
+
+
+def install_search_settings_listener(engine) -> None:
+    """
+    Applies the context's search settings to each connection on checkout. A
+    connection is only touched when its settings differ from the requested ones.
+    """
+    event.listen(engine, "checkout", _apply_search_settings)
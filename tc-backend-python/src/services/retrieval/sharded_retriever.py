@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import contextvars
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+
+# Shared by every request of the container, so the shard searches run side by side without per-request pools
+_shards_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="collection-fan-out")
+
+
+class CollectionFanOutRetriever(BaseRetriever):
+    """
+    Searches several collections in parallel and merges their results.
+
+    Each shard is a retriever over one collection that reports
+    metadata["vector_distance"] (a PGVectorRetriever with include_distance),
+    so the merged list keeps the k closest documents overall. The collections
+    argument of invoke restricts the search to those shards, which is how a
+    billing question only scans the billing collection; unknown names are
+    ignored and an empty selection searches every shard. Each document is
+    tagged with the collection it came from as metadata["collection"].
+    """
+
+    shards: Dict[str, BaseRetriever]
+    k: int = 4
+
+    def _selected(self, collections: Optional[List[str]]) -> Dict[str, BaseRetriever]:
+        selected = {name: shard for name, shard in self.shards.items() if collections and name in collections}
+        return selected or self.shards
+
+    def _merge(self, results: Dict[str, List[Document]]) -> List[Document]:
+        merged = {}
+        for name, documents in results.items():
+            for document in documents:
+                key = document.id or document.page_content
+                if key not in merged:
+                    merged[key] = Document(
+                        id=document.id,
+                        page_content=document.page_content,
+                        metadata={**document.metadata, "collection": name},
+                    )
+
+        ranked = sorted(merged.values(), key=lambda document: document.metadata.get("vector_distance", float("inf")))
+        logger.info(f"Fan-out retrieval over {', '.join(results)}: kept {min(self.k, len(ranked))}/{len(ranked)} docs")
+        return ranked[:self.k]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        selected = self._selected(collections)
+        tracer.count("collections_searched", len(selected))
+
+        # Each search runs in a copy of the request context so its spans reach the request trace
+        futures = {
+            name: _shards_executor.submit(contextvars.copy_context().run, shard.invoke, query, filter=filter)
+            for name, shard in selected.items()
+        }
+        return self._merge({name: future.result() for name, future in futures.items()})
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        selected = self._selected(collections)
+        tracer.count("collections_searched", len(selected))
+
+        results = await asyncio.gather(*(shard.ainvoke(query, filter=filter) for shard in selected.values()))
+        return self._merge(dict(zip(selected, results)))
@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from langchain_core.vectorstores import InMemoryVectorStore
+from pydantic import Field
+from src.services.retrieval.metadata_filters import to_document_predicate, to_pgvector_filter
+from src.services.retrieval.search_settings import current_search_settings, vector_search_settings
+from src.utils.tracing import tracer
+
+class PGVectorRetriever(BaseRetriever):
+    """
+    Retriever over a PGVector collection with separate sync and async stores.
+
+    PGVector instances are either sync or async, so the sync path (invoke,
+    stream) and the async path (ainvoke) each use the store built on the
+    matching pooled engine. search_settings holds the default ef_search/probes;
+    a vector_search_settings block around the call overrides them per query.
+
+    Any vector store exposing embeddings and similarity_search_by_vector works,
+    which lets the in-memory store stand in for PGVector offline.
+
+    The query is embedded before the search so the embedding and vector
+    search stages are traced separately. A metadata filter passed to invoke
+    (retriever.invoke(query, filter={...})) restricts the search to matching
+    documents; PGVector applies it in SQL on the JSONB metadata.
+
+    With include_distance, each document carries the store's score as
+    metadata["vector_distance"] (a distance for PGVector), so results from
+    several collections can be merged. The retriever searches a single
+    collection and ignores the collections argument.
+    """
+
+    vector_db: Any
+    async_vector_db: Optional[Any] = None
+    search_kwargs: Dict[str, Any] = Field(default_factory=lambda: {"k": 4})
+    search_settings: Dict[str, int] = Field(default_factory=dict)
+    include_distance: bool = False
+
+    def _settings(self) -> Dict[str, int]:
+        return {**self.search_settings, **current_search_settings()}
+
+    def _search_kwargs(self, vector_db, metadata_filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not metadata_filter:
+            return self.search_kwargs
+        # The in-memory store takes a predicate over documents instead of a JSONB filter
+        if isinstance(vector_db, InMemoryVectorStore):
+            store_filter = to_document_predicate(metadata_filter)
+        else:
+            store_filter = to_pgvector_filter(metadata_filter)
+        return {**self.search_kwargs, "filter": store_filter}
+
+    @staticmethod
+    def _with_distances(results: List[Tuple[Document, float]]) -> List[Document]:
+        return [
+            Document(id=document.id, page_content=document.page_content, metadata={**document.metadata, "vector_distance": float(distance)})
+            for document, distance in results
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        embedding = self.vector_db.embeddings.embed_query(query)
+        search_kwargs = self._search_kwargs(self.vector_db, filter)
+
+        with vector_search_settings(**self._settings()), tracer.span("vector_search"):
+            if self.include_distance:
+                return self._with_distances(self.vector_db.similarity_search_with_score_by_vector(embedding, **search_kwargs))
+            return self.vector_db.similarity_search_by_vector(embedding, **search_kwargs)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, filter: Optional[Dict[str, Any]] = None,
+        collections: Optional[List[str]] = None,
+    ) -> List[Document]:
+        if self.async_vector_db is None:
+            return await run_in_executor(
+                None, self._get_relevant_documents, query, run_manager=run_manager.get_sync(), filter=filter
+            )
+
+        embedding = await self.async_vector_db.embeddings.aembed_query(query)
+        search_kwargs = self._search_kwargs(self.async_vector_db, filter)
+
+        with vector_search_settings(**self._settings()), tracer.span("vector_search"):
+            if self.include_distance:
+                return self._with_distances(
+                    await self.async_vector_db.asimilarity_search_with_score_by_vector(embedding, **search_kwargs)
+                )
+            return await self.async_vector_db.asimilarity_search_by_vector(embedding, **search_kwargs)
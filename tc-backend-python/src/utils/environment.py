@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -11,17 +12,170 @@ PG_USER =  os.getenv("PG_USER")
 PG_PASSWORD = os.getenv("PG_PASSWORD")
 PG_DATABASE = os.getenv("PG_DATABASE")
 
+# Connection pool
+PG_POOL_SIZE = int(os.getenv("PG_POOL_SIZE", "2"))
+PG_POOL_MAX_OVERFLOW = int(os.getenv("PG_POOL_MAX_OVERFLOW", "3"))
+PG_POOL_TIMEOUT_SECONDS = int(os.getenv("PG_POOL_TIMEOUT_SECONDS", "10"))
+PG_POOL_RECYCLE_SECONDS = int(os.getenv("PG_POOL_RECYCLE_SECONDS", "300"))
+PG_POOL_PRE_PING = os.getenv("PG_POOL_PRE_PING", "true").lower() == "true"
+PG_CONNECT_TIMEOUT_SECONDS = int(os.getenv("PG_CONNECT_TIMEOUT_SECONDS", "5"))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "5000"))
+PG_ASYNC_ENABLED = os.getenv("PG_ASYNC_ENABLED", "true").lower() == "true"
+
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 EMBEDDINGS_TABLE = os.getenv("EMBEDDINGS_TABLE")
 COLLECTIONS_TABLE = os.getenv("COLLECTIONS_TABLE")
 
+# Vector search
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))
+VECTOR_DISTANCE_METRIC = os.getenv("VECTOR_DISTANCE_METRIC", "cosine")
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "0"))
+VECTOR_IVFFLAT_PROBES = int(os.getenv("VECTOR_IVFFLAT_PROBES", "0"))
+
+# Hybrid (lexical + vector) retrieval
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+HYBRID_LEXICAL_BACKEND = os.getenv("HYBRID_LEXICAL_BACKEND", "postgres")
+HYBRID_VECTOR_K = int(os.getenv("HYBRID_VECTOR_K", "4"))
+HYBRID_LEXICAL_K = int(os.getenv("HYBRID_LEXICAL_K", "10"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_TEXT_SEARCH_CONFIG = os.getenv("HYBRID_TEXT_SEARCH_CONFIG", "spanish")
+
+# Reranking between retrieval and prompt assembly
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "false").lower() == "true"
+RERANKER_CANDIDATES = int(os.getenv("RERANKER_CANDIDATES", "20"))
+RERANKER_TOKEN_BUDGET = int(os.getenv("RERANKER_TOKEN_BUDGET", "2000"))
+RERANKER_TRAFFIC_RATIO = float(os.getenv("RERANKER_TRAFFIC_RATIO", "1.0"))
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "")
+
 SECRET_NAME = os.getenv("SECRET_NAME")
 LLM_PROVIDER = os.getenv("LLM_PROVIDER")
 LLM_MODEL_ID = os.getenv("LLM_MODEL_ID")
+# Ordered model tiers, cheapest first: [{"model_id", "threshold", "input_cost_per_1k", "output_cost_per_1k"}, ...]
+LLM_CASCADE = json.loads(os.getenv("LLM_CASCADE", "[]"))
+
+# Answer confidence from token logprobs: mean_prob, geometric_mean, min_span or tail_percentile
+CONFIDENCE_AGGREGATION = os.getenv("CONFIDENCE_AGGREGATION", "mean_prob")
+CONFIDENCE_SPAN_TOKENS = int(os.getenv("CONFIDENCE_SPAN_TOKENS", "8"))
+CONFIDENCE_TAIL_PERCENTILE = float(os.getenv("CONFIDENCE_TAIL_PERCENTILE", "10"))
+# Score of answers without logprobs (Bedrock)
+CONFIDENCE_FALLBACK = float(os.getenv("CONFIDENCE_FALLBACK", "1.0"))
 PROMPT_TEMPLATE = os.getenv("PROMPT_TEMPLATE")
 EMBEDDINGS_PROVIDER = os.getenv("EMBEDDINGS_PROVIDER")
 EMBEDDINGS_MODEL_ID = os.getenv("EMBEDDINGS_MODEL_ID")
 
+# Question quality gate (trimmed spaCy pipeline with memoized verdicts)
+SPACY_MODEL = os.getenv("SPACY_MODEL", "es_core_news_sm")
+SPACY_EXCLUDED_COMPONENTS = [name.strip() for name in os.getenv("SPACY_EXCLUDED_COMPONENTS", "ner,lemmatizer").split(",") if name.strip()]
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "4096"))
+QUESTION_PREFILTER_ENABLED = os.getenv("QUESTION_PREFILTER_ENABLED", "false").lower() == "true"
+
+# Content moderation provider ("openai", or "fake" for offline runs)
+MODERATION_PROVIDER = os.getenv("MODERATION_PROVIDER", "openai")
+
+# Moderation verdict cache, local pre-screen and resilience
+MODERATION_CACHE_TTL_SECONDS = int(os.getenv("MODERATION_CACHE_TTL_SECONDS", "3600"))
+MODERATION_CACHE_MAX_ENTRIES = int(os.getenv("MODERATION_CACHE_MAX_ENTRIES", "4096"))
+MODERATION_BLOCKED_LEXICON_PATH = os.getenv("MODERATION_BLOCKED_LEXICON_PATH", "")
+MODERATION_WATCH_LEXICON_PATH = os.getenv("MODERATION_WATCH_LEXICON_PATH", "")
+MODERATION_PRESCREEN_SKIP_CLEAN = os.getenv("MODERATION_PRESCREEN_SKIP_CLEAN", "false").lower() == "true"
+MODERATION_TIMEOUT_SECONDS = float(os.getenv("MODERATION_TIMEOUT_SECONDS", "3"))
+MODERATION_MAX_RETRIES = int(os.getenv("MODERATION_MAX_RETRIES", "1"))
+MODERATION_BREAKER_FAILURE_THRESHOLD = int(os.getenv("MODERATION_BREAKER_FAILURE_THRESHOLD", "5"))
+MODERATION_BREAKER_RESET_SECONDS = float(os.getenv("MODERATION_BREAKER_RESET_SECONDS", "30"))
+MODERATION_FAIL_MODE = os.getenv("MODERATION_FAIL_MODE", "open")
+
+# Vector store ("pgvector", or "memory" loaded from a JSONL corpus for offline runs)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pgvector")
+VECTOR_STORE_CORPUS_PATH = os.getenv("VECTOR_STORE_CORPUS_PATH", "")
+
+# Simulated latency and shape of the fake providers
+FAKE_LLM_TTFT_MS = float(os.getenv("FAKE_LLM_TTFT_MS", "0"))
+FAKE_LLM_TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "0"))
+FAKE_LLM_ANSWER_TOKENS = int(os.getenv("FAKE_LLM_ANSWER_TOKENS", "40"))
+FAKE_EMBEDDINGS_LATENCY_MS = float(os.getenv("FAKE_EMBEDDINGS_LATENCY_MS", "0"))
+FAKE_EMBEDDINGS_DIMENSIONS = int(os.getenv("FAKE_EMBEDDINGS_DIMENSIONS", "256"))
+FAKE_MODERATION_LATENCY_MS = float(os.getenv("FAKE_MODERATION_LATENCY_MS", "0"))
+
+# API Gateway WebSocket management endpoint (defaults to the one in the request context)
+WEBSOCKET_ENDPOINT_URL = os.getenv("WEBSOCKET_ENDPOINT_URL")
+
+# Batch chat endpoint
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Bulk RAGAS evaluation
+EVALUATION_BATCH_SIZE = int(os.getenv("EVALUATION_BATCH_SIZE", "20"))
+EVALUATION_MAX_CONCURRENCY = int(os.getenv("EVALUATION_MAX_CONCURRENCY", "4"))
+EVALUATION_MAX_WORKERS = int(os.getenv("EVALUATION_MAX_WORKERS", "8"))
+EVALUATION_CACHE_PATH = os.getenv("EVALUATION_CACHE_PATH", "/tmp/ragas_scores.sqlite3")
+
+# Request tracing and stage latency metrics
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "ChatbotRAG")
+METRICS_HISTOGRAM_LOG_EVERY = int(os.getenv("METRICS_HISTOGRAM_LOG_EVERY", "100"))
+
+# Query embedding cache and batching
+EMBEDDINGS_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDINGS_CACHE_MAX_ENTRIES", "2048"))
+EMBEDDINGS_CACHE_DISK_PATH = os.getenv("EMBEDDINGS_CACHE_DISK_PATH", "/tmp/embeddings_cache.sqlite3")
+EMBEDDINGS_CACHE_DISK_MAX_ENTRIES = int(os.getenv("EMBEDDINGS_CACHE_DISK_MAX_ENTRIES", "10000"))
+EMBEDDINGS_BATCH_SIZE = int(os.getenv("EMBEDDINGS_BATCH_SIZE", "96"))
+EMBEDDINGS_BATCH_WINDOW_MS = int(os.getenv("EMBEDDINGS_BATCH_WINDOW_MS", "10"))
+
+# Semantic response cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.92"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TABLE = os.getenv("RESPONSE_CACHE_TABLE", "response_cache")
+
+# Exact prompt-hash cache and single-flight coalescing of LLM calls
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+GENERATION_CACHE_TTL_SECONDS = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", "600"))
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "500"))
+
+# Conversation memory per session
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "true").lower() == "true"
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "memory")
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "10"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "800"))
+MEMORY_MAX_MESSAGE_TOKENS = int(os.getenv("MEMORY_MAX_MESSAGE_TOKENS", "300"))
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "500"))
+MEMORY_TTL_SECONDS = int(os.getenv("MEMORY_TTL_SECONDS", "14400"))
+MEMORY_SUMMARY_ENABLED = os.getenv("MEMORY_SUMMARY_ENABLED", "false").lower() == "true"
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "200"))
+MEMORY_TABLE = os.getenv("MEMORY_TABLE", "chat_memory")
+MEMORY_SQLITE_PATH = os.getenv("MEMORY_SQLITE_PATH", "/tmp/chat_memory.sqlite3")
+# Seconds a request waits for its turn to be stored with the postgres backend
+MEMORY_WRITE_TIMEOUT_SECONDS = float(os.getenv("MEMORY_WRITE_TIMEOUT_SECONDS", "2"))
+
+# Follow-up query rewriting and retrieval reuse across turns
+QUERY_REWRITE_MODE = os.getenv("QUERY_REWRITE_MODE", "heuristic")
+QUERY_REWRITE_MODEL_ID = os.getenv("QUERY_REWRITE_MODEL_ID", "")
+QUERY_REWRITE_MAX_WORDS = int(os.getenv("QUERY_REWRITE_MAX_WORDS", "2"))
+QUERY_REWRITE_MAX_TOKENS = int(os.getenv("QUERY_REWRITE_MAX_TOKENS", "80"))
+RETRIEVAL_REUSE_ENABLED = os.getenv("RETRIEVAL_REUSE_ENABLED", "true").lower() == "true"
+RETRIEVAL_REUSE_SIMILARITY = float(os.getenv("RETRIEVAL_REUSE_SIMILARITY", "0.9"))
+RETRIEVAL_REUSE_TTL_SECONDS = int(os.getenv("RETRIEVAL_REUSE_TTL_SECONDS", "1800"))
+
+# Intent routing: prompt template and retrieval filter chosen per request
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+INTENT_KEYWORD_WEIGHT = float(os.getenv("INTENT_KEYWORD_WEIGHT", "0.15"))
+INTENT_RETRIEVAL_FILTERS = json.loads(os.getenv("INTENT_RETRIEVAL_FILTERS", "{}"))
+
+# Collections searched by the retriever (fanned out in parallel when there are several) and per-intent routing
+RETRIEVAL_COLLECTIONS = [name.strip() for name in os.getenv("RETRIEVAL_COLLECTIONS", "").split(",") if name.strip()] or [COLLECTION_NAME]
+INTENT_COLLECTIONS = json.loads(os.getenv("INTENT_COLLECTIONS", "{}"))
+
+# Document ingestion (python -m src.services.retrieval.ingestion)
+INGESTION_CHUNK_TOKENS = int(os.getenv("INGESTION_CHUNK_TOKENS", "400"))
+INGESTION_CHUNK_OVERLAP_TOKENS = int(os.getenv("INGESTION_CHUNK_OVERLAP_TOKENS", "40"))
+INGESTION_EMBED_BATCH_SIZE = int(os.getenv("INGESTION_EMBED_BATCH_SIZE", "96"))
+INGESTION_MAX_CONCURRENCY = int(os.getenv("INGESTION_MAX_CONCURRENCY", "4"))
+
+# Container warm-up (keep-warm pings, provisioned concurrency and SnapStart init)
+WARMUP_ON_INIT = os.getenv("WARMUP_ON_INIT", "false").lower() == "true"
+WARMUP_LLM_PING = os.getenv("WARMUP_LLM_PING", "true").lower() == "true"
+
 print("PG_PORT", PG_PORT)
 CONNECTION_URL = f"postgresql://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DATABASE}"
 print("CONNECTION_URL", CONNECTION_URL)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import asyncio
+import time
+from typing import List, Tuple
+
+# Words flagged by the fake provider
+FAKE_FLAGGED_WORDS = {"matar", "violencia", "odio"}
+
+
+class FakeModeration:
+    """
+    Deterministic offline stand-in for the Moderation API, for benchmarks and
+    local runs. A message is flagged when it contains one of FAKE_FLAGGED_WORDS.
+    latency_ms is slept once per call, like a network round trip.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+
+    @staticmethod
+    def _verdict(message: str) -> Tuple[bool, str]:
+        flagged_words = sorted(word for word in FAKE_FLAGGED_WORDS if word in message.lower())
+        if flagged_words:
+            return True, f"Message contains harmful content: {', '.join(flagged_words)}"
+        return False, ""
+
+    def moderate(self, messages: List[str]) -> List[Tuple[bool, str]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._verdict(message) for message in messages]
+
+    async def amoderate(self, messages: List[str]) -> List[Tuple[bool, str]]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return [self._verdict(message) for message in messages]
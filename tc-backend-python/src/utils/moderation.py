@@ -0,0 +1,382 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from src.utils.logger import logger
+from src.utils.text_normalization import normalize_whitespace
+from src.utils.tracing import tracer
+from src.utils.environment import (
+    FAKE_MODERATION_LATENCY_MS,
+    MODERATION_BLOCKED_LEXICON_PATH,
+    MODERATION_BREAKER_FAILURE_THRESHOLD,
+    MODERATION_BREAKER_RESET_SECONDS,
+    MODERATION_CACHE_MAX_ENTRIES,
+    MODERATION_CACHE_TTL_SECONDS,
+    MODERATION_FAIL_MODE,
+    MODERATION_MAX_RETRIES,
+    MODERATION_PRESCREEN_SKIP_CLEAN,
+    MODERATION_PROVIDER,
+    MODERATION_TIMEOUT_SECONDS,
+    MODERATION_WATCH_LEXICON_PATH,
+)
+
+# Rejected outright by validate_user_message, before any moderation call
+BLOCKED_WORDS = {"hack", "attack", "drop table", "<script>"}
+
+# Terms that make a message worth sending to the Moderation API. With
+# MODERATION_PRESCREEN_SKIP_CLEAN, messages matching none of them skip it.
+WATCH_WORDS = {
+    "matar", "muerte", "morir", "suicid", "arma", "pistola", "bomba", "explosiv", "droga",
+    "violen", "golpe", "amenaz", "odio", "racis", "sexo", "sexual", "desnud", "porno",
+    "acos", "secuestr", "tortur", "terror", "herir", "sangre", "insult", "idiota", "estúpid",
+}
+
+MODERATION_BATCH_SIZE = 32
+
+
+class AhoCorasickMatcher:
+    """
+    Multi-pattern substring matcher. The automaton is compiled once, so scanning
+    a message costs one pass over its characters however large the lexicon is.
+    Patterns and text are matched lowercased, like the original substring scan.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[Set[str]] = [set()]
+
+        for pattern in {pattern.lower() for pattern in patterns if pattern}:
+            self._add(pattern)
+        self._build_failure_links()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(set())
+            state = next_state
+        self._outputs[state].add(pattern)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] |= self._outputs[self._fail[next_state]]
+
+    def find_all(self, text: str) -> Set[str]:
+        """Returns every pattern contained in the text."""
+        matches: Set[str] = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._outputs[state]:
+                matches |= self._outputs[state]
+        return matches
+
+    def search(self, text: str) -> bool:
+        """True if the text contains any pattern."""
+        state = 0
+        for char in text.lower():
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._outputs[state]:
+                return True
+        return False
+
+
+def load_lexicon(path: str) -> Set[str]:
+    """Reads one term per line; blank lines and lines starting with # are ignored."""
+    if not path:
+        return set()
+
+    with open(path, encoding="utf-8") as file:
+        terms = {line.strip() for line in file if line.strip() and not line.startswith("#")}
+
+    logger.info(f"Loaded {len(terms)} moderation terms from {path}")
+    return terms
+
+
+class ModerationCache:
+    """LRU cache of moderation verdicts keyed by the hash of the normalized message."""
+
+    def __init__(self, ttl_seconds: int = MODERATION_CACHE_TTL_SECONDS, max_entries: int = MODERATION_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[bool, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(message: str) -> str:
+        return hashlib.sha256(normalize_whitespace(message).lower().encode("utf-8")).hexdigest()
+
+    def get(self, message: str) -> Optional[Tuple[bool, str]]:
+        key = self.key(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, message: str, verdict: Tuple[bool, str]) -> None:
+        with self._lock:
+            self._entries[self.key(message)] = (time.monotonic() + self.ttl_seconds, verdict)
+            self._entries.move_to_end(self.key(message))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class CircuitBreaker:
+    """
+    Stops calling the Moderation API after failure_threshold consecutive
+    failures. After reset_seconds one trial call is let through; its success
+    closes the circuit again.
+    """
+
+    def __init__(self, failure_threshold: int = MODERATION_BREAKER_FAILURE_THRESHOLD, reset_seconds: float = MODERATION_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial_in_flight and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Frees the trial slot of a call that ended without a result (e.g. cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Moderation circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+
+class ModerationService:
+    """
+    Content moderation with a local pre-screen, a verdict cache and a circuit
+    breaker in front of the Moderation API.
+
+    Cached verdicts are served without a network hop. When skip_clean is on,
+    messages that match no watch term are considered clean without calling the
+    API. Timeouts and retries are handled by the OpenAI client; while the
+    circuit is open or the API fails, fail_mode decides the verdict: "open"
+    lets the message through (the historical behavior), "closed" rejects it.
+    """
+
+    def __init__(
+        self,
+        provider: str = MODERATION_PROVIDER,
+        watch_terms: Optional[Iterable[str]] = None,
+        skip_clean: bool = MODERATION_PRESCREEN_SKIP_CLEAN,
+        fail_mode: str = MODERATION_FAIL_MODE,
+        cache: Optional[ModerationCache] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        if fail_mode not in ("open", "closed"):
+            raise ValueError(f"Unsupported moderation fail mode: {fail_mode}")
+
+        self.provider = provider
+        self.watch_matcher = AhoCorasickMatcher(WATCH_WORDS | load_lexicon(MODERATION_WATCH_LEXICON_PATH) if watch_terms is None else watch_terms)
+        self.skip_clean = skip_clean
+        self.fail_mode = fail_mode
+        self.cache = cache or ModerationCache()
+        self.breaker = breaker or CircuitBreaker()
+
+        self._client = None
+        self._async_client = None
+        self._fake = None
+        self._counters = {"cache_hits": 0, "prescreened": 0, "remote_calls": 0, "failures": 0, "short_circuited": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def _get_client(self):
+        if self._client is None:
+            import openai
+
+            self._client = openai.OpenAI(timeout=MODERATION_TIMEOUT_SECONDS, max_retries=MODERATION_MAX_RETRIES)
+        return self._client
+
+    def _get_async_client(self):
+        # Bound to the handler's event loop on first use
+        if self._async_client is None:
+            import openai
+
+            self._async_client = openai.AsyncOpenAI(timeout=MODERATION_TIMEOUT_SECONDS, max_retries=MODERATION_MAX_RETRIES)
+        return self._async_client
+
+    def _get_fake(self):
+        if self._fake is None:
+            from src.utils.fake_moderation import FakeModeration
+
+            logger.info("Using fake moderation")
+            self._fake = FakeModeration(latency_ms=FAKE_MODERATION_LATENCY_MS)
+        return self._fake
+
+    def _local_verdict(self, message: str) -> Optional[Tuple[bool, str]]:
+        """Returns a verdict that needs no API call, or None."""
+        cached = self.cache.get(message)
+        if cached is not None:
+            self._count("cache_hits")
+            return cached
+
+        if self.skip_clean and not self.watch_matcher.search(message):
+            self._count("prescreened")
+            return False, ""
+
+        return None
+
+    def _fallback(self, error: Optional[Exception] = None) -> Tuple[bool, str]:
+        reason = f"Error checking content moderation: {error}" if error else "Content moderation unavailable (circuit open)"
+        return self.fail_mode == "closed", reason
+
+    def _record_result(self, messages: List[str], verdicts: List[Tuple[bool, str]]) -> None:
+        self.breaker.record_success()
+        for message, verdict in zip(messages, verdicts):
+            self.cache.put(message, verdict)
+
+    def _record_error(self, error: Exception) -> None:
+        logger.error(f"Error checking content moderation: {error}")
+        self._count("failures")
+        self.breaker.record_failure()
+
+    def _call(self, messages: List[str]) -> List[Tuple[bool, str]]:
+        self._count("remote_calls")
+        with tracer.span("moderation"):
+            if self.provider == "fake":
+                return self._get_fake().moderate(messages)
+
+            response = self._get_client().moderations.create(input=messages)
+            return [_parse_moderation_result(result) for result in response.results]
+
+    async def _acall(self, messages: List[str]) -> List[Tuple[bool, str]]:
+        self._count("remote_calls")
+        with tracer.span("moderation"):
+            if self.provider == "fake":
+                return await self._get_fake().amoderate(messages)
+
+            response = await self._get_async_client().moderations.create(input=messages)
+            return [_parse_moderation_result(result) for result in response.results]
+
+    def check(self, message: str) -> Tuple[bool, str]:
+        """Returns (harmful, reason) for a message."""
+        return self.check_many([message])[0]
+
+    async def acheck(self, message: str) -> Tuple[bool, str]:
+        """Async version of check. Cancelling the awaiting task aborts the HTTP request."""
+        verdict = self._local_verdict(message)
+        if verdict is not None:
+            return verdict
+
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            return self._fallback()
+
+        try:
+            verdicts = await self._acall([message])
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            self._record_error(e)
+            return self._fallback(e)
+
+        self._record_result([message], verdicts)
+        return verdicts[0]
+
+    def check_many(self, messages: List[str]) -> List[Tuple[bool, str]]:
+        """Returns one verdict per message; API calls carry up to MODERATION_BATCH_SIZE messages each."""
+        results: List[Optional[Tuple[bool, str]]] = [self._local_verdict(message) for message in messages]
+        pending = [index for index, verdict in enumerate(results) if verdict is None]
+
+        for start in range(0, len(pending), MODERATION_BATCH_SIZE):
+            chunk = pending[start:start + MODERATION_BATCH_SIZE]
+            chunk_messages = [messages[index] for index in chunk]
+
+            if not self.breaker.allow():
+                self._count("short_circuited", len(chunk))
+                verdicts = [self._fallback()] * len(chunk)
+            else:
+                try:
+                    verdicts = self._call(chunk_messages)
+                    self._record_result(chunk_messages, verdicts)
+                except Exception as e:
+                    self._record_error(e)
+                    verdicts = [self._fallback(e)] * len(chunk)
+
+            for index, verdict in zip(chunk, verdicts):
+                results[index] = verdict
+
+        return results
+
+    def stats(self) -> Dict[str, object]:
+        """Returns the moderation counters and the circuit state."""
+        with self._lock:
+            return {**self._counters, "circuit_open": self.breaker.is_open}
+
+
+def _parse_moderation_result(moderation_result) -> Tuple[bool, str]:
+    """Turns a moderation result into the (harmful, reason) tuple."""
+    flagged = moderation_result.flagged
+    categories = moderation_result.categories.model_dump()
+
+    logger.info(f"Content moderation result: flagged={flagged}, categories={categories}")
+
+    if flagged:
+        # Extract flagged categories
+        flagged_categories = [category for category, is_flagged in categories.items() if is_flagged]
+        reason = f"Message contains harmful content: {', '.join(flagged_categories)}"
+        return True, reason
+
+    return False, ""
+
+
+blocked_terms_matcher = AhoCorasickMatcher(BLOCKED_WORDS | load_lexicon(MODERATION_BLOCKED_LEXICON_PATH))
+moderation_service = ModerationService()
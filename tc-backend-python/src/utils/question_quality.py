@@ -0,0 +1,157 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from src.utils.logger import logger
+from src.utils.startup import startup_timer
+from src.utils.text_normalization import normalize_whitespace
+from src.utils.tracing import tracer
+from src.utils.environment import (
+    QUESTION_CACHE_MAX_ENTRIES,
+    QUESTION_PREFILTER_ENABLED,
+    SPACY_EXCLUDED_COMPONENTS,
+    SPACY_MODEL,
+)
+
+# Interrogative openers that, with enough words after them, make the parse unnecessary
+INTERROGATIVE_OPENER_PATTERN = re.compile(
+    r"^¿?\s*(c[oó]mo|qu[eé]|cu[aá]l(es)?|cu[aá]nt[oa]s?|cu[aá]ndo|d[oó]nde|por qu[eé]|qui[eé]n(es)?|para qu[eé])\b",
+    re.IGNORECASE,
+)
+PREFILTER_MIN_WORDS = 5
+
+
+def _is_poorly_formed_doc(doc) -> bool:
+    """
+    A question is poorly formed if it lacks a verb, an explicit or implicit
+    subject, or a noun phrase.
+    """
+    has_explicit_subject = any(token.dep_ in {"nsubj", "nsubj:pass"} for token in doc)
+    has_verb = any(token.pos_ in {"VERB", "AUX"} for token in doc)
+    has_noun_phrase = any(chunk.root.pos_ == "NOUN" for chunk in doc.noun_chunks)
+
+    has_pronoun_or_adverb = any(token.pos_ in {"PRON", "ADV"} for token in doc) or \
+                            any(token.dep_ in {"mark", "advmod"} for token in doc)
+
+    has_object = any(token.dep_ in {"dobj", "iobj"} for token in doc)
+    has_prepositional_complement = any(token.dep_ == "prep" for token in doc)
+
+    # Unify implicity subjetc condition
+    has_implicit_subject = has_pronoun_or_adverb or has_object or has_prepositional_complement
+
+    # Final evaluation
+    return not (has_verb and (has_explicit_subject or has_implicit_subject) and has_noun_phrase)
+
+
+class QuestionQualityGate:
+    """
+    Decides whether questions are poorly formed with a trimmed spaCy pipeline.
+
+    Only the components behind POS tags, dependencies and noun chunks are
+    loaded (NER and the lemmatizer are excluded by default). Verdicts are
+    memoized per normalized question, cache misses are parsed together with
+    nlp.pipe, and an optional rule prefilter accepts long questions that open
+    with an interrogative word without parsing them. The parse is traced as
+    "spacy_parse", apart from the whole check ("question_check").
+    """
+
+    def __init__(
+        self,
+        model_name: str = SPACY_MODEL,
+        excluded_components: Optional[List[str]] = None,
+        max_entries: int = QUESTION_CACHE_MAX_ENTRIES,
+        prefilter_enabled: bool = QUESTION_PREFILTER_ENABLED,
+    ):
+        self.model_name = model_name
+        self.excluded_components = SPACY_EXCLUDED_COMPONENTS if excluded_components is None else excluded_components
+        self.max_entries = max_entries
+        self.prefilter_enabled = prefilter_enabled
+
+        self._nlp = None
+        self._nlp_lock = threading.Lock()
+        self._verdicts: "OrderedDict[str, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "prefiltered": 0}
+
+    @property
+    def nlp(self):
+        """The spaCy pipeline, loaded on first use."""
+        if self._nlp is None:
+            with self._nlp_lock:
+                if self._nlp is None:
+                    with startup_timer.phase("spacy"):
+                        import spacy
+
+                        self._nlp = spacy.load(self.model_name, exclude=self.excluded_components)
+                    logger.info(f"Loaded spaCy pipeline {self.model_name} with components {self._nlp.pipe_names}")
+        return self._nlp
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return normalize_whitespace(question).lower()
+
+    def prefilter(self, question: str) -> bool:
+        """True when the question is obviously well formed and the parse can be skipped."""
+        return bool(INTERROGATIVE_OPENER_PATTERN.match(question.strip())) and len(question.split()) >= PREFILTER_MIN_WORDS
+
+    def _get(self, key: str) -> Optional[bool]:
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                self._counters["hits"] += 1
+            return verdict
+
+    def _put(self, key: str, verdict: bool) -> None:
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > self.max_entries:
+                self._verdicts.popitem(last=False)
+
+    def are_poorly_formed(self, questions: List[str], batch_size: int = 64) -> List[bool]:
+        """Returns one verdict per question, parsing only the ones not cached or prefiltered."""
+        with tracer.span("question_check"):
+            verdicts: Dict[str, bool] = {}
+            to_parse: Dict[str, str] = {}
+
+            for question in questions:
+                key = self._key(question)
+                if key in verdicts or key in to_parse:
+                    continue
+
+                cached = self._get(key)
+                if cached is not None:
+                    verdicts[key] = cached
+                elif self.prefilter_enabled and self.prefilter(question):
+                    with self._lock:
+                        self._counters["prefiltered"] += 1
+                    verdicts[key] = False
+                    self._put(key, False)
+                else:
+                    to_parse[key] = normalize_whitespace(question)
+
+            if to_parse:
+                with self._lock:
+                    self._counters["misses"] += len(to_parse)
+
+                nlp = self.nlp
+                with tracer.span("spacy_parse"):
+                    docs = list(nlp.pipe(to_parse.values(), batch_size=batch_size))
+
+                for key, doc in zip(to_parse, docs):
+                    verdicts[key] = _is_poorly_formed_doc(doc)
+                    self._put(key, verdicts[key])
+
+            return [verdicts[self._key(question)] for question in questions]
+
+    def is_poorly_formed(self, question: str) -> bool:
+        return self.are_poorly_formed([question])[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Returns cache hit/miss and prefilter counters and the cache size."""
+        with self._lock:
+            return {**self._counters, "size": len(self._verdicts)}
+
+
+question_gate = QuestionQualityGate()
@@ -1,15 +1,39 @@
 import json
-import boto3
 import os
-from botocore.exceptions import ClientError
+import threading
 from src.utils.logger import logger
 from src.utils.environment import AMAZON_REGION, SECRET_NAME
+from src.utils.startup import startup_timer
+
+_secrets_loaded = False
+_secrets_lock = threading.Lock()
 
 
 def load_secrets():
     """
     Load secrets from AWS Secrets Manager only once and store them in environment variables.
     """
+    global _secrets_loaded
+
+    with _secrets_lock:
+        if _secrets_loaded:
+            return
+
+        with startup_timer.phase("secrets"):
+            _fetch_secrets()
+
+        _secrets_loaded = True
+
+
+def _fetch_secrets():
+    if not SECRET_NAME:
+        # Offline runs (benchmarks, local fakes) take their settings from the environment
+        logger.info("SECRET_NAME is not set. Skipping AWS Secrets Manager.")
+        return
+
+    # boto3 is imported here so it does not weigh on the handler import
+    import boto3
+    from botocore.exceptions import ClientError
 
     client = boto3.client("secretsmanager", region_name=AMAZON_REGION)
 
@@ -27,4 +51,3 @@ def load_secrets():
 
     except ClientError as e:
         logger.error(f"Failed to retrieve secrets: {e}")
-
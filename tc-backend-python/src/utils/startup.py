@@ -0,0 +1,46 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from src.utils.logger import logger
+
+class StartupTimer:
+    """
+    Records how long each cold-start phase takes (imports, secrets, spaCy,
+    embeddings, PGVector, LLM) and logs a single report once initialization ends.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the enclosed block as a startup phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, duration: float) -> None:
+        """Adds a phase duration in seconds. Repeated phases are accumulated."""
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def report(self) -> Dict[str, float]:
+        """Logs the phase timings the first time it is called and returns them."""
+        with self._lock:
+            phases = {name: round(duration, 4) for name, duration in self.phases.items()}
+            phases["total"] = round(time.perf_counter() - self.started_at, 4)
+            first_report = not self._reported
+            self._reported = True
+
+        if first_report:
+            logger.info(f"Startup phases (seconds): {phases}")
+
+        return phases
+
+startup_timer = StartupTimer()
@@ -0,0 +1,7 @@
+import re
+
+EXTRA_SPACES_PATTERN = re.compile(r'\s+')
+
+def normalize_whitespace(text: str) -> str:
+    """Strips the text and collapses runs of whitespace into a single space."""
+    return EXTRA_SPACES_PATTERN.sub(' ', text.strip())
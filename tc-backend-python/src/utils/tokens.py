@@ -0,0 +1,40 @@
+from functools import lru_cache
+from src.utils.environment import LLM_MODEL_ID, LLM_PROVIDER
+
+# Average characters per token for Spanish text with the OpenAI / Bedrock tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting when the exact tokenizer is not needed."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to roughly max_tokens using the character estimate."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Returns the tiktoken encoding of the configured OpenAI model, or None if unavailable."""
+    if LLM_PROVIDER != "openai":
+        return None
+
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(LLM_MODEL_ID)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with the model's tokenizer when tiktoken is installed and the
+    provider is OpenAI, and falls back to the estimate otherwise.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
@@ -0,0 +1,215 @@
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+from src.utils.logger import logger
+from src.utils.environment import METRICS_HISTOGRAM_LOG_EVERY, METRICS_NAMESPACE, TRACING_ENABLED
+
+# Histogram bucket upper bounds in milliseconds, roughly 25% apart from 1 ms to 2 minutes
+BUCKET_BOUNDS_MS = [round(1.25 ** exponent, 2) for exponent in range(53)]
+
+
+def _setup_metrics_logger() -> logging.Logger:
+    # EMF lines must be bare JSON, so they bypass the formatter of the main logger
+    metrics_logger = logging.getLogger("chatbot.metrics")
+    metrics_logger.setLevel(logging.INFO)
+
+    if not metrics_logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        metrics_logger.addHandler(handler)
+
+    metrics_logger.propagate = False
+    return metrics_logger
+
+
+metrics_logger = _setup_metrics_logger()
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram. Percentiles are estimated from the bucket
+    bounds, so memory stays constant however many samples are recorded.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.total += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.total:
+            return 0.0
+
+        threshold = fraction * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                # A bucket bound can exceed every recorded sample
+                return min(BUCKET_BOUNDS_MS[index], round(self.max_ms, 2)) if index < len(BUCKET_BOUNDS_MS) else round(self.max_ms, 2)
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class RequestTrace:
+    """Spans and counters recorded while serving one request."""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, duration_ms: float, offset_ms: float) -> None:
+        with self._lock:
+            self.spans.append({"name": name, "duration_ms": round(duration_ms, 2), "start_ms": round(offset_ms, 2)})
+
+    def add_counter(self, name: str, value: float) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Duration per stage; a stage that ran several times is summed."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["name"]] = round(totals.get(span["name"], 0.0) + span["duration_ms"], 2)
+        return totals
+
+
+class Tracer:
+    """
+    Per-request tracing of the chatbot stages.
+
+    Spans are recorded into the trace of the current request, carried in a
+    ContextVar so asyncio tasks, asyncio.to_thread and LangChain executors see
+    it, and into process-wide histograms that outlive the request. When the
+    request ends, its stage durations and counters are logged as a CloudWatch
+    Embedded Metric Format line.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE, enabled: bool = TRACING_ENABLED, log_every: int = METRICS_HISTOGRAM_LOG_EVERY):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.log_every = log_every
+        self._current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._listeners: List[Callable[[RequestTrace], None]] = []
+
+    def current(self) -> Optional[RequestTrace]:
+        return self._current.get()
+
+    @contextmanager
+    def request(self, operation: str):
+        """Starts the trace of a request and emits its metrics when the block ends."""
+        trace = RequestTrace(operation)
+        token = self._current.set(trace)
+        try:
+            yield trace
+        finally:
+            self._current.reset(token)
+            trace.duration_ms = (time.perf_counter() - trace.started_at) * 1000
+            self._add_to_histogram(f"{operation}.total", trace.duration_ms)
+            if self.enabled:
+                self._emit(trace)
+            for listener in self._listeners:
+                listener(trace)
+
+    def add_listener(self, listener: Callable[[RequestTrace], None]) -> None:
+        """Registers a callback that receives every finished request trace (e.g. a benchmark)."""
+        self._listeners.append(listener)
+
+    @contextmanager
+    def span(self, name: str):
+        """Times the enclosed block as a stage of the current request."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, start)
+
+    def record(self, name: str, duration_ms: float, started_at: Optional[float] = None) -> None:
+        """
+        Records a stage duration measured elsewhere, e.g. the time to first token.
+        started_at is a perf_counter value; it defaults to duration_ms before now.
+        """
+        self._add_to_histogram(name, duration_ms)
+
+        trace = self.current()
+        if trace is not None:
+            if started_at is None:
+                started_at = time.perf_counter() - duration_ms / 1000
+            trace.add_span(name, duration_ms, (started_at - trace.started_at) * 1000)
+
+    def _add_to_histogram(self, name: str, duration_ms: float) -> None:
+        with self._lock:
+            self._histograms.setdefault(name, LatencyHistogram()).add(duration_ms)
+
+    def count(self, name: str, value: float) -> None:
+        """Adds to a counter of the current request, e.g. prompt or completion tokens."""
+        trace = self.current()
+        if trace is not None:
+            trace.add_counter(name, value)
+
+    def dump(self) -> Dict[str, Dict[str, float]]:
+        """Returns the latency histograms of every stage seen by this container."""
+        with self._lock:
+            return {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+
+    def _emit(self, trace: RequestTrace) -> None:
+        stages = trace.stage_totals()
+        stages["total"] = round(trace.duration_ms, 2)
+
+        metrics = [{"Name": name, "Unit": "Milliseconds"} for name in stages]
+        metrics += [{"Name": name, "Unit": "Count"} for name in trace.counters]
+
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{"Namespace": self.namespace, "Dimensions": [["Operation"]], "Metrics": metrics}],
+            },
+            "Operation": trace.operation,
+            "trace_id": trace.trace_id,
+            "spans": trace.spans,
+            **stages,
+            **trace.counters,
+        }
+        metrics_logger.info(json.dumps(record))
+
+        with self._lock:
+            self._requests += 1
+            log_histograms = self.log_every and self._requests % self.log_every == 0
+
+        if log_histograms:
+            logger.info(f"Stage latency histograms: {json.dumps(self.dump())}")
+
+
+tracer = Tracer()
@@ -1,19 +1,18 @@
 import json
 import re
-from typing import Any, Dict, Tuple
-import openai
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 from src.utils.logger import logger
-import spacy
-import time
-
-nlp = spacy.load("es_core_news_sm")
+from src.utils.moderation import blocked_terms_matcher, moderation_service
+from src.utils.question_quality import question_gate
+from src.utils.text_normalization import EXTRA_SPACES_PATTERN
 
 # We can adjust these constraints as needed
 MAX_MESSAGE_LENGTH = 500
 MIN_MESSAGE_LENGTH = 10
-BLOCKED_WORDS = {"hack", "attack", "drop table", "<script>"}
+MAX_BATCH_MESSAGES = 500
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.:=-]{1,128}$')
 INVALID_CHARACTERS_PATTERN = re.compile(r'[<>$%{}[\]#^|~]')
-EXTRA_SPACES_PATTERN = re.compile(r'\s+')
 
 def validate_user_message(body):
     """
@@ -62,16 +61,18 @@ def validate_user_message(body):
     if INVALID_CHARACTERS_PATTERN.search(message):
         return False, None, "Message contains invalid characters"
 
-    # Check for blocked words
-    lower_message = message.lower()
-    if any(word in lower_message for word in BLOCKED_WORDS):
+    # Check for blocked words (BLOCKED_WORDS plus the configured lexicon)
+    if blocked_terms_matcher.search(message):
         return False, None, "Message contains prohibited content"
     
     return True, message, None
 
 def detect_harmful_content(message):
     """
-    Uses OpenAI's Moderation API to detect harmful content.
+    Checks a message for harmful content with the moderation service.
+
+    Repeated messages are answered from the verdict cache and, when the
+    pre-screen is enabled, messages without watch terms skip the Moderation API.
 
     Args:
         message (str): The user’s input message.
@@ -81,29 +82,37 @@ def detect_harmful_content(message):
             - True, reason if harmful content is detected.
             - False, "" otherwise.
     """
-    try:
-        logger.info(f"Checking content moderation for message: {message}")
+    logger.info(f"Checking content moderation for message: {message}")
+    return moderation_service.check(message)
 
-        response = openai.moderations.create(input=message)
 
-        moderation_result = response.results[0]
+async def adetect_harmful_content(message):
+    """
+    Async version of detect_harmful_content using the async OpenAI client.
+    Cancelling the awaiting task aborts the HTTP request.
+    """
+    logger.info(f"Checking content moderation for message: {message}")
+    return await moderation_service.acheck(message)
 
-        flagged = moderation_result.flagged
-        categories = moderation_result.categories.model_dump()
 
-        logger.info(f"Content moderation result: flagged={flagged}, categories={categories}")
+def detect_harmful_contents(messages: List[str]) -> List[Tuple[bool, str]]:
+    """
+    Batch version of detect_harmful_content. Messages that need the API are sent
+    as multi-input moderation requests of up to MODERATION_BATCH_SIZE messages each.
+    """
+    return moderation_service.check_many(messages)
 
-        if flagged:
-            # Extract flagged categories
-            flagged_categories = [category for category, is_flagged in categories.items() if is_flagged]
-            reason = f"Message contains harmful content: {', '.join(flagged_categories)}"
-            return True, reason
 
-        return False, ""
+def get_nlp():
+    """Returns the spaCy pipeline of the question quality gate, loading it on first use."""
+    return question_gate.nlp
 
-    except Exception as e:
-        logger.error(f"Error checking content moderation: {str(e)}")
-        return False, f"Error checking content moderation: {str(e)}"
+
+def preload_nlp() -> threading.Thread:
+    """Starts loading the spaCy pipeline in the background."""
+    thread = threading.Thread(target=get_nlp, name="spacy-preload", daemon=True)
+    thread.start()
+    return thread
 
 
 def is_poorly_formed_question(question: str) -> bool:
@@ -122,32 +131,22 @@ def is_poorly_formed_question(question: str) -> bool:
     """
     try:
         logger.info("Validating question...")
-        start_time = time.time()
-        
-        doc = nlp(question)
-
-        has_explicit_subject = any(token.dep_ in {"nsubj", "nsubj:pass"} for token in doc)
-        has_verb = any(token.pos_ in {"VERB", "AUX"} for token in doc)
-        has_noun_phrase = any(chunk.root.pos_ == "NOUN" for chunk in doc.noun_chunks)
-
-        has_pronoun_or_adverb = any(token.pos_ in {"PRON", "ADV"} for token in doc) or \
-                                any(token.dep_ in {"mark", "advmod"} for token in doc)
-
-        has_object = any(token.dep_ in {"dobj", "iobj"} for token in doc)
-        has_prepositional_complement = any(token.dep_ == "prep" for token in doc)
-
-        # Unify implicity subjetc condition
-        has_implicit_subject = has_pronoun_or_adverb or has_object or has_prepositional_complement
-
-        # Final evaluation
-        is_poorly_formed = not (has_verb and (has_explicit_subject or has_implicit_subject) and has_noun_phrase)
-
-        logger.info(f"Processing time: {time.time() - start_time:.4f} seconds")
-        return is_poorly_formed
+        return question_gate.is_poorly_formed(question)
     except Exception as e:
         logger.error(f"Error processing question: {e}")
         return True
 
+def are_poorly_formed_questions(questions: List[str], batch_size: int = 64) -> List[bool]:
+    """
+    Batch version of is_poorly_formed_question. All questions go through a
+    single nlp.pipe pass, which is much cheaper than parsing them one by one.
+    """
+    try:
+        return question_gate.are_poorly_formed(questions, batch_size=batch_size)
+    except Exception as e:
+        logger.error(f"Error processing questions: {e}")
+        return [True] * len(questions)
+
 def parse_request_body(event: Dict[str, Any]) -> Dict[str, Any]:
     """Parses and returns the request body as a dictionary."""
     try:
@@ -156,8 +155,42 @@ def parse_request_body(event: Dict[str, Any]) -> Dict[str, Any]:
         logger.error("Invalid JSON format in request body")
         return {}
     
+def validate_session_id(body: Dict[str, Any]) -> Tuple[bool, Optional[str], str]:
+    """
+    Validates the optional "session_id" of a request.
+    Returns (is_valid, session_id, error_message); session_id is None when absent.
+    """
+    session_id = body.get("session_id") if isinstance(body, dict) else None
+
+    if session_id is None:
+        return True, None, ""
+
+    if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+        return False, None, "'session_id' must be up to 128 letters, digits or _.:=- characters"
+
+    return True, session_id, ""
+
+def validate_batch_messages(body: Dict[str, Any]) -> Tuple[bool, str]:
+    """Validates that the request contains a non-empty list of messages within the batch limit."""
+    messages = body.get("messages") if isinstance(body, dict) else None
+
+    if not isinstance(messages, list) or not messages:
+        return False, "'messages' must be a non-empty list"
+
+    if len(messages) > MAX_BATCH_MESSAGES:
+        return False, f"Too many messages (maximum {MAX_BATCH_MESSAGES} per batch)"
+
+    return True, ""
+    
 def validate_request_metrics_data(body: Dict[str, Any]) -> Tuple[bool, str]:
     """Validates if the request contains required fields."""
     if not body.get("question") or not body.get("ground_truth") or not body.get("answer") or not body.get("contexts"):
         return False, "Missing required fields"
+    return True, ""
+
+def validate_bulk_metrics_data(body: Dict[str, Any]) -> Tuple[bool, str]:
+    """Validates a bulk evaluation request: a JSONL or Parquet dataset path."""
+    dataset_path = body.get("dataset_path")
+    if not isinstance(dataset_path, str) or not dataset_path.endswith((".jsonl", ".json", ".parquet")):
+        return False, "'dataset_path' must be a .jsonl or .parquet file"
     return True, ""
\ No newline at end of file
@@ -0,0 +1,63 @@
+import json
+from typing import Any, Dict, Union
+import boto3
+from src.constants.app_constants import STREAM_END_SENTINEL
+from src.utils.environment import AMAZON_REGION, WEBSOCKET_ENDPOINT_URL
+from src.utils.logger import logger
+
+# Management API clients are reused across warm invocations
+_clients: Dict[str, Any] = {}
+
+def _get_client(endpoint_url: str):
+    if endpoint_url not in _clients:
+        _clients[endpoint_url] = boto3.client(
+            "apigatewaymanagementapi",
+            endpoint_url=endpoint_url,
+            region_name=AMAZON_REGION,
+        )
+    return _clients[endpoint_url]
+
+
+class WebSocketConnection:
+    """
+    Pushes messages to a client connected through an API Gateway WebSocket API.
+
+    Each message is sent as its own frame and a stream is closed with the
+    "[END]" sentinel expected by the chatbot UI.
+    """
+
+    def __init__(self, endpoint_url: str, connection_id: str):
+        self.connection_id = connection_id
+        self.client = _get_client(endpoint_url)
+        self.closed = False
+
+    @classmethod
+    def from_event(cls, event: Dict[str, Any]) -> "WebSocketConnection":
+        """Builds the connection from a WebSocket Lambda event."""
+        request_context = event["requestContext"]
+        endpoint_url = WEBSOCKET_ENDPOINT_URL or f"https://{request_context['domainName']}/{request_context['stage']}"
+        return cls(endpoint_url, request_context["connectionId"])
+
+    def send(self, data: Union[str, Dict[str, Any]]) -> bool:
+        """
+        Sends a frame to the client.
+
+        Returns False once the client has disconnected, so callers can stop
+        producing output.
+        """
+        if self.closed:
+            return False
+
+        payload = data if isinstance(data, str) else json.dumps(data)
+
+        try:
+            self.client.post_to_connection(ConnectionId=self.connection_id, Data=payload.encode("utf-8"))
+            return True
+        except self.client.exceptions.GoneException:
+            logger.info(f"WebSocket connection {self.connection_id} is gone.")
+            self.closed = True
+            return False
+
+    def end(self) -> bool:
+        """Sends the end-of-stream sentinel."""
+        return self.send(STREAM_END_SENTINEL)